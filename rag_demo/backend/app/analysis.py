@@ -0,0 +1,140 @@
+"""
+Analysis module: Retrieve evidence and judge claims, with bounded concurrency
+"""
+import asyncio
+import logging
+from contextlib import nullcontext
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import ANALYZE_CONCURRENCY, DEFAULT_TOP_K, JUDGE_BATCH_SIZE
+from app.models import Claim, ClaimAnalysis, Citation
+from app.retrieval import retrieve_relevant_documents, retrieve_for_claims
+from app.judge import judge_claim, judge_claims_batch
+
+logger = logging.getLogger(__name__)
+
+
+def error_analysis(claim: Claim, error: Exception) -> ClaimAnalysis:
+    """Build the fallback analysis recorded for a claim whose processing failed"""
+    return ClaimAnalysis(
+        claim_id=claim.claim_id,
+        coverage="not_addressed",
+        reasoning=f"处理过程中出现错误: {str(error)}",
+        citations=[],
+        confidence=0,
+        gaps=["需要重新处理"],
+        recommended_actions=["检查系统错误"]
+    )
+
+
+async def analyze_claim(
+    claim: Claim,
+    top_k: int = DEFAULT_TOP_K,
+    citations: Optional[List[Citation]] = None
+) -> ClaimAnalysis:
+    """
+    Retrieve evidence for a single claim and judge its coverage
+    
+    If `citations` is given (e.g. from report-level batched retrieval), the
+    per-claim retrieval is skipped. Never raises: any failure is converted into an error ClaimAnalysis so that
+    one bad claim does not abort the rest of the report.
+    """
+    try:
+        if citations is None:
+            citations = await retrieve_relevant_documents(claim.claim_text, top_k=top_k)
+        return await judge_claim(claim, citations)
+    except Exception as e:
+        logger.error(f"Error analyzing claim {claim.claim_id}: {e}")
+        return error_analysis(claim, e)
+
+
+async def analyze_claim_batch(
+    claims: List[Claim],
+    top_k: int = DEFAULT_TOP_K,
+    citations_by_claim: Optional[Dict[str, List[Citation]]] = None,
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> List[ClaimAnalysis]:
+    """
+    Retrieve evidence for several claims and judge them in one LLM request
+    
+    Claims without pre-retrieved citations are retrieved one by one first.
+    judge_claims_batch falls back to judging claims on their own when the
+    batched reply is unusable, running those fallbacks under `semaphore`.
+    Never raises: if retrieval fails, every claim gets an error analysis.
+    """
+    citations_by_claim = citations_by_claim or {}
+    try:
+        items = []
+        async with semaphore or nullcontext():
+            for claim in claims:
+                citations = citations_by_claim.get(claim.claim_id)
+                if citations is None:
+                    citations = await retrieve_relevant_documents(claim.claim_text, top_k=top_k)
+                items.append((claim, citations))
+        return await judge_claims_batch(items, semaphore)
+    except Exception as e:
+        logger.error(f"Error analyzing claim batch {[claim.claim_id for claim in claims]}: {e}")
+        return [error_analysis(claim, e) for claim in claims]
+
+
+async def analyze_claims_concurrently(
+    claims: List[Claim],
+    top_k: int = DEFAULT_TOP_K,
+    concurrency: Optional[int] = None,
+    on_result: Optional[Callable[[ClaimAnalysis], Awaitable[None]]] = None,
+    batch_size: Optional[int] = None
+) -> List[ClaimAnalysis]:
+    """
+    Analyze claims with at most `concurrency` claims (or claim batches) in flight at once
+    
+    Args:
+        claims: Claims to analyze
+        top_k: Number of documents to retrieve per claim
+        concurrency: Maximum in-flight claims (defaults to ANALYZE_CONCURRENCY, 1 = serial)
+        on_result: Optional coroutine called with each analysis as soon as it finishes
+        batch_size: Claims judged per LLM request (defaults to JUDGE_BATCH_SIZE, 1 = per claim);
+            with batching, `concurrency` bounds the batches in flight
+    
+    Returns:
+        List of ClaimAnalysis objects in the same order as `claims`
+    """
+    concurrency = max(1, concurrency or ANALYZE_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(claims)
+    
+    logger.info(f"Analyzing {total} claims with concurrency {concurrency}")
+    
+    # One batched embedding + one multi-query search for the whole report;
+    # on failure each claim falls back to its own retrieval
+    citations_by_claim: Dict[str, List[Citation]] = {}
+    try:
+        citations_by_claim = await retrieve_for_claims(claims, top_k=top_k)
+    except Exception as e:
+        logger.warning(f"Batched retrieval failed, falling back to per-claim retrieval: {e}")
+    
+    async def run(index: int, claim: Claim) -> ClaimAnalysis:
+        async with semaphore:
+            logger.info(f"Processing claim {index}/{total}: {claim.claim_id}")
+            analysis = await analyze_claim(claim, top_k, citations_by_claim.get(claim.claim_id))
+        if on_result is not None:
+            await on_result(analysis)
+        return analysis
+    
+    batch_size = max(1, batch_size or JUDGE_BATCH_SIZE)
+    if batch_size > 1:
+        batches = [claims[i:i + batch_size] for i in range(0, total, batch_size)]
+        
+        async def run_batch(index: int, batch: List[Claim]) -> List[ClaimAnalysis]:
+            # The semaphore is taken per LLM request inside, so per-claim fallbacks share the limit
+            logger.info(f"Processing claim batch {index}/{len(batches)} ({len(batch)} claims)")
+            analyses = await analyze_claim_batch(batch, top_k, citations_by_claim, semaphore)
+            if on_result is not None:
+                for analysis in analyses:
+                    await on_result(analysis)
+            return analyses
+        
+        results = await asyncio.gather(*(run_batch(i, batch) for i, batch in enumerate(batches, 1)))
+        return [analysis for analyses in results for analysis in analyses]
+    
+    # gather() preserves input order regardless of completion order
+    return list(await asyncio.gather(*(run(i, claim) for i, claim in enumerate(claims, 1))))
@@ -1,39 +1,166 @@
 """
 Claim extraction module: Extract independent claims from short report using LLM
 """
+import asyncio
 import logging
-import json
-import re
-from typing import List, Dict
-import requests
+import math
+import time
+from typing import List, Dict, Optional, Tuple
 
-from app.config import OLLAMA_BASE_URL, LLM_MODEL, TEMPERATURE, MIN_CLAIMS, MAX_CLAIMS
-from app.models import Claim
-from app.utils import deduplicate_claims, generate_claim_id, logger
+import httpx
+from pydantic import ValidationError
+
+from app.config import (
+    OLLAMA_BASE_URL, LLM_MODEL, TEMPERATURE, MIN_CLAIMS, MAX_CLAIMS,
+    EXTRACT_MODE, EXTRACT_WINDOW_PAGES, EXTRACT_WINDOW_CHARS, EXTRACT_CONCURRENCY
+)
+from app.models import Claim, ClaimExtraction
+from app import ollama_client, metrics, structured_output
+from app.dedup import deduplicate
+from app.lexical_index import tokenize
+from app.utils import generate_claim_id, logger
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever the extraction prompts change, so uploads of an already processed report are extracted again
+EXTRACT_PROMPT_VERSION = 2
+
+CLAIM_TYPES_TEXT = """Claim types:
+- accounting: Accounting irregularities, financial misstatements
+- business_model: Business model concerns, sustainability issues
+- fraud: Fraud allegations, deception
+- related_party: Related party transactions, conflicts of interest
+- guidance: Guidance manipulation, forward-looking statements
+- metrics: Key metrics manipulation, KPIs
+- other: Other types of claims"""
+
+OUTPUT_FORMAT_TEXT = """Output format (JSON object):
+{
+  "claims": [
+    {
+      "claim_text": "Specific allegation or claim",
+      "page_numbers": [1, 2],
+      "claim_type": "accounting"
+    },
+    ...
+  ]
+}"""
+
+
+async def _request_claims(prompt: str) -> List[Dict]:
+    """
+    Send an extraction prompt to the LLM and validate the reply
+
+    Returns:
+        Claim dicts (claim_text, page_numbers, claim_type) as the LLM returned them
+
+    Raises:
+        httpx.HTTPError: If Ollama cannot be reached
+        ConnectionError: If Ollama returns an error status
+        ValueError: If the reply does not match ClaimExtraction
+    """
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": "You are a financial analyst expert at extracting structured claims from reports. Always return valid JSON."
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "options": {
+            "temperature": TEMPERATURE,
+            "num_predict": 2000
+        },
+        "format": structured_output.response_format(ClaimExtraction),
+        "stream": False
+    }
+
+    response = await ollama_client.post("/api/chat", payload, operation="extract")
+
+    if response.status_code != 200:
+        error_msg = response.text
+        logger.error(f"Ollama API error: {response.status_code} - {error_msg}")
+        raise ConnectionError(f"Ollama API returned error {response.status_code}: {error_msg}. Please check if model '{LLM_MODEL}' is available. Run 'ollama list' to see available models.")
+
+    result = response.json()
+    content = result.get("message", {}).get("content", "")
+
+    try:
+        extraction = structured_output.parse(ClaimExtraction, content, "extract")
+    except ValidationError as e:
+        raise ValueError(f"LLM did not return valid claims JSON: {e.error_count()} error(s)\nResponse: {content[:500]}")
+    return [claim.model_dump() for claim in extraction.claims]
+
+
+def _attribute_pages(claim_text: str, page_numbers: List[int], pages: List[Tuple[int, str]]) -> List[int]:
+    """
+    Page numbers of a claim, restricted to the pages the LLM was shown
 
-def extract_claims_from_text(text: str, pages: List[tuple]) -> List[Claim]:
+    When the LLM gives none of those pages, the claim is attributed to the
+    shown page sharing the most terms with it.
+    """
+    shown = {pnum for pnum, _ in pages}
+    valid = sorted({pnum for pnum in page_numbers if pnum in shown})
+    if valid or not pages:
+        return valid or [1]
+    terms = set(tokenize(claim_text))
+    best_page = max(pages, key=lambda page: len(terms & set(tokenize(page[1]))))
+    return [best_page[0]]
+
+
+def _clean_claims(raw_claims: List[Dict], pages: List[Tuple[int, str]]) -> List[Dict]:
+    """Drop fragments too short to test and fix page numbers"""
+    return [
+        {
+            "claim_text": claim["claim_text"].strip(),
+            "page_numbers": _attribute_pages(claim["claim_text"], claim["page_numbers"], pages),
+            "claim_type": claim["claim_type"]
+        }
+        for claim in raw_claims
+        if len(claim["claim_text"].strip()) >= 10
+    ]
+
+
+def _to_claims(claims_data: List[Dict]) -> List[Claim]:
+    """Number the claims C001, C002, ... in order"""
+    if len(claims_data) < MIN_CLAIMS:
+        logger.warning(f"Only extracted {len(claims_data)} claims, minimum is {MIN_CLAIMS}")
+
+    return [
+        Claim(
+            claim_id=generate_claim_id(i),
+            claim_text=claim_data["claim_text"],
+            page_numbers=claim_data["page_numbers"],
+            claim_type=claim_data["claim_type"]
+        )
+        for i, claim_data in enumerate(claims_data, start=1)
+    ]
+
+
+async def extract_claims_from_text(text: str, pages: List[tuple]) -> List[Claim]:
     """
     Extract independent claims from report text using LLM
-    
+
     Args:
-        text: Full text of the report (first 10 pages)
+        text: Full text of the report (first MAX_PAGES pages)
         pages: List of (page_number, page_text) tuples
-    
+
     Returns:
         List of Claim objects
     """
     logger.info("Extracting claims from report text using LLM")
-    
+
     # Build page context for better page number attribution
     page_context = "\n".join([f"Page {pnum}: {ptext[:500]}..." for pnum, ptext in pages[:5]])
-    
+
     prompt = f"""You are an expert financial analyst. Extract independent, testable claims from the following short report.
 
-The report text (first 3 pages):
-{text[:8000]}  # Limit context size
+The report text (first {len(pages)} pages):
+{text[:EXTRACT_WINDOW_CHARS]}
 
 Requirements:
 1. Extract 8-30 independent, atomic claims (each claim should contain a single allegation)
@@ -47,149 +174,182 @@ Requirements:
 Page context (first 5 pages):
 {page_context}
 
-Output format (JSON array):
-[
-  {{
-    "claim_text": "Specific allegation or claim",
-    "page_numbers": [1, 2],
-    "claim_type": "accounting"
-  }},
-  ...
-]
-
-Claim types:
-- accounting: Accounting irregularities, financial misstatements
-- business_model: Business model concerns, sustainability issues
-- fraud: Fraud allegations, deception
-- related_party: Related party transactions, conflicts of interest
-- guidance: Guidance manipulation, forward-looking statements
-- metrics: Key metrics manipulation, KPIs
-- other: Other types of claims
+{OUTPUT_FORMAT_TEXT}
+
+{CLAIM_TYPES_TEXT}
 
 Return ONLY valid JSON, no additional text."""
 
     try:
-        # Call Ollama API
-        url = f"{OLLAMA_BASE_URL}/api/chat"
-        
-        payload = {
-            "model": LLM_MODEL,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a financial analyst expert at extracting structured claims from reports. Always return valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "options": {
-                "temperature": TEMPERATURE,
-                "num_predict": 2000
-            },
-            "stream": False
-        }
-        
         logger.info(f"Calling Ollama API with model: {LLM_MODEL}")
-        response = requests.post(url, json=payload, timeout=120)
-        
-        if response.status_code != 200:
-            error_msg = response.text
-            logger.error(f"Ollama API error: {response.status_code} - {error_msg}")
-            raise ConnectionError(f"Ollama API returned error {response.status_code}: {error_msg}. Please check if model '{LLM_MODEL}' is available. Run 'ollama list' to see available models.")
-        
-        result = response.json()
-        content = result.get("message", {}).get("content", "")
-        
-        if not content:
-            raise ValueError("LLM returned empty response")
-        
-        # Extract JSON from response (handle markdown code blocks)
-        json_match = re.search(r'\[[\s\S]*\]', content)
-        if json_match:
-            json_str = json_match.group(0)
-        else:
-            json_str = content.strip()
-        
-        # Parse JSON
-        claims_data = json.loads(json_str)
-        
-        if not isinstance(claims_data, list):
-            raise ValueError("LLM did not return a list of claims")
-        
-        # Validate and clean claims
-        validated_claims = []
-        for i, claim_data in enumerate(claims_data[:MAX_CLAIMS]):
-            if not isinstance(claim_data, dict):
-                continue
-            
-            claim_text = claim_data.get("claim_text", "").strip()
-            if not claim_text or len(claim_text) < 10:
-                continue
-            
-            page_numbers = claim_data.get("page_numbers", [])
-            if not page_numbers:
-                # Try to infer from text if not provided
-                page_numbers = [1]
-            
-            claim_type = claim_data.get("claim_type", "other")
-            if claim_type not in ["accounting", "business_model", "fraud", "related_party", "guidance", "metrics", "other"]:
-                claim_type = "other"
-            
-            validated_claims.append({
-                "claim_text": claim_text,
-                "page_numbers": page_numbers if isinstance(page_numbers, list) else [page_numbers],
-                "claim_type": claim_type
-            })
-        
+        validated_claims = _clean_claims((await _request_claims(prompt))[:MAX_CLAIMS], pages)
+
         # Deduplicate claims
-        deduplicated = deduplicate_claims(validated_claims)
-        
-        # Ensure we have enough claims
-        if len(deduplicated) < MIN_CLAIMS:
-            logger.warning(f"Only extracted {len(deduplicated)} claims, minimum is {MIN_CLAIMS}")
-        
+        deduplicated = await deduplicate(validated_claims)
+
         # Limit to MAX_CLAIMS
-        deduplicated = deduplicated[:MAX_CLAIMS]
-        
-        # Convert to Claim objects
-        claims = []
-        for i, claim_data in enumerate(deduplicated, start=1):
-            claim = Claim(
-                claim_id=generate_claim_id(i),
-                claim_text=claim_data["claim_text"],
-                page_numbers=claim_data["page_numbers"],
-                claim_type=claim_data["claim_type"]
-            )
-            claims.append(claim)
-        
+        claims = _to_claims(deduplicated[:MAX_CLAIMS])
+
         logger.info(f"Successfully extracted {len(claims)} claims")
         return claims
-        
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse JSON from LLM response: {e}")
-        logger.error(f"LLM response (first 1000 chars): {content[:1000]}")
-        # Try to extract JSON from response more aggressively
-        # Try to find JSON array in the response
-        json_patterns = [
-            r'\[[\s\S]*?\]',  # JSON array
-            r'\{[\s\S]*?\}',  # JSON object
-        ]
-        for pattern in json_patterns:
-            matches = re.findall(pattern, content)
-            if matches:
-                try:
-                    claims_data = json.loads(matches[0])
-                    if isinstance(claims_data, list) and len(claims_data) > 0:
-                        logger.info(f"Successfully extracted JSON using pattern matching")
-                        # Continue with processing
-                        break
-                except:
-                    continue
+
+    except httpx.HTTPError as e:
+        logger.error(f"Failed to call Ollama API: {e}")
+        raise ConnectionError(f"Failed to connect to Ollama at {OLLAMA_BASE_URL}. Please ensure Ollama is running and model {LLM_MODEL} is available.")
+    except Exception as e:
+        import traceback
+        logger.error(f"Error extracting claims: {e}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        raise RuntimeError(f"Failed to extract claims: {e}")
+
+
+def _split_page(page: Tuple[int, str], max_chars: int) -> List[Tuple[int, str]]:
+    """Split a page longer than `max_chars` into parts with the same page number, preferring line and word breaks"""
+    pnum, text = page
+    parts = []
+    while len(text) > max_chars:
+        cut = text.rfind("\n", max_chars // 2, max_chars)
+        if cut < 0:
+            cut = text.rfind(" ", max_chars // 2, max_chars)
+        if cut < 0:
+            cut = max_chars
+        parts.append((pnum, text[:cut]))
+        text = text[cut:].lstrip()
+    parts.append((pnum, text))
+    return parts
+
+
+def page_windows(
+    pages: List[Tuple[int, str]],
+    max_pages: int = EXTRACT_WINDOW_PAGES,
+    max_chars: int = EXTRACT_WINDOW_CHARS
+) -> List[List[Tuple[int, str]]]:
+    """
+    Split pages into consecutive windows of at most `max_pages` pages and `max_chars` characters
+
+    A page longer than `max_chars` is split into parts (each keeping its page
+    number) that are packed like pages, so no text is left out of the prompts.
+    """
+    windows: List[List[Tuple[int, str]]] = []
+    size = 0
+    for page in (part for page in pages for part in _split_page(page, max_chars)):
+        if windows and len(windows[-1]) < max_pages and size + len(page[1]) <= max_chars:
+            windows[-1].append(page)
+            size += len(page[1])
         else:
-            raise ValueError(f"LLM did not return valid JSON: {e}\nResponse: {content[:500]}")
-    except requests.exceptions.RequestException as e:
+            windows.append([page])
+            size = len(page[1])
+    return windows
+
+
+def _window_prompt(window: List[Tuple[int, str]], total_pages: int, max_claims: int) -> str:
+    first, last = window[0][0], window[-1][0]
+    text = "\n\n".join(f"Page {pnum}:\n{ptext}" for pnum, ptext in window)
+
+    return f"""You are an expert financial analyst. Extract independent, testable claims from pages {first}-{last} of a {total_pages}-page short report.
+
+The report text (pages {first}-{last}, each starting with a "Page N:" marker):
+{text}
+
+Requirements:
+1. Extract up to {max_claims} independent, atomic claims made on these pages (each claim should contain a single allegation)
+2. Each claim must be testable and verifiable
+3. Claims should be specific and actionable
+4. For each claim, identify:
+   - The claim text (concise, 1-3 sentences)
+   - Page numbers where it appears (from the "Page N:" markers, between {first} and {last})
+   - Claim type: accounting, business_model, fraud, related_party, guidance, metrics, or other
+5. If these pages make no allegations (e.g. disclaimers, appendices), return an empty "claims" list
+
+{OUTPUT_FORMAT_TEXT}
+
+{CLAIM_TYPES_TEXT}
+
+Return ONLY valid JSON, no additional text."""
+
+
+async def extract_claims_windowed(
+    pages: List[Tuple[int, str]],
+    concurrency: Optional[int] = None,
+    max_pages: int = EXTRACT_WINDOW_PAGES,
+    max_chars: int = EXTRACT_WINDOW_CHARS
+) -> List[Claim]:
+    """
+    Extract claims from every page of the report (map-reduce over page windows)
+
+    Each window of pages is sent to the LLM as its own extraction request,
+    with up to `concurrency` requests in flight, so a long report takes about
+    as long as its slowest window rather than the sum of all windows. The
+    window results are merged with claim dedup (duplicates found on several
+    pages keep all their page numbers). When more than MAX_CLAIMS remain,
+    windows take turns contributing claims so the whole report stays covered;
+    the kept claims are numbered in page order.
+
+    Args:
+        pages: List of (page_number, page_text) tuples of the whole report
+        concurrency: Maximum windows in flight (defaults to EXTRACT_CONCURRENCY)
+        max_pages: Maximum pages per window
+        max_chars: Maximum characters of text per window
+
+    Returns:
+        List of Claim objects
+
+    A failed window is logged and skipped; extraction fails only if every window fails.
+    """
+    windows = page_windows(pages, max_pages, max_chars)
+    concurrency = max(1, concurrency or EXTRACT_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    # Ask each window for a share of MAX_CLAIMS with headroom for duplicates across windows
+    per_window = max(3, math.ceil(2 * MAX_CLAIMS / len(windows))) if windows else 0
+
+    logger.info(
+        f"Extracting claims from {len(pages)} pages in {len(windows)} windows "
+        f"(concurrency {concurrency}, up to {per_window} claims each)"
+    )
+
+    async def run(window: List[Tuple[int, str]]) -> List[Dict]:
+        async with semaphore:
+            start = time.perf_counter()
+            raw_claims = await _request_claims(_window_prompt(window, len(pages), per_window))
+            metrics.record_latency("extract_window", time.perf_counter() - start)
+        return _clean_claims(raw_claims[:per_window], window)
+
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run(window) for window in windows), return_exceptions=True)
+        metrics.record_latency("extract_total", time.perf_counter() - start)
+
+        failures = [result for result in results if isinstance(result, BaseException)]
+        for window, result in zip(windows, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Claim extraction failed for pages {window[0][0]}-{window[-1][0]}: {result}")
+        if failures and len(failures) == len(windows):
+            raise failures[0]
+
+        # Reduce: dedup across windows, remembering which window found each claim first
+        candidates = []
+        for window_index, result in enumerate(results):
+            if not isinstance(result, BaseException):
+                candidates.extend({**claim, "window": window_index} for claim in result)
+        deduplicated = await deduplicate(candidates)
+
+        by_window: Dict[int, List[Dict]] = {}
+        for claim in deduplicated:
+            by_window.setdefault(claim["window"], []).append(claim)
+        selected = []
+        for rank in range(max((len(found) for found in by_window.values()), default=0)):
+            selected.extend(found[rank] for _, found in sorted(by_window.items()) if rank < len(found))
+        selected = selected[:MAX_CLAIMS]
+        selected.sort(key=lambda claim: (min(claim["page_numbers"]), claim["window"]))
+
+        claims = _to_claims(selected)
+        logger.info(
+            f"Successfully extracted {len(claims)} claims from {len(windows) - len(failures)}/{len(windows)} windows "
+            f"({len(candidates)} before dedup)"
+        )
+        return claims
+
+    except httpx.HTTPError as e:
         logger.error(f"Failed to call Ollama API: {e}")
         raise ConnectionError(f"Failed to connect to Ollama at {OLLAMA_BASE_URL}. Please ensure Ollama is running and model {LLM_MODEL} is available.")
     except Exception as e:
@@ -197,3 +357,18 @@ Return ONLY valid JSON, no additional text."""
         logger.error(f"Error extracting claims: {e}")
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise RuntimeError(f"Failed to extract claims: {e}")
+
+
+async def extract_claims(pages: List[Tuple[int, str]], mode: Optional[str] = None) -> List[Claim]:
+    """
+    Extract claims from report pages with the configured mode
+
+    Args:
+        pages: List of (page_number, page_text) tuples
+        mode: "windowed" (all pages, concurrent windows) or "single" (one prompt); default EXTRACT_MODE
+    """
+    mode = mode or EXTRACT_MODE
+    if mode == "single":
+        full_text = "\n\n".join([f"Page {pnum}:\n{text}" for pnum, text in pages])
+        return await extract_claims_from_text(full_text, pages)
+    return await extract_claims_windowed(pages)
@@ -22,6 +22,21 @@ OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 LLM_MODEL = os.getenv("LLM_MODEL", "llama3.1:8b")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "nomic-embed-text")
 
+# Ollama HTTP client: connection pool size and per-operation timeouts (seconds)
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "16"))
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "10"))
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "120"))
+JUDGE_TIMEOUT = float(os.getenv("JUDGE_TIMEOUT", "180"))
+EMBED_TIMEOUT = float(os.getenv("EMBED_TIMEOUT", "30"))
+# How long Ollama keeps a model loaded after each request (duration like "30m", seconds, or -1 = forever)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Preload LLM_MODEL and EMBED_MODEL at startup and re-check them every KEEP_WARM_INTERVAL seconds (0 = no probe)
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() in ("1", "true", "yes")
+MODEL_WARMUP_TIMEOUT = float(os.getenv("MODEL_WARMUP_TIMEOUT", "300"))
+KEEP_WARM_INTERVAL = float(os.getenv("KEEP_WARM_INTERVAL", "300"))
+# Constrain claim extraction and judge replies with a JSON schema (Ollama >= 0.5); false = plain JSON mode
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "true").lower() in ("1", "true", "yes")
+
 # Storage paths - relative to rag_demo root (one level up from backend)
 # Handle both relative and absolute paths from environment variables
 def _resolve_path(env_var: str, default_path: Path) -> Path:
@@ -38,22 +53,91 @@ def _resolve_path(env_var: str, default_path: Path) -> Path:
 CHROMA_DIR = _resolve_path("CHROMA_DIR", BASE_DIR / "storage" / "chroma")
 INTERNAL_DATA_DIR = _resolve_path("INTERNAL_DATA_DIR", BASE_DIR / "company" / "EDU")
 REPORTS_DIR = _resolve_path("REPORTS_DIR", BASE_DIR / "storage" / "reports")
+CACHE_DIR = _resolve_path("CACHE_DIR", BASE_DIR / "storage" / "cache")
 
 # Ensure directories exist
 CHROMA_DIR.mkdir(parents=True, exist_ok=True)
 REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 INTERNAL_DATA_DIR.mkdir(parents=True, exist_ok=True)
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 # Processing configuration
-MAX_PAGES = 3  # Only process first 3 pages
-CHUNK_SIZE = 512
-CHUNK_OVERLAP = 50
+MAX_PAGES = int(os.getenv("MAX_PAGES", "3"))  # Pages read for single-prompt claim extraction
+# Claim extraction: "windowed" runs extraction concurrently over page windows of the whole report
+# (up to REPORT_MAX_PAGES pages) and merges the results; "single" sends the first MAX_PAGES pages in one prompt
+EXTRACT_MODE = os.getenv("EXTRACT_MODE", "windowed").lower()
+REPORT_MAX_PAGES = int(os.getenv("REPORT_MAX_PAGES", "200"))
+# A window holds at most EXTRACT_WINDOW_PAGES pages and EXTRACT_WINDOW_CHARS characters of text
+EXTRACT_WINDOW_PAGES = int(os.getenv("EXTRACT_WINDOW_PAGES", "3"))
+EXTRACT_WINDOW_CHARS = int(os.getenv("EXTRACT_WINDOW_CHARS", "8000"))
+# Windows extracted at once (Ollama runs OLLAMA_NUM_PARALLEL of them in parallel per model)
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "8"))
+# Largest accepted report upload (MB); uploads are streamed to disk and rejected with 413 beyond this
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
+# PDF extraction: worker processes for page-parallel extraction (1 = serial) and
+# the minimum page count for which the process pool is used
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+# Chunk size and overlap are counted in CHUNK_UNIT: "chars" or "tokens"
+# (tokens use tiktoken's TOKENIZER_ENCODING when installed)
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "chars").lower()
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "512"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
+
+# Indexing pipeline: chunks per embedding request, concurrent embedding requests,
+# and batches buffered between pipeline stages (backpressure bound)
+INDEX_BATCH_SIZE = int(os.getenv("INDEX_BATCH_SIZE", "32"))
+INDEX_EMBED_WORKERS = int(os.getenv("INDEX_EMBED_WORKERS", "4"))
+INDEX_QUEUE_SIZE = int(os.getenv("INDEX_QUEUE_SIZE", "8"))
+# Seconds between checkpoints that persist the vector store and manifest during indexing
+# (a flat store rewrites its whole matrix on each one; 0 = after every document)
+INDEX_CHECKPOINT_SECONDS = float(os.getenv("INDEX_CHECKPOINT_SECONDS", "60"))
 DEFAULT_TOP_K = 6
+# Vector store backend: "chroma" (HNSW in ChromaDB) or "flat" (exact search over a memory-mapped
+# .npy matrix under CHROMA_DIR/flat, fast for corpora of a few thousand to ~100k chunks)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# Flat backend only: scan int8 or float16 copies of the vectors ("none" = float32 only) and
+# re-score the best FLAT_RESCORE_FACTOR * top_k candidates at full precision
+FLAT_QUANTIZATION = os.getenv("FLAT_QUANTIZATION", "none").lower()
+FLAT_RESCORE_FACTOR = int(os.getenv("FLAT_RESCORE_FACTOR", "4"))
+# Hybrid retrieval: fuse BM25 lexical hits with vector hits by reciprocal rank fusion.
+# Each retriever contributes RETRIEVAL_CANDIDATES hits (at least top_k); RRF_K damps rank differences
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() in ("1", "true", "yes")
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# In-memory cache of retrieval results per (claim, top_k, index version); 0 disables
+RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "4096"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+# Maximum number of vectors kept in the persistent embedding cache (0 disables caching)
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+# Cache text extracted from PDF/DOCX files on disk, keyed by file content hash
+TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
 MAX_CLAIMS = 30
 MIN_CLAIMS = 8
+# Claim dedup: "minhash" (MinHash/LSH over word sets), "embedding" (cosine over claim
+# embeddings) or "exact" (pairwise word-set Jaccard), and the threshold for each measure
+DEDUP_METHOD = os.getenv("DEDUP_METHOD", "minhash").lower()
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.7"))
+DEDUP_EMBED_THRESHOLD = float(os.getenv("DEDUP_EMBED_THRESHOLD", "0.92"))
+
+# Analysis configuration
+# Maximum number of claims analyzed (retrieval + judgment) in flight at once
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", "4"))
+# Number of finished analysis jobs kept in memory for polling
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "100"))
 
 # LLM configuration
 TEMPERATURE = 0.3  # Lower temperature for more deterministic output
+# Stream judge responses and stop generation once the JSON object is complete
+JUDGE_STREAM = os.getenv("JUDGE_STREAM", "true").lower() in ("1", "true", "yes")
+# Persist judgments keyed by claim, evidence, model, temperature and prompt version (CACHE_DIR/judgments.sqlite3)
+JUDGE_CACHE_ENABLED = os.getenv("JUDGE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Claims judged per LLM request (1 = one request per claim); larger batches send the criteria once per batch
+JUDGE_BATCH_SIZE = int(os.getenv("JUDGE_BATCH_SIZE", "1"))
+# Token budget for the evidence of one claim in the judge prompt: adjacent chunks are merged, overlap
+# removed and the sentences most relevant to the claim kept (0 = send each citation's quote as is)
+JUDGE_EVIDENCE_TOKENS = int(os.getenv("JUDGE_EVIDENCE_TOKENS", "1200"))
 
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
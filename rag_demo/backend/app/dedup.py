@@ -0,0 +1,232 @@
+"""
+Dedup module: Sub-quadratic near-duplicate claim detection (MinHash/LSH and embedding cosine)
+"""
+import hashlib
+import logging
+import re
+import zlib
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from app.config import DEDUP_METHOD, DEDUP_THRESHOLD, DEDUP_EMBED_THRESHOLD
+from app.embedding_cache import embed_with_cache
+from app.utils import deduplicate_claims
+
+logger = logging.getLogger(__name__)
+
+# Largest prime below 2^32 for the hash family h(x) = (a * x + b) mod p; with a, b, x < 2^32
+# the product fits in uint64 and the modulus actually wraps, so each h is a good permutation
+_PRIME = (1 << 32) - 5
+
+
+def _normalized_hash(claim: dict) -> str:
+    """Hash of the normalized claim text, as used by utils.deduplicate_claims"""
+    normalized_text = re.sub(r'\s+', ' ', claim['claim_text'].lower().strip())
+    return hashlib.md5(normalized_text.encode()).hexdigest()
+
+
+def _word_set(text: str) -> Set[str]:
+    """Word set compared by utils.calculate_similarity"""
+    return set(text.lower().split())
+
+
+def _jaccard(words1: Set[str], words2: Set[str]) -> float:
+    if not words1 or not words2:
+        return 0.0
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def _merge_pages(existing: dict, claim: dict) -> None:
+    existing['page_numbers'] = sorted(set(existing['page_numbers'] + claim['page_numbers']))
+
+
+class MinHashLSH:
+    """
+    MinHash signatures over word sets, indexed by locality-sensitive hashing
+
+    Signatures are split into `bands` bands; two sets become candidates when
+    any band matches, which happens with probability 1 - (1 - s^rows)^bands
+    for Jaccard similarity s. Candidates still need an exact check.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+
+    @classmethod
+    def for_threshold(cls, threshold: float, num_perm: int = 128, target_recall: float = 0.999) -> "MinHashLSH":
+        """Use the most selective banding that still finds pairs at `threshold` with `target_recall`"""
+        for bands in sorted(b for b in range(1, num_perm + 1) if num_perm % b == 0):
+            rows = num_perm // bands
+            if 1 - (1 - threshold ** rows) ** bands >= target_recall:
+                return cls(num_perm=num_perm, bands=bands)
+        return cls(num_perm=num_perm, bands=num_perm)
+
+    def signature(self, words: Set[str]) -> np.ndarray:
+        hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def insert(self, key: int, signature: np.ndarray) -> None:
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+    def query(self, signature: np.ndarray) -> Set[int]:
+        candidates = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(band_key, ()))
+        return candidates
+
+
+def deduplicate_claims_minhash(claims: List[dict], similarity_threshold: float = DEDUP_THRESHOLD) -> List[dict]:
+    """
+    Remove duplicate or highly similar claims using MinHash/LSH candidates
+
+    Same result as utils.deduplicate_claims (word-set Jaccard, page numbers
+    merged into the first kept similar claim), but each claim is only
+    compared with the kept claims sharing an LSH bucket instead of all of
+    them. A true match is missed with probability below 0.1%.
+
+    Args:
+        claims: List of claim dictionaries
+        similarity_threshold: Jaccard threshold for considering claims as duplicates
+
+    Returns:
+        Deduplicated list of claims
+    """
+    if similarity_threshold <= 0:
+        # Every pair qualifies; LSH has nothing to prune
+        return deduplicate_claims(claims, similarity_threshold)
+
+    lsh = MinHashLSH.for_threshold(similarity_threshold)
+    deduplicated: List[dict] = []
+    word_sets: List[Set[str]] = []
+    seen_hashes: Dict[str, dict] = {}
+
+    for claim in claims:
+        # Check if we've seen this exact text
+        text_hash = _normalized_hash(claim)
+        if text_hash in seen_hashes:
+            _merge_pages(seen_hashes[text_hash], claim)
+            continue
+
+        words = _word_set(claim['claim_text'])
+        signature = lsh.signature(words) if words else None
+
+        duplicate_of = None
+        if signature is not None:
+            # Earliest kept claim first, like the linear scan
+            for index in sorted(lsh.query(signature)):
+                if _jaccard(words, word_sets[index]) >= similarity_threshold:
+                    duplicate_of = index
+                    break
+
+        if duplicate_of is not None:
+            _merge_pages(deduplicated[duplicate_of], claim)
+        else:
+            if signature is not None:
+                lsh.insert(len(deduplicated), signature)
+            deduplicated.append(claim)
+            word_sets.append(words)
+            seen_hashes[text_hash] = claim
+
+    return deduplicated
+
+
+def deduplicate_claims_by_vectors(
+    claims: List[dict],
+    vectors: np.ndarray,
+    similarity_threshold: float = DEDUP_EMBED_THRESHOLD,
+    block_size: int = 1024
+) -> List[dict]:
+    """
+    Remove claims whose embedding cosine similarity to a kept claim reaches the threshold
+
+    Similarities are computed a block of rows at a time with one matrix
+    product, so memory stays at block_size x n. Page numbers are merged into
+    the first kept similar claim, as in utils.deduplicate_claims.
+
+    Args:
+        claims: List of claim dictionaries
+        vectors: One embedding per claim (n x d)
+        similarity_threshold: Cosine threshold for considering claims as duplicates
+        block_size: Rows of the similarity matrix computed at once
+
+    Returns:
+        Deduplicated list of claims
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+
+    n = len(claims)
+    kept = np.zeros(n, dtype=bool)
+    position = np.full(n, -1, dtype=np.int64)  # Index in deduplicated for kept claims
+    deduplicated: List[dict] = []
+    seen_hashes: Dict[str, dict] = {}
+
+    for block_start in range(0, n, block_size):
+        block_end = min(block_start + block_size, n)
+        similarities = vectors[block_start:block_end] @ vectors[:block_end].T
+
+        for row, i in enumerate(range(block_start, block_end)):
+            claim = claims[i]
+            text_hash = _normalized_hash(claim)
+            if text_hash in seen_hashes:
+                _merge_pages(seen_hashes[text_hash], claim)
+                continue
+
+            matches = np.flatnonzero((similarities[row, :i] >= similarity_threshold) & kept[:i])
+            if matches.size:
+                _merge_pages(deduplicated[position[matches[0]]], claim)
+            else:
+                kept[i] = True
+                position[i] = len(deduplicated)
+                deduplicated.append(claim)
+                seen_hashes[text_hash] = claim
+
+    return deduplicated
+
+
+async def deduplicate_claims_embedding(
+    claims: List[dict],
+    similarity_threshold: float = DEDUP_EMBED_THRESHOLD
+) -> List[dict]:
+    """Embed claims (through the embedding cache) and deduplicate them by cosine similarity"""
+    if not claims:
+        return []
+    vectors = await embed_with_cache([claim['claim_text'] for claim in claims])
+    return deduplicate_claims_by_vectors(claims, np.asarray(vectors, dtype=np.float32), similarity_threshold)
+
+
+async def deduplicate(claims: List[dict], method: Optional[str] = None) -> List[dict]:
+    """
+    Deduplicate claims with the configured method
+
+    Args:
+        claims: List of claim dictionaries
+        method: "minhash" (default), "embedding" or "exact" (pairwise scan); default DEDUP_METHOD
+
+    Returns:
+        Deduplicated list of claims
+    """
+    method = method or DEDUP_METHOD
+    if method == "embedding":
+        try:
+            return await deduplicate_claims_embedding(claims)
+        except Exception as e:
+            logger.warning(f"Embedding dedup failed ({e}), falling back to MinHash")
+    elif method == "exact":
+        return deduplicate_claims(claims, DEDUP_THRESHOLD)
+    return deduplicate_claims_minhash(claims, DEDUP_THRESHOLD)
@@ -0,0 +1,115 @@
+"""
+Document loaders module: Registry of per-format text extractors with lazily imported parsers
+"""
+import logging
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Set
+
+from app.config import TEXT_CACHE_ENABLED
+from app.manifest import file_sha256
+from app.text_cache import UncachedText, get_text_cache
+
+logger = logging.getLogger(__name__)
+
+# Pages extracted from internal PDFs (all pages in practice)
+INTERNAL_MAX_PAGES = 1000
+
+
+class DocumentLoader:
+    """
+    Text extractor for one or more file extensions
+
+    `extract(path)` yields the document text in pieces. Parser libraries are
+    imported inside `extract`, so formats that are never seen cost nothing.
+    Output of cacheable loaders is stored in the extracted-text cache; bump
+    `version` whenever the extracted text would change.
+    """
+
+    def __init__(self, name: str, extract: Callable[[Path], Iterable[str]], version: int = 1, cacheable: bool = True):
+        self.name = name
+        self.extract = extract
+        self.version = version
+        self.cacheable = cacheable
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}-v{self.version}"
+
+
+_loaders: Dict[str, DocumentLoader] = {}
+
+
+def register_loader(*extensions: str, name: Optional[str] = None, version: int = 1, cacheable: bool = True):
+    """Decorator registering a text extractor for the given extensions (e.g. '.pdf')"""
+    def decorator(extract: Callable[[Path], Iterable[str]]):
+        loader = DocumentLoader(name or extract.__name__, extract, version=version, cacheable=cacheable)
+        for extension in extensions:
+            _loaders[extension.lower()] = loader
+        return extract
+    return decorator
+
+
+def get_loader(file_path: Path) -> Optional[DocumentLoader]:
+    """Loader for a file, or None if its format is not supported"""
+    return _loaders.get(file_path.suffix.lower())
+
+
+def supported_extensions() -> Set[str]:
+    return set(_loaders)
+
+
+@register_loader('.pdf', name="pdf")
+def _extract_pdf(file_path: Path) -> Iterator[str]:
+    from app.pdf_extract import format_page, iter_pdf_pages
+    for i, (page_num, text) in enumerate(iter_pdf_pages(file_path, max_pages=INTERNAL_MAX_PAGES)):
+        piece = format_page(i, page_num, text)
+        # Only pages that failed to extract are empty; a retry may read them
+        yield piece if text else UncachedText(piece)
+
+
+@register_loader('.txt', '.md', name="text", cacheable=False)
+def _extract_text(file_path: Path, block_size: int = 1024 * 1024) -> Iterator[str]:
+    with open(file_path, encoding='utf-8') as f:
+        for block in iter(lambda: f.read(block_size), ''):
+            yield block
+
+
+@register_loader('.docx', name="docx")
+def _extract_docx(file_path: Path) -> Iterator[str]:
+    try:
+        from docx import Document
+    except ImportError:
+        logger.warning(f"python-docx not installed, skipping {file_path}")
+        return
+    doc = Document(file_path)
+    for i, para in enumerate(doc.paragraphs):
+        yield ('\n' if i > 0 else '') + para.text
+
+
+def iter_document_text(file_path: Path, content_hash: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield a document's text piece by piece (PDF pages, text blocks, DOCX paragraphs)
+
+    Text of PDF and DOCX files is served from the extracted-text cache when
+    the file content was parsed before.
+
+    Args:
+        file_path: Path to the document
+        content_hash: sha256 of the file if already known (computed otherwise)
+
+    Yields:
+        Consecutive pieces of the document text; "".join() gives the full text
+
+    Raises:
+        ImportError: If a required PDF library is not installed
+    """
+    loader = get_loader(file_path)
+    if loader is None:
+        return
+
+    if not (loader.cacheable and TEXT_CACHE_ENABLED):
+        yield from loader.extract(file_path)
+        return
+
+    content_hash = content_hash or file_sha256(file_path)
+    yield from get_text_cache().iter_text(content_hash, loader.cache_key, lambda: loader.extract(file_path))
@@ -0,0 +1,172 @@
+"""
+Embedding cache module: Persistent content-addressed cache of text embeddings (SQLite)
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+from app.config import CACHE_DIR, EMBED_MODEL, EMBED_CACHE_MAX_ENTRIES
+from app import ollama_client, metrics
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (embedding model, text hash)
+
+    Vectors are stored as float32 blobs. Entries carry a last-used timestamp
+    and the least recently used ones are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path: Path, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up embeddings; returns None for each text not in the cache"""
+        keys = [self.make_key(model, text) for text in texts]
+        found = {}
+
+        with self._lock:
+            # Chunk the IN clause to stay below SQLite's variable limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store embeddings and evict least recently used entries beyond max_entries"""
+        if self.max_entries <= 0:
+            return
+
+        now = time.time()
+        rows = [
+            (self.make_key(model, text), model, array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += self._conn.total_changes - before
+
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self._count -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache"""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(CACHE_DIR / "embeddings.sqlite3")
+            metrics.register_provider("embedding_cache", _cache.stats)
+        return _cache
+
+
+async def embed_with_cache(texts: List[str]) -> List[List[float]]:
+    """
+    Embed texts, serving cached vectors and sending only the misses to Ollama
+
+    Misses are de-duplicated and embedded in one batched request.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        One embedding vector per input text, in input order
+    """
+    if not texts:
+        return []
+
+    cache = get_embedding_cache()
+    vectors = await asyncio.to_thread(cache.get_many, EMBED_MODEL, texts)
+
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+    if missing:
+        new_vectors = await ollama_client.embed(missing)
+        await asyncio.to_thread(cache.put_many, EMBED_MODEL, missing, new_vectors)
+        by_text = dict(zip(missing, new_vectors))
+        vectors = [vector if vector is not None else by_text[text] for text, vector in zip(texts, vectors)]
+
+    return vectors
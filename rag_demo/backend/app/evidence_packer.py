@@ -0,0 +1,171 @@
+"""
+Evidence packer module: Fit the retrieved evidence of a claim into a token budget for the judge prompt
+"""
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.config import JUDGE_EVIDENCE_TOKENS
+from app.lexical_index import tokenize
+from app.models import Citation
+from app.utils import count_tokens
+
+_CHUNK_INDEX_RE = re.compile(r'_chunk_(\d+)$')
+# Sentence ends: CJK punctuation, or ASCII punctuation followed by whitespace ("12.5%" stays whole)
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[。！？；])|(?<=[.!?])\s+|\n+')
+_CJK_END = "。！？；，、"
+# Text without sentence punctuation (tables, lists) is cut into pieces of this many characters
+_MAX_SENTENCE_CHARS = 200
+# Shortest prefix of a chunk that counts as overlap with the previous chunk
+_MIN_OVERLAP_CHARS = 8
+_MAX_OVERLAP_CHARS = 2000
+
+
+def _chunk_index(citation: Citation) -> Optional[int]:
+    if citation.chunk_index is not None:
+        return citation.chunk_index
+    match = _CHUNK_INDEX_RE.search(citation.chunk_id)
+    return int(match.group(1)) if match else None
+
+
+def _overlap(previous: str, text: str) -> int:
+    """Length of the longest suffix of `previous` that `text` starts with"""
+    probe = text[:_MIN_OVERLAP_CHARS]
+    if len(probe) < _MIN_OVERLAP_CHARS:
+        return 0
+    # The first occurrence of the probe in the tail gives the longest candidate
+    pos = previous.find(probe, max(0, len(previous) - _MAX_OVERLAP_CHARS))
+    while pos != -1:
+        if text.startswith(previous[pos:]):
+            return len(previous) - pos
+        pos = previous.find(probe, pos + 1)
+    return 0
+
+
+def _split_sentences(text: str) -> List[str]:
+    sentences = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        sentence = sentence.strip()
+        for start in range(0, len(sentence), _MAX_SENTENCE_CHARS):
+            sentences.append(sentence[start:start + _MAX_SENTENCE_CHARS])
+    return sentences
+
+
+def _join_sentences(sentences: List[str]) -> str:
+    text = ""
+    for sentence in sentences:
+        if text and not (text[-1] in _CJK_END or text[-1] >= '\u3400' and sentence[0] >= '\u3400'):
+            text += " "
+        text += sentence
+    return text
+
+
+def _group_adjacent(citations: List[Citation]) -> List[List[Citation]]:
+    """
+    Group citations into runs of consecutive chunks of one document
+
+    Runs are ordered by their best-ranked citation; chunks within a run by position.
+    """
+    seen = set()
+    by_doc: Dict[str, List[Tuple[int, Optional[int], Citation]]] = {}
+    for rank, citation in enumerate(citations):
+        if citation.chunk_id in seen:
+            continue
+        seen.add(citation.chunk_id)
+        by_doc.setdefault(citation.doc_id, []).append((rank, _chunk_index(citation), citation))
+
+    runs: List[Tuple[int, List[Citation]]] = []
+    for entries in by_doc.values():
+        indexed = sorted((e for e in entries if e[1] is not None), key=lambda e: e[1])
+        runs.extend((rank, [citation]) for rank, index, citation in entries if index is None)
+        for entry in indexed:
+            rank, index, citation = entry
+            if runs and runs[-1][1][-1].doc_id == citation.doc_id and _chunk_index(runs[-1][1][-1]) == index - 1:
+                runs[-1] = (min(runs[-1][0], rank), runs[-1][1] + [citation])
+            else:
+                runs.append((rank, [citation]))
+    runs.sort(key=lambda run: run[0])
+    return [chunks for _, chunks in runs]
+
+
+def pack_evidence(claim_text: str, citations: List[Citation], budget: int = JUDGE_EVIDENCE_TOKENS) -> List[Dict]:
+    """
+    Merge, de-duplicate and trim the evidence of one claim to a token budget
+
+    Consecutive chunks of a document become one piece of evidence with the
+    overlap between them (CHUNK_OVERLAP) removed, and sentences repeated
+    across chunks are kept once. If the evidence is still over `budget`
+    tokens, each piece keeps its sentence that shares the most terms with the
+    claim, then the remaining budget goes to the best-matching sentences
+    overall. Kept sentences stay in document order ("……" marks dropped text),
+    each attributed to its chunk.
+
+    Args:
+        claim_text: The claim being judged
+        citations: Retrieved citations, best first (full chunk text when available, else the quote)
+        budget: Maximum tokens of evidence text (0 = no limit)
+
+    Returns:
+        Pieces of evidence in rank order: {"doc_title", "chunk_ids", "segments": [(chunk_id, text)]}
+    """
+    claim_terms = set(tokenize(claim_text))
+    runs = _group_adjacent(citations)
+
+    # (run, chunk_id, position, text, tokens, score) of every distinct sentence
+    sentences: List[Tuple[int, str, int, str, int, float]] = []
+    seen_sentences = set()
+    for run_index, run in enumerate(runs):
+        previous = None
+        for citation in run:
+            text = citation.text or citation.quote
+            if previous is not None:
+                text = text[_overlap(previous, text):]
+            previous = citation.text or citation.quote
+            for sentence in _split_sentences(text):
+                normalized = re.sub(r'\s+', ' ', sentence.lower())
+                if not sentence or normalized in seen_sentences:
+                    continue
+                seen_sentences.add(normalized)
+                terms = set(tokenize(sentence))
+                score = len(terms & claim_terms) / math.sqrt(len(terms)) if terms else 0.0
+                sentences.append((run_index, citation.chunk_id, len(sentences), sentence, count_tokens(sentence), score))
+
+    if budget > 0 and sum(s[4] for s in sentences) > budget:
+        kept = set()
+        used = 0
+
+        def take(sentence) -> None:
+            nonlocal used
+            if sentence[2] not in kept and used + sentence[4] <= budget:
+                kept.add(sentence[2])
+                used += sentence[4]
+
+        by_score = sorted(sentences, key=lambda s: (-s[5], s[0], s[2]))
+        best_per_run: Dict[int, tuple] = {}
+        for sentence in by_score:
+            best_per_run.setdefault(sentence[0], sentence)
+        for run_index in sorted(best_per_run):
+            take(best_per_run[run_index])
+        for sentence in by_score:
+            take(sentence)
+        sentences = [s for s in sentences if s[2] in kept]
+
+    pieces = []
+    for run_index, run in enumerate(runs):
+        segments: List[Tuple[str, List[str]]] = []
+        last_position = None
+        for _, chunk_id, position, sentence, _, _ in (s for s in sentences if s[0] == run_index):
+            if segments and segments[-1][0] == chunk_id:
+                if position != last_position + 1:
+                    segments[-1][1].append("……")
+                segments[-1][1].append(sentence)
+            else:
+                segments.append((chunk_id, [sentence]))
+            last_position = position
+        if segments:
+            pieces.append({
+                "doc_title": run[0].doc_title,
+                "chunk_ids": [chunk_id for chunk_id, _ in segments],
+                "segments": [(chunk_id, _join_sentences(texts)) for chunk_id, texts in segments],
+            })
+    return pieces
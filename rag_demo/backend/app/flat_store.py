@@ -0,0 +1,330 @@
+"""
+Flat vector store module: Exact search over normalized float32 vectors in a memory-mapped .npy file,
+optionally with an int8/float16 copy for the candidate scan
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "flat.json"
+QUANTIZATIONS = ("none", "float16", "int8")
+# Rows of quantized codes widened to float32 at a time during a scan (small enough to stay in cache)
+_SCORE_BLOCK = 256
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Compress float32 vectors for the candidate scan
+
+    Args:
+        vectors: Normalized float32 vectors (n x d)
+        quantization: "float16", or "int8" (symmetric, one float32 scale per row)
+
+    Returns:
+        (codes, scales); scales is None for float16
+    """
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0 if len(vectors) else np.empty(0, np.float32)
+        scales = np.where(scales == 0, 1.0, scales).astype(np.float32)
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization: {quantization} (expected one of {QUANTIZATIONS})")
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first"""
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class FlatCollection:
+    """
+    Chunk collection searched by one exact matrix-vector product per query
+
+    Implements the part of the ChromaDB collection API the app uses (add,
+    upsert, delete, get, query, count, metadata). Vectors are L2-normalized on add,
+    so query distances are cosine distances (1 - cosine similarity).
+
+    With quantization "float16" or "int8", queries scan a compressed copy of
+    the vectors (2x or 4x smaller) and only the best `rescore_factor * n`
+    candidates are re-scored against the full-precision rows, which stay on
+    disk in the memory-mapped file and are paged in on demand.
+
+    On disk a generation is a `vectors.<gen>.npy` matrix opened with
+    mmap_mode='r' plus a `chunks.<gen>.jsonl` file with each row's ID,
+    document and metadata; `flat.json` names the current generation and is
+    replaced atomically, so readers never see a half-written index. Writes
+    are kept in memory until `flush()`.
+    """
+
+    metadata = {"hnsw:space": "cosine"}
+
+    def __init__(self, path: Path, quantization: str = "none", rescore_factor: int = 4):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {QUANTIZATIONS})")
+        self.path = path
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self._lock = threading.RLock()
+        self._generation = 0
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[dict] = []
+        self._positions: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        # Rows added since the matrix was last assembled
+        self._pending: List[np.ndarray] = []
+        # Quantized copy of the vectors (and int8 row scales); rebuilt lazily after writes
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: Path, quantization: str = "none", rescore_factor: int = 4) -> Optional["FlatCollection"]:
+        """Open the current generation, or None if no index has been flushed yet"""
+        state_path = path / STATE_FILE
+        if not state_path.exists():
+            return None
+        collection = cls(path, quantization, rescore_factor)
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+        generation = state["generation"]
+        vectors = np.load(path / f"vectors.{generation}.npy", mmap_mode='r')
+        with open(path / f"chunks.{generation}.jsonl", encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                collection._ids.append(row["id"])
+                collection._documents.append(row["document"])
+                collection._metadatas.append(row["metadata"])
+        if len(collection._ids) != len(vectors):
+            raise ValueError(f"Flat index {path} is corrupt: {len(vectors)} vectors for {len(collection._ids)} chunks")
+        collection._generation = generation
+        collection._vectors = vectors
+        collection._positions = {chunk_id: i for i, chunk_id in enumerate(collection._ids)}
+        if quantization != "none":
+            if state.get("quantization") == quantization:
+                collection._codes = np.load(path / f"codes.{generation}.npy", mmap_mode='r')
+                if quantization == "int8":
+                    collection._scales = np.load(path / f"scales.{generation}.npy")
+            else:
+                # Written with other settings: quantize in memory on first query, persist on next flush
+                logger.info(f"Flat vector index has no {quantization} codes yet; they will be built in memory")
+        logger.info(
+            f"Opened flat vector index at {path} ({len(vectors)} vectors, generation {generation}, "
+            f"quantization {quantization})"
+        )
+        return collection
+
+    def _matrix(self) -> Optional[np.ndarray]:
+        """All vectors as one (n x d) matrix (blocking)"""
+        if self._pending:
+            parts = ([self._vectors] if self._vectors is not None and len(self._vectors) else []) + self._pending
+            self._vectors = np.concatenate(parts)
+            self._pending = []
+        return self._vectors
+
+    def _quantized(self) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Quantized codes and scales of all vectors, building them if writes invalidated them"""
+        if self._codes is None:
+            matrix = self._matrix()
+            matrix = np.empty((0, 0), dtype=np.float32) if matrix is None else np.asarray(matrix, dtype=np.float32)
+            self._codes, self._scales = quantize(matrix, self.quantization)
+        return self._codes, self._scales
+
+    def _approximate_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Similarities of each query to every vector, computed from the quantized codes"""
+        codes, scales = self._quantized()
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _SCORE_BLOCK):
+            block = np.asarray(codes[start:start + _SCORE_BLOCK], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    def _invalidate(self) -> None:
+        self._codes = None
+        self._scales = None
+        self._dirty = True
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._ids)
+
+    def add(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]) -> None:
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        with self._lock:
+            dim = self._dim()
+            if dim is not None and vectors.shape[1] != dim:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the index ({dim})")
+            existing = [chunk_id for chunk_id in ids if chunk_id in self._positions]
+            if existing:
+                self.delete(existing)
+            for chunk_id in ids:
+                self._positions[chunk_id] = len(self._ids)
+                self._ids.append(chunk_id)
+            self._documents.extend(documents)
+            self._metadatas.extend(metadatas)
+            self._pending.append(vectors)
+            self._invalidate()
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]) -> None:
+        """Same as add, which already replaces chunks with existing IDs (mirrors the ChromaDB API)"""
+        self.add(ids, embeddings, documents, metadatas)
+
+    def _dim(self) -> Optional[int]:
+        if self._pending:
+            return self._pending[0].shape[1]
+        if self._vectors is not None and len(self._vectors):
+            return self._vectors.shape[1]
+        return None
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            remove = {self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions}
+            if not remove:
+                return
+            keep = np.array([i for i in range(len(self._ids)) if i not in remove], dtype=np.int64)
+            matrix = self._matrix()
+            self._vectors = np.asarray(matrix[keep]) if matrix is not None else None
+            self._ids = [self._ids[i] for i in keep]
+            self._documents = [self._documents[i] for i in keep]
+            self._metadatas = [self._metadatas[i] for i in keep]
+            self._positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+            self._invalidate()
+
+    def get(self, ids: Optional[List[str]] = None, include: Optional[List[str]] = None,
+            limit: Optional[int] = None, offset: int = 0) -> Dict:
+        """Chunks by ID (in the order given, unknown IDs skipped), or a page of all chunks"""
+        include = ['documents', 'metadatas'] if include is None else include
+        with self._lock:
+            if ids is not None:
+                positions = [self._positions[chunk_id] for chunk_id in ids if chunk_id in self._positions]
+            else:
+                end = len(self._ids) if limit is None else min(len(self._ids), offset + limit)
+                positions = list(range(offset, end))
+
+            result = {'ids': [self._ids[i] for i in positions]}
+            if 'documents' in include:
+                result['documents'] = [self._documents[i] for i in positions]
+            if 'metadatas' in include:
+                result['metadatas'] = [self._metadatas[i] for i in positions]
+            if 'embeddings' in include:
+                matrix = self._matrix()
+                result['embeddings'] = np.asarray(matrix[positions]) if positions else np.empty((0, 0), np.float32)
+            return result
+
+    def query(self, query_embeddings, n_results: int = 10) -> Dict:
+        """
+        Top-n search by cosine similarity
+
+        Without quantization every vector is scored exactly. Otherwise the
+        quantized codes pick rescore_factor * n candidates per query, and
+        those are ranked by their exact full-precision scores.
+
+        Returns:
+            Dict of ids, distances, documents and metadatas, one list per query
+        """
+        queries = _normalize(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        result = {'ids': [], 'distances': [], 'documents': [], 'metadatas': []}
+        with self._lock:
+            matrix = self._matrix()
+            n = 0 if matrix is None else len(matrix)
+            k = min(n_results, n)
+            if k == 0:
+                for key in result:
+                    result[key] = [[] for _ in range(len(queries))]
+                return result
+
+            if self.quantization == "none":
+                ranked = []
+                for row in queries @ matrix.T:
+                    top = _top(row, k)
+                    ranked.append((top, row[top]))
+            else:
+                n_candidates = min(n, k * self.rescore_factor)
+                ranked = []
+                for query, row in zip(queries, self._approximate_scores(queries)):
+                    # Sorted row order keeps reads of the memory-mapped full-precision rows sequential
+                    candidates = np.sort(_top(row, n_candidates))
+                    exact = np.asarray(matrix[candidates]) @ query
+                    order = _top(exact, k)
+                    ranked.append((candidates[order], exact[order]))
+
+            for top, similarities in ranked:
+                result['ids'].append([self._ids[i] for i in top])
+                result['distances'].append([float(1.0 - similarity) for similarity in similarities])
+                result['documents'].append([self._documents[i] for i in top])
+                result['metadatas'].append([self._metadatas[i] for i in top])
+        return result
+
+    def stats(self) -> dict:
+        """Index size and bytes scanned per query (full precision vs quantized)"""
+        with self._lock:
+            matrix = self._matrix()
+            full_bytes = 0 if matrix is None else int(matrix.nbytes)
+            search_bytes = full_bytes
+            if self.quantization != "none" and matrix is not None and len(matrix):
+                codes, scales = self._quantized()
+                search_bytes = int(codes.nbytes) + (int(scales.nbytes) if scales is not None else 0)
+            return {
+                "vectors": len(self._ids),
+                "dimensions": 0 if matrix is None or not len(matrix) else int(matrix.shape[1]),
+                "quantization": self.quantization,
+                "full_precision_bytes": full_bytes,
+                "search_bytes": search_bytes,
+            }
+
+    def flush(self) -> None:
+        """Write pending changes as a new generation and remap it (blocking)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            generation = self._generation + 1
+            matrix = self._matrix()
+            if matrix is None:
+                matrix = np.empty((0, 0), dtype=np.float32)
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            np.save(self.path / f"vectors.{generation}.npy", np.ascontiguousarray(matrix, dtype=np.float32))
+            with open(self.path / f"chunks.{generation}.jsonl", 'w', encoding='utf-8') as f:
+                for chunk_id, document, metadata in zip(self._ids, self._documents, self._metadatas):
+                    f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}, ensure_ascii=False))
+                    f.write("\n")
+
+            if self.quantization != "none":
+                codes, scales = self._quantized()
+                np.save(self.path / f"codes.{generation}.npy", codes)
+                if scales is not None:
+                    np.save(self.path / f"scales.{generation}.npy", scales)
+
+            tmp_path = self.path / f"{STATE_FILE}.tmp"
+            state = {"generation": generation, "count": len(self._ids), "quantization": self.quantization}
+            tmp_path.write_text(json.dumps(state), encoding='utf-8')
+            os.replace(tmp_path, self.path / STATE_FILE)
+
+            # Old generations stay readable for processes that still map them (POSIX unlink semantics)
+            for pattern in ("vectors.*.npy", "chunks.*.jsonl", "codes.*.npy", "scales.*.npy"):
+                for old in self.path.glob(pattern):
+                    if old.name.split(".")[1] != str(generation):
+                        old.unlink(missing_ok=True)
+
+            self._generation = generation
+            self._vectors = np.load(self.path / f"vectors.{generation}.npy", mmap_mode='r')
+            if self.quantization != "none":
+                self._codes = np.load(self.path / f"codes.{generation}.npy", mmap_mode='r')
+            self._dirty = False
+            logger.info(f"Flat vector index saved ({len(self._ids)} vectors, generation {generation})")
@@ -1,179 +1,122 @@
 """
 Internal document indexing module: Load, chunk, embed, and index internal documents
 """
+import asyncio
+import hashlib
 import logging
+import time
 from pathlib import Path
 from typing import List, Dict
-import requests
-
-import chromadb
-from chromadb.config import Settings
 
 from app.config import (
-    INTERNAL_DATA_DIR, CHROMA_DIR, EMBED_MODEL, OLLAMA_BASE_URL,
-    CHUNK_SIZE, CHUNK_OVERLAP
+    INTERNAL_DATA_DIR, CHROMA_DIR, EMBED_MODEL,
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_UNIT, TOKENIZER_ENCODING, INDEX_CHECKPOINT_SECONDS
 )
-from app.utils import chunk_text, logger
+from app import ollama_client
+from app.vector_store import get_vector_store
+from app.manifest import DocumentManifest, plan_changes
+from app.index_pipeline import IndexingPipeline
+from app.document_loaders import iter_document_text, supported_extensions
+from app.text_cache import get_text_cache
+from app.lexical_index import BM25Index, get_lexical_index
+from app.utils import iter_chunks, CHUNKER_VERSION, logger
 
 logger = logging.getLogger(__name__)
 
 
-def get_embedding(text: str) -> List[float]:
+# Supported file extensions (one per registered loader)
+SUPPORTED_EXTENSIONS = supported_extensions()
+
+MANIFEST_PATH = CHROMA_DIR / "manifest.json"
+
+# Scheme of document and chunk IDs; indexes built with another scheme are rebuilt
+CHUNK_ID_SCHEME = "stem-path-sha1"
+
+
+def index_settings(store_name: str) -> Dict[str, object]:
     """
-    Get embedding for text using Ollama
+    Settings the indexed chunks depend on, recorded in the manifest
     
-    Args:
-        text: Text to embed
-    
-    Returns:
-        Embedding vector
+    Chunks built under any other value are all rebuilt: other chunking or
+    chunk IDs change the chunks themselves, and vectors from another embedding
+    model or endpoint (/api/embed normalizes, /api/embeddings did not) are not
+    comparable with the query embeddings.
     """
-    try:
-        url = f"{OLLAMA_BASE_URL}/api/embeddings"
-        payload = {
-            "model": EMBED_MODEL,
-            "prompt": text
-        }
-        
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        embedding = result.get("embedding", [])
-        
-        if not embedding:
-            raise ValueError("Ollama returned empty embedding")
-        
-        return embedding
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to get embedding: {e}")
-        raise ConnectionError(f"Failed to connect to Ollama for embeddings: {e}")
-
-
-def load_documents(data_dir: Path) -> List[Dict[str, str]]:
+    return {
+        "chunking": {
+            "version": CHUNKER_VERSION,
+            "unit": CHUNK_UNIT,
+            "size": CHUNK_SIZE,
+            "overlap": CHUNK_OVERLAP,
+            "encoding": TOKENIZER_ENCODING if CHUNK_UNIT == "tokens" else None,
+        },
+        "vector_backend": store_name,
+        "chunk_ids": CHUNK_ID_SCHEME,
+        "embedding": {"model": EMBED_MODEL, "endpoint": ollama_client.EMBED_ENDPOINT},
+    }
+
+
+def changed_settings(manifest: DocumentManifest, store_name: str) -> List[str]:
+    """Names of the index settings that differ from the ones the manifest was built with"""
+    return [
+        name for name, value in index_settings(store_name).items()
+        if manifest.settings.get(name) != value
+    ]
+
+
+def index_is_current() -> bool:
+    """Whether an index exists and was built with the current settings"""
+    manifest = DocumentManifest(MANIFEST_PATH).load()
+    return manifest.exists and not changed_settings(manifest, get_vector_store().name)
+
+
+def find_document_files(data_dir: Path) -> List[Path]:
     """
-    Load documents from data directory (PDF, TXT, MD, DOCX)
+    List supported document files under data_dir (recursively), in a stable order
     
     Args:
         data_dir: Directory containing internal documents
     
     Returns:
-        List of documents with metadata
+        Sorted list of file paths
     """
-    documents = []
-    
-    # Supported file extensions
-    extensions = {'.pdf', '.txt', '.md', '.docx'}
-    
     if not data_dir.exists():
         logger.warning(f"Data directory does not exist: {data_dir}")
-        return documents
-    
-    # First try direct files in the directory
-    for file_path in data_dir.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in extensions:
-            try:
-                if file_path.suffix.lower() == '.pdf':
-                    from app.pdf_extract import extract_full_text
-                    text = extract_full_text(file_path, max_pages=1000)  # Load all pages for internal docs
-                elif file_path.suffix.lower() in ['.txt', '.md']:
-                    text = file_path.read_text(encoding='utf-8')
-                elif file_path.suffix.lower() == '.docx':
-                    try:
-                        from docx import Document
-                        doc = Document(file_path)
-                        text = '\n'.join([para.text for para in doc.paragraphs])
-                    except ImportError:
-                        logger.warning(f"python-docx not installed, skipping {file_path}")
-                        continue
-                    except Exception as e:
-                        logger.warning(f"Failed to read DOCX {file_path}: {e}")
-                        continue
-                else:
-                    continue
-                
-                if text.strip():
-                    documents.append({
-                        'doc_id': file_path.stem,
-                        'doc_title': file_path.name,
-                        'doc_path': str(file_path),
-                        'text': text
-                    })
-                    logger.info(f"Loaded document: {file_path.name} ({len(text)} chars)")
-                    
-            except ImportError as import_err:
-                error_msg = str(import_err)
-                if "pypdf" in error_msg.lower() or "pdfplumber" in error_msg.lower():
-                    logger.error(f"PDF library not installed. Please install: pip install pypdf pdfplumber")
-                    logger.error(f"Or install all dependencies: pip install -r requirements.txt")
-                else:
-                    logger.error(f"Missing required library for {file_path}: {import_err}")
-                    logger.error("Please install required dependencies: pip install -r requirements.txt")
-                raise
-            except Exception as e:
-                logger.error(f"Failed to load {file_path}: {e}")
-                import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                # Don't raise here, continue with other files
-                continue
-    
-    # Also try rglob for subdirectories
-    for file_path in data_dir.rglob('*'):
-        if file_path.is_file() and file_path.suffix.lower() in extensions:
-            # Skip if already processed
-            if any(doc['doc_path'] == str(file_path) for doc in documents):
-                continue
-            try:
-                if file_path.suffix.lower() == '.pdf':
-                    from app.pdf_extract import extract_full_text
-                    text = extract_full_text(file_path, max_pages=1000)  # Load all pages for internal docs
-                elif file_path.suffix.lower() in ['.txt', '.md']:
-                    text = file_path.read_text(encoding='utf-8')
-                elif file_path.suffix.lower() == '.docx':
-                    try:
-                        from docx import Document
-                        doc = Document(file_path)
-                        text = '\n'.join([para.text for para in doc.paragraphs])
-                    except ImportError:
-                        logger.warning(f"python-docx not installed, skipping {file_path}")
-                        continue
-                    except Exception as e:
-                        logger.warning(f"Failed to read DOCX {file_path}: {e}")
-                        continue
-                else:
-                    continue
-                
-                if text.strip():
-                    documents.append({
-                        'doc_id': file_path.stem,
-                        'doc_title': file_path.name,
-                        'doc_path': str(file_path),
-                        'text': text
-                    })
-                    logger.info(f"Loaded document: {file_path.name} ({len(text)} chars)")
-                    
-            except Exception as e:
-                logger.error(f"Failed to load {file_path}: {e}")
-    
-    return documents
-
-
-def index_internal_documents():
+        return []
+    
+    return sorted(
+        file_path for file_path in data_dir.rglob('*')
+        if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
+
+def document_id(key: str) -> str:
     """
-    Main function to index all internal documents
-    Processes company/EDU/company_data.pdf and stores in vector DB
+    Document ID of a file, from its path relative to the data directory
+    
+    The stem keeps IDs readable; the path hash keeps files with the same stem
+    (a/q3.pdf and b/q3.pdf, or q3.pdf and q3.docx) from sharing chunk IDs.
     """
-    logger.info("Starting internal document indexing")
+    return f"{Path(key).stem}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+
+def document_metadata(file_path: Path, key: str) -> Dict[str, str]:
+    """Metadata stored with every chunk of a document"""
+    return {
+        'doc_id': document_id(key),
+        'doc_title': file_path.name,
+        'doc_path': str(file_path)
+    }
+
+
+def resolve_internal_dir() -> Path:
+    """Resolve INTERNAL_DATA_DIR to an existing absolute directory"""
     logger.info(f"Looking for documents in: {INTERNAL_DATA_DIR}")
     # INTERNAL_DATA_DIR is already resolved in config.py, but ensure it's absolute
     internal_dir = Path(INTERNAL_DATA_DIR).resolve()
     logger.info(f"Absolute path: {internal_dir}")
     logger.info(f"Path exists: {internal_dir.exists()}")
     
-    # Ensure we use resolved absolute path
-    internal_dir = Path(INTERNAL_DATA_DIR).resolve()
-    
     # Verify directory exists
     if not internal_dir.exists():
         logger.error(f"Directory does not exist: {internal_dir}")
@@ -192,103 +135,209 @@ def index_internal_documents():
         else:
             raise FileNotFoundError(f"Internal data directory not found: {internal_dir}")
     
-    # Load documents
-    documents = load_documents(internal_dir)
-    
-    if not documents:
-        logger.warning(f"No documents found in {internal_dir}")
-        logger.warning(f"Absolute path: {internal_dir}")
-        logger.warning(f"Expected file: {internal_dir / 'company_data.pdf'}")
-        # List actual files in directory
-        if internal_dir.exists():
-            actual_files = list(internal_dir.glob('*'))
-            logger.warning(f"Actual files in directory: {[f.name for f in actual_files]}")
-            # Check if PDF extraction failed
-            pdf_files = list(internal_dir.glob('*.pdf'))
-            if pdf_files:
-                logger.error(f"PDF files found but extraction failed. Check if PDF libraries are installed:")
-                logger.error(f"  pip install pypdf pdfplumber")
-        raise ValueError(f"No documents found in {internal_dir}. Please check if PDF libraries are installed: pip install pypdf pdfplumber")
-    
-    logger.info(f"Found {len(documents)} document(s) to index:")
-    for doc in documents:
-        logger.info(f"  - {doc['doc_title']} ({len(doc['text'])} characters)")
-    
-    # Initialize ChromaDB
-    client = chromadb.PersistentClient(
-        path=str(CHROMA_DIR),
-        settings=Settings(anonymized_telemetry=False)
-    )
+    return internal_dir
+
+
+def _report_missing_documents(internal_dir: Path) -> None:
+    """Log diagnostics and raise when no indexable documents were found"""
+    logger.warning(f"No documents found in {internal_dir}")
+    logger.warning(f"Absolute path: {internal_dir}")
+    logger.warning(f"Expected file: {internal_dir / 'company_data.pdf'}")
+    # List actual files in directory
+    if internal_dir.exists():
+        actual_files = list(internal_dir.glob('*'))
+        logger.warning(f"Actual files in directory: {[f.name for f in actual_files]}")
+        # Check if PDF extraction failed
+        pdf_files = list(internal_dir.glob('*.pdf'))
+        if pdf_files:
+            logger.error(f"PDF files found but extraction failed. Check if PDF libraries are installed:")
+            logger.error(f"  pip install pypdf pdfplumber")
+    raise ValueError(f"No documents found in {internal_dir}. Please check if PDF libraries are installed: pip install pypdf pdfplumber")
+
+
+def rebuild_lexical_index(collection, lexical_index: BM25Index, page_size: int = 1000) -> int:
+    """
+    Rebuild the BM25 index from the chunks stored in the collection
+    
+    Args:
+        collection: Vector store collection to read chunks from
+        lexical_index: Index to rebuild
+        page_size: Chunks read per collection.get call
     
-    # Get or create collection
-    collection = client.get_or_create_collection(
-        name="internal_documents",
-        metadata={"description": "Internal company documents for rebuttal"}
+    Returns:
+        Number of chunks indexed
+    """
+    logger.info("Rebuilding lexical index from the vector store")
+    lexical_index.clear()
+    indexed = 0
+    while True:
+        page = collection.get(include=['documents'], limit=page_size, offset=indexed)
+        if not page['ids']:
+            break
+        lexical_index.add(page['ids'], page['documents'])
+        indexed += len(page['ids'])
+    logger.info(f"Lexical index rebuilt with {indexed} chunks")
+    return indexed
+
+
+# Indexing runs (/api/reindex, /api/check_and_index) share the manifest and collection, so only one runs at a time
+_index_lock = asyncio.Lock()
+
+
+async def index_internal_documents() -> Dict[str, int]:
+    """
+    Main function to index all internal documents
+    Processes company/EDU/company_data.pdf and stores in vector DB
+    
+    Indexing is incremental: a manifest of each file's size, mtime, content
+    hash and chunk IDs is kept next to the vector store. Only new or edited
+    files are re-chunked and re-embedded; chunks of edited or removed files
+    are deleted and everything else is left alone.
+    
+    Every chunk is also added to a BM25 lexical index stored next to the
+    collection, used by hybrid retrieval.
+    
+    Text of PDF and DOCX files is cached by content hash, so a file whose
+    bytes were parsed before (e.g. after a rebuild or rename) is not parsed again.
+    
+    Changed documents flow through IndexingPipeline page by page: text is
+    chunked as it is extracted, so memory stays bounded by the pipeline's
+    queues rather than document or corpus size. Chunk batches are embedded
+    by concurrent workers and written by a single writer behind a bounded
+    queue. Parsing and vector store writes run in worker threads, so
+    indexing does not stall the server's event loop.
+    
+    Concurrent calls are serialized; a call that waited for another run
+    finds the documents that run indexed unchanged.
+    
+    Returns:
+        Counts of indexed, unchanged and removed files, added/deleted chunks and throughput
+    """
+    async with _index_lock:
+        return await _index_internal_documents()
+
+
+async def _index_internal_documents() -> Dict[str, int]:
+    logger.info("Starting internal document indexing")
+    internal_dir = resolve_internal_dir()
+    
+    file_paths = await asyncio.to_thread(find_document_files, internal_dir)
+    if not file_paths:
+        _report_missing_documents(internal_dir)
+    files = {file_path.relative_to(internal_dir).as_posix(): file_path for file_path in file_paths}
+    
+    # Get or create collection on the shared vector store handle
+    store = get_vector_store()
+    collection = await asyncio.to_thread(store.get_or_create_collection)
+    
+    lexical_index = get_lexical_index()
+    manifest = DocumentManifest(MANIFEST_PATH).load()
+    
+    # An index built before manifests existed cannot be diffed: rebuild it
+    if not manifest.exists and collection.count() > 0:
+        logger.info(f"Collection has {collection.count()} items but no manifest. Rebuilding index.")
+        existing_ids = (await asyncio.to_thread(collection.get, include=[]))['ids']
+        if existing_ids:
+            await asyncio.to_thread(collection.delete, ids=existing_ids)
+        await asyncio.to_thread(lexical_index.clear)
+    
+    # Chunks built with other chunking, chunk IDs, vector backend or embeddings are all rebuilt
+    changed = changed_settings(manifest, store.name)
+    rechunk = manifest.exists and bool(changed)
+    if rechunk:
+        logger.info(f"Index settings changed since the last index ({', '.join(changed)}). Re-indexing all documents.")
+    manifest.settings.update(index_settings(store.name))
+    
+    plan = await asyncio.to_thread(plan_changes, manifest, files, rechunk)
+    logger.info(
+        f"Found {len(files)} document(s): {len(plan['changed'])} new/changed, "
+        f"{len(plan['unchanged'])} unchanged, {len(plan['removed'])} removed"
     )
     
-    # Check if collection already has data - if yes, skip indexing
-    if collection.count() > 0:
-        logger.info(f"Collection already exists with {collection.count()} items. Skipping indexing.")
-        return
-    
-    # Process each document
-    all_chunks = []
-    all_metadatas = []
-    all_ids = []
-    
-    for doc in documents:
-        # Chunk the document
-        chunks = chunk_text(doc['text'], chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        
-        logger.info(f"Chunked {doc['doc_title']} into {len(chunks)} chunks")
-        
-        # Create embeddings and metadata for each chunk
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{doc['doc_id']}_chunk_{i}"
+    # Delete chunks of removed and edited files
+    stale_ids = []
+    for key in plan['removed'] + plan['changed']:
+        stale_ids.extend(manifest.remove(key))
+    if stale_ids:
+        await asyncio.to_thread(collection.delete, ids=stale_ids)
+        await asyncio.to_thread(lexical_index.delete, stale_ids)
+        logger.info(f"Deleted {len(stale_ids)} stale chunks")
+    
+    # The lexical index mirrors the collection; rebuild it if it is missing or out of sync
+    if await asyncio.to_thread(lexical_index.count) != await asyncio.to_thread(collection.count):
+        await asyncio.to_thread(rebuild_lexical_index, collection, lexical_index)
+    
+    file_stats = {}
+    indexed = {"files": 0, "chunks": 0}
+    last_checkpoint = {"at": time.monotonic()}
+    
+    async def checkpoint():
+        # The manifest is saved only after the chunks it lists are persisted, so failures are retried
+        await asyncio.to_thread(store.flush)
+        await asyncio.to_thread(manifest.save)
+        last_checkpoint["at"] = time.monotonic()
+    
+    async def changed_documents():
+        for key in plan['changed']:
+            file_path = files[key]
+            file_stats[key] = file_path.stat()
             
-            all_chunks.append(chunk)
-            all_metadatas.append({
-                'doc_id': doc['doc_id'],
-                'doc_title': doc['doc_title'],
-                'doc_path': doc['doc_path'],
-                'chunk_id': chunk_id,
-                'chunk_index': i
-            })
-            all_ids.append(chunk_id)
-    
-    # Batch embed and add to collection
-    logger.info(f"Generating embeddings for {len(all_chunks)} chunks...")
-    batch_size = 10
-    
-    for i in range(0, len(all_chunks), batch_size):
-        batch_chunks = all_chunks[i:i+batch_size]
-        batch_ids = all_ids[i:i+batch_size]
-        batch_metadatas = all_metadatas[i:i+batch_size]
-        
-        # Get embeddings
-        embeddings = []
-        for chunk in batch_chunks:
-            try:
-                embedding = get_embedding(chunk)
-                embeddings.append(embedding)
-            except Exception as e:
-                logger.error(f"Failed to embed chunk {batch_ids[len(embeddings)]}: {e}")
-                # Use zero vector as fallback (not ideal, but allows processing to continue)
-                embeddings.append([0.0] * 768)
-        
-        # Add to collection
-        collection.add(
-            ids=batch_ids,
-            embeddings=embeddings,
-            documents=batch_chunks,
-            metadatas=batch_metadatas
-        )
-        
-        logger.info(f"Indexed batch {i//batch_size + 1}/{(len(all_chunks) + batch_size - 1)//batch_size}")
-    
-    logger.info(f"Successfully indexed {collection.count()} chunks from {len(documents)} documents")
-    logger.info(f"ChromaDB collection saved to {CHROMA_DIR}")
+            # Pages stream straight into the chunker; the pipeline pulls chunks as it needs them
+            chunks = iter_chunks(
+                iter_document_text(file_path, plan['hashes'][key]),
+                chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, unit=CHUNK_UNIT
+            )
+            logger.info(f"Streaming {file_path.name} into the indexing pipeline")
+            yield key, document_metadata(file_path, key), chunks
+    
+    async def document_indexed(key: str, chunk_ids: List[str]):
+        # All chunks of the file are written; it reaches the saved manifest at the next checkpoint
+        stat = file_stats[key]
+        manifest.set(key, stat.st_size, stat.st_mtime, plan['hashes'][key], chunk_ids, document_id(key))
+        indexed["files"] += 1
+        indexed["chunks"] += len(chunk_ids)
+        if time.monotonic() - last_checkpoint["at"] >= INDEX_CHECKPOINT_SECONDS:
+            await checkpoint()
+    
+    pipeline = IndexingPipeline(collection, on_document_indexed=document_indexed, lexical_index=lexical_index)
+    throughput = await pipeline.run(changed_documents())
+    await checkpoint()
+    
+    # Keep extracted text only for files that are still indexed
+    await asyncio.to_thread(
+        get_text_cache().prune, {entry['sha256'] for entry in manifest.entries.values()}
+    )
+    
+    if not manifest.entries:
+        _report_missing_documents(internal_dir)
+    
+    if plan['changed'] or plan['removed']:
+        # Index changed: make every module re-read the collection and drop cached results
+        store.bump_version()
+        store.reload()
+    
+    logger.info(
+        f"Indexed {indexed['files']} document(s) ({indexed['chunks']} chunks added, {len(stale_ids)} deleted); "
+        f"collection now has {store.count()} chunks"
+    )
+    logger.info(f"Vector store ({store.name}) saved to {store.path}")
+    
+    return {
+        "indexed_files": indexed['files'],
+        "unchanged_files": len(plan['unchanged']),
+        "removed_files": len(plan['removed']),
+        "chunks_added": indexed['chunks'],
+        "chunks_deleted": len(stale_ids),
+        "chunks_per_sec": throughput['chunks_per_sec'],
+    }
+
+
+async def _main():
+    try:
+        await index_internal_documents()
+    finally:
+        await ollama_client.close_client()
 
 
 if __name__ == "__main__":
-    index_internal_documents()
+    asyncio.run(_main())
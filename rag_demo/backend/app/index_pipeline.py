@@ -0,0 +1,219 @@
+"""
+Index pipeline module: Concurrent batched embedding with a bounded queue in front of the vector store writer
+"""
+import asyncio
+import logging
+import time
+from itertools import islice
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import INDEX_BATCH_SIZE, INDEX_EMBED_WORKERS, INDEX_QUEUE_SIZE
+from app.embedding_cache import embed_with_cache
+
+logger = logging.getLogger(__name__)
+
+
+class IndexingPipeline:
+    """
+    Three-stage indexing pipeline: chunk producer -> embedding workers -> writer
+
+    The producer pulls each document's chunks lazily, a batch at a time, onto
+    a bounded queue, so a document is never fully materialized. A pool of workers embeds batches concurrently (one batched request
+    per batch) and hands them to a second bounded queue drained by a single
+    writer that calls collection.upsert (and indexes the same chunks in the
+    BM25 lexical index, if given). Upserts overwrite chunks left behind by
+    a run that crashed before recording its document in the manifest. Full queues block the stage in front
+    of them, so memory stays bounded and embedding overlaps with writes.
+    A document whose text cannot be loaded or whose chunks cannot be
+    embedded is dropped: its chunks are deleted and it is never reported
+    as indexed, so it stays out of the manifest and is retried next run.
+    """
+
+    def __init__(
+        self,
+        collection,
+        on_document_indexed: Callable[[str, List[str]], Awaitable[None]],
+        lexical_index=None,
+        batch_size: int = INDEX_BATCH_SIZE,
+        workers: int = INDEX_EMBED_WORKERS,
+        queue_size: int = INDEX_QUEUE_SIZE
+    ):
+        self.collection = collection
+        self.on_document_indexed = on_document_indexed
+        self.lexical_index = lexical_index
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+
+        self.chunks_written = 0
+        self._failed_chunk_ids: List[str] = []
+        self._started_at = 0.0
+
+    @property
+    def chunks_per_sec(self) -> float:
+        elapsed = time.perf_counter() - self._started_at
+        return self.chunks_written / elapsed if elapsed > 0 else 0.0
+
+    async def run(self, documents: AsyncIterator[Tuple[str, Dict[str, str], Iterable[str]]]) -> dict:
+        """
+        Index documents as they are produced
+
+        Args:
+            documents: Async iterator of (key, document metadata, chunks); chunks may be a lazy iterator
+
+        Returns:
+            Throughput statistics: chunks written, elapsed seconds, chunks/sec
+        """
+        self._started_at = time.perf_counter()
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        active_workers = [self.workers]
+
+        async def produce():
+            async for key, doc, chunks in documents:
+                await self._enqueue_document(embed_queue, key, doc, chunks)
+            for _ in range(self.workers):
+                await embed_queue.put(None)
+
+        async def embed_worker():
+            while (batch := await embed_queue.get()) is not None:
+                if not batch["document"]["failed"]:
+                    batch["embeddings"] = await self._embed(batch["texts"], batch["ids"])
+                    if batch["embeddings"] is None:
+                        logger.error(f"Failed to embed {batch['key']}, skipping it until the next run")
+                        self._fail_document(batch["document"])
+                await write_queue.put(batch)
+            active_workers[0] -= 1
+            if active_workers[0] == 0:
+                await write_queue.put(None)
+
+        async def write():
+            while (batch := await write_queue.get()) is not None:
+                await self._write(batch)
+
+        tasks = [asyncio.create_task(produce()), asyncio.create_task(write())]
+        tasks += [asyncio.create_task(embed_worker()) for _ in range(self.workers)]
+
+        try:
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if self._failed_chunk_ids:
+            # Failed documents are not in the manifest; drop their partial chunks
+            await asyncio.to_thread(self.collection.delete, ids=self._failed_chunk_ids)
+            if self.lexical_index is not None:
+                await asyncio.to_thread(self.lexical_index.delete, self._failed_chunk_ids)
+            logger.info(f"Deleted {len(self._failed_chunk_ids)} chunks of documents that failed to load")
+
+        elapsed = time.perf_counter() - self._started_at
+        stats = {
+            "chunks": self.chunks_written,
+            "seconds": round(elapsed, 3),
+            "chunks_per_sec": round(self.chunks_written / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+        logger.info(
+            f"Indexed {stats['chunks']} chunks in {stats['seconds']}s "
+            f"({stats['chunks_per_sec']} chunks/sec, {self.workers} embedding workers)"
+        )
+        return stats
+
+    async def _enqueue_document(self, queue: asyncio.Queue, key: str, doc: Dict[str, str], chunks: Iterable[str]) -> None:
+        # Whitespace-only chunks carry nothing to retrieve
+        chunk_iter = filter(str.strip, chunks)
+        state = {"chunk_ids": [], "pending": 0, "done": False, "failed": False}
+
+        try:
+            while not state["failed"]:
+                # Extraction and chunking are blocking; pull the next batch in a worker thread
+                texts = await asyncio.to_thread(lambda: list(islice(chunk_iter, self.batch_size)))
+                if not texts:
+                    break
+
+                first = len(state["chunk_ids"])
+                chunk_ids = [f"{doc['doc_id']}_chunk_{i}" for i in range(first, first + len(texts))]
+                state["chunk_ids"].extend(chunk_ids)
+                state["pending"] += 1
+                await queue.put({
+                    "key": key,
+                    "document": state,
+                    "ids": chunk_ids,
+                    "texts": texts,
+                    "metadatas": [
+                        {
+                            'doc_id': doc['doc_id'],
+                            'doc_title': doc['doc_title'],
+                            'doc_path': doc['doc_path'],
+                            'chunk_id': chunk_id,
+                            'chunk_index': first + i
+                        }
+                        for i, chunk_id in enumerate(chunk_ids)
+                    ],
+                })
+        except ImportError:
+            raise
+        except Exception as e:
+            # Skip this document (it stays out of the manifest and is retried next run)
+            logger.error(f"Failed to load {doc['doc_path']}: {e}")
+            self._fail_document(state)
+            return
+
+        state["done"] = True
+        if state["pending"] == 0:
+            await self._finish_document(key, state)
+
+    def _fail_document(self, state: dict) -> None:
+        """Drop a document: its chunks enqueued so far are deleted at the end of the run, the rest are not written"""
+        if not state["failed"]:
+            state["failed"] = True
+            self._failed_chunk_ids.extend(state["chunk_ids"])
+
+    async def _finish_document(self, key: str, state: dict) -> None:
+        if state["failed"]:
+            return
+        if not state["chunk_ids"]:
+            logger.warning(f"Skipping {key}: no text extracted")
+            return
+        await self.on_document_indexed(key, state["chunk_ids"])
+
+    def _write_sync(self, batch: dict) -> None:
+        self.collection.upsert(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["texts"],
+            metadatas=batch["metadatas"]
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.add(batch["ids"], batch["texts"])
+
+    async def _embed(self, texts: List[str], ids: List[str]) -> Optional[List[List[float]]]:
+        """Embed a batch; on failure retry chunk by chunk, returning None if a chunk still fails"""
+        try:
+            return await embed_with_cache(texts)
+        except Exception as e:
+            logger.warning(f"Batch embedding failed ({e}), retrying {len(texts)} chunks individually")
+
+        embeddings = []
+        for text, chunk_id in zip(texts, ids):
+            try:
+                embeddings.append((await embed_with_cache([text]))[0])
+            except Exception as e:
+                logger.error(f"Failed to embed chunk {chunk_id}: {e}")
+                return None
+        return embeddings
+
+    async def _write(self, batch: dict) -> None:
+        state = batch["document"]
+        if not state["failed"]:
+            await asyncio.to_thread(self._write_sync, batch)
+            self.chunks_written += len(batch["ids"])
+            logger.info(f"Indexed {self.chunks_written} chunks ({self.chunks_per_sec:.1f} chunks/sec)")
+
+        state["pending"] -= 1
+        if state["done"] and state["pending"] == 0:
+            await self._finish_document(batch["key"], state)
@@ -0,0 +1,173 @@
+"""
+Jobs module: Run claim analysis as background jobs with progress tracking and event streaming
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.config import MAX_FINISHED_JOBS
+from app.models import Claim, ClaimAnalysis, AnalysisReport, AnalyzeJobStatus
+from app.analysis import analyze_claims_concurrently
+from app.report import create_analysis_report, save_analysis_report
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisJob:
+    """
+    State of a single background analysis job
+
+    Every state change is appended to `events`, so subscribers that connect
+    late replay the full history before waiting for new events.
+    """
+
+    def __init__(self, report_id: str, claims: List[Claim]):
+        self.job_id = str(uuid.uuid4())
+        self.report_id = report_id
+        self.claims = claims
+        self.status = "pending"
+        self.analyses: List[ClaimAnalysis] = []
+        self.report: Optional[AnalysisReport] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.events: List[Dict[str, str]] = []
+        self.task: Optional[asyncio.Task] = None
+        self._condition = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    async def _emit(self, event: str, data: dict) -> None:
+        async with self._condition:
+            self.events.append({"event": event, "data": json.dumps(data, ensure_ascii=False, default=str)})
+            self._condition.notify_all()
+
+    async def add_analysis(self, analysis: ClaimAnalysis) -> None:
+        """Record a finished claim and notify subscribers"""
+        self.analyses.append(analysis)
+        await self._emit("claim", {
+            "completed_claims": len(self.analyses),
+            "total_claims": len(self.claims),
+            "analysis": analysis.model_dump(mode="json")
+        })
+
+    async def complete(self, report: AnalysisReport) -> None:
+        self.report = report
+        self.status = "completed"
+        self.finished_at = datetime.now()
+        await self._emit("complete", report.model_dump(mode="json"))
+
+    async def fail(self, error: str) -> None:
+        self.error = error
+        self.status = "failed"
+        self.finished_at = datetime.now()
+        await self._emit("error", {"error": error})
+
+    def to_status(self) -> AnalyzeJobStatus:
+        return AnalyzeJobStatus(
+            job_id=self.job_id,
+            report_id=self.report_id,
+            status=self.status,
+            total_claims=len(self.claims),
+            completed_claims=len(self.analyses),
+            claim_analyses=self.analyses,
+            report=self.report,
+            error=self.error,
+            created_at=self.created_at,
+            finished_at=self.finished_at
+        )
+
+    async def stream_events(self) -> AsyncIterator[str]:
+        """
+        Yield Server-Sent Events for this job, starting from its first event
+
+        The stream ends after the "complete" or "error" event.
+        """
+        index = 0
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: len(self.events) > index or self.finished)
+                new_events = self.events[index:]
+
+            for event in new_events:
+                yield f"event: {event['event']}\ndata: {event['data']}\n\n"
+            index += len(new_events)
+
+            if self.finished and index >= len(self.events):
+                return
+
+
+class JobManager:
+    """In-memory registry of analysis jobs for this process"""
+
+    def __init__(self, max_finished_jobs: int = MAX_FINISHED_JOBS):
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self._jobs.get(job_id)
+
+    def start(
+        self,
+        report_id: str,
+        claims: List[Claim],
+        top_k: int,
+        concurrency: Optional[int] = None
+    ) -> AnalysisJob:
+        """
+        Create a job and start analyzing its claims in the background
+
+        Args:
+            report_id: Report the claims belong to
+            claims: Claims to analyze
+            top_k: Number of documents to retrieve per claim
+            concurrency: Maximum in-flight claims
+
+        Returns:
+            The newly created job
+        """
+        self._prune()
+        job = AnalysisJob(report_id, claims)
+        self._jobs[job.job_id] = job
+        job.task = asyncio.create_task(self._run(job, top_k, concurrency))
+        logger.info(f"Started analysis job {job.job_id} for report {report_id} ({len(claims)} claims)")
+        return job
+
+    async def _run(self, job: AnalysisJob, top_k: int, concurrency: Optional[int]) -> None:
+        job.status = "running"
+        try:
+            analyses = await analyze_claims_concurrently(
+                job.claims, top_k=top_k, concurrency=concurrency, on_result=job.add_analysis
+            )
+            report = create_analysis_report(job.report_id, job.claims, analyses)
+            await asyncio.to_thread(save_analysis_report, report)
+            await job.complete(report)
+            logger.info(f"Analysis job {job.job_id} completed")
+        except asyncio.CancelledError:
+            await job.fail("Job cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Analysis job {job.job_id} failed: {e}")
+            await job.fail(str(e))
+
+    def _prune(self) -> None:
+        """Drop the oldest finished jobs beyond max_finished_jobs"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    async def shutdown(self) -> None:
+        """Cancel all running jobs"""
+        tasks = [job.task for job in self._jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+job_manager = JobManager()
@@ -1,18 +1,26 @@
 """
 Judge module: Evaluate whether a claim is fully/partially/not addressed by evidence
 """
+import asyncio
 import logging
-import json
-import re
-from typing import List
-import requests
+import time
+from contextlib import aclosing, nullcontext
+from typing import Any, Dict, List, Optional, Tuple, Type
 
-from app.config import OLLAMA_BASE_URL, LLM_MODEL, TEMPERATURE
-from app.models import Claim, ClaimAnalysis, Citation
-from app.utils import logger
+import httpx
+from pydantic import BaseModel, ValidationError
+
+from app.config import LLM_MODEL, TEMPERATURE, JUDGE_STREAM, JUDGE_CACHE_ENABLED, JUDGE_EVIDENCE_TOKENS
+from app.models import BatchJudgment, Claim, ClaimAnalysis, ClaimJudgment, ClaimVerdict, Citation
+from app import ollama_client, metrics, structured_output
+from app.evidence_packer import pack_evidence
+from app.judgment_cache import JudgmentCache, get_judgment_cache
+from app.utils import JSONObjectScanner, logger
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever JUDGMENT_CRITERIA or the judge prompt changes, so cached judgments are not reused
+JUDGE_PROMPT_VERSION = 3
 
 JUDGMENT_CRITERIA = """
 ## 评判标准 (Judgment Criteria)
@@ -50,42 +58,97 @@ JUDGMENT_CRITERIA = """
 """
 
 
-def judge_claim(claim: Claim, citations: List[Citation]) -> ClaimAnalysis:
+async def _stream_judgment(payload: Dict[str, Any], claim_id: str) -> str:
     """
-    Judge whether a claim is fully/partially/not addressed by the evidence
+    Stream the judge response and stop generation once the JSON object closes
     
-    Args:
-        claim: The claim to judge
-        citations: Retrieved evidence citations
+    Records time-to-first-token and total latency in app.metrics.
     
     Returns:
-        ClaimAnalysis object with judgment results
+        The complete JSON object text, or everything received if no complete object was seen
     """
-    logger.info(f"Judging claim {claim.claim_id}: {claim.claim_text[:100]}...")
+    scanner = JSONObjectScanner()
+    parts = []
+    start = time.perf_counter()
+    ttft = None
     
-    # Build context from citations
-    if not citations:
-        # No evidence found
-        return ClaimAnalysis(
-            claim_id=claim.claim_id,
-            coverage="not_addressed",
-            reasoning="未找到相关内部证据。需要进一步检索或收集相关文档。",
-            citations=[],
-            confidence=0,
-            gaps=["需要查找与论点相关的内部文档", "可能需要审计报告、财务报表、合同等"],
-            recommended_actions=["扩大检索范围", "收集相关内部文档", "咨询相关部门"]
-        )
+    async with aclosing(ollama_client.stream_chat(payload, operation="judge")) as stream:
+        async for piece in stream:
+            if ttft is None:
+                ttft = time.perf_counter() - start
+                metrics.record_latency("judge_ttft", ttft)
+            parts.append(piece)
+            if scanner.feed(piece):
+                # Closing the stream aborts the remaining generation
+                break
     
-    # Format citations for prompt
-    citations_text = "\n\n".join([
-        f"[证据 {i+1}]\n"
-        f"文档: {cit.doc_title}\n"
-        f"分块ID: {cit.chunk_id}\n"
-        f"引用: {cit.quote}\n"
-        for i, cit in enumerate(citations)
-    ])
+    elapsed = time.perf_counter() - start
+    metrics.record_latency("judge_stream_total", elapsed)
+    if scanner.complete:
+        metrics.increment("judge_stream_early_stops")
     
-    prompt = f"""你是一位专业的财务分析师，负责评估空头报告的论点是否被内部证据充分反驳。
+    ttft_text = f"{ttft:.2f}s" if ttft is not None else "n/a"
+    logger.info(
+        f"Judge stream for {claim_id}: ttft={ttft_text}, total={elapsed:.2f}s, "
+        f"stopped_early={scanner.complete}"
+    )
+    return scanner.result if scanner.complete else "".join(parts)
+
+
+SYSTEM_PROMPT = "你是一位专业的财务分析师，擅长评估证据质量。总是返回有效的JSON格式。"
+
+
+def _no_evidence_analysis(claim: Claim) -> ClaimAnalysis:
+    """Analysis for a claim with no retrieved evidence (no LLM call needed)"""
+    return ClaimAnalysis(
+        claim_id=claim.claim_id,
+        coverage="not_addressed",
+        reasoning="未找到相关内部证据。需要进一步检索或收集相关文档。",
+        citations=[],
+        confidence=0,
+        gaps=["需要查找与论点相关的内部文档", "可能需要审计报告、财务报表、合同等"],
+        recommended_actions=["扩大检索范围", "收集相关内部文档", "咨询相关部门"]
+    )
+
+
+def _format_citations(claim: Claim, citations: List[Citation], label: str = "证据") -> str:
+    """
+    Evidence section of the judge prompt
+
+    With JUDGE_EVIDENCE_TOKENS set, citations are packed first: adjacent
+    chunks are merged, overlaps removed and the evidence trimmed to the
+    sentences most relevant to the claim, each tagged with its chunk ID.
+    """
+    if JUDGE_EVIDENCE_TOKENS <= 0:
+        return "\n\n".join([
+            f"[{label} {i+1}]\n"
+            f"文档: {cit.doc_title}\n"
+            f"分块ID: {cit.chunk_id}\n"
+            f"引用: {cit.quote}\n"
+            for i, cit in enumerate(citations)
+        ])
+    
+    pieces = pack_evidence(claim.claim_text, citations, JUDGE_EVIDENCE_TOKENS)
+    sections = []
+    for i, piece in enumerate(pieces):
+        if len(piece["segments"]) == 1:
+            quote = piece["segments"][0][1]
+        else:
+            quote = "\n".join(f"({chunk_id}) {text}" for chunk_id, text in piece["segments"])
+        sections.append(
+            f"[{label} {i+1}]\n"
+            f"文档: {piece['doc_title']}\n"
+            f"分块ID: {', '.join(piece['chunk_ids'])}\n"
+            f"引用: {quote}\n"
+        )
+    return "\n\n".join(sections)
+
+
+def build_judge_prompt(claim: Claim, citations: List[Citation]) -> str:
+    """User prompt judging one claim against its evidence"""
+    citations_text = _format_citations(claim, citations)
+    
+    return f"""你是一位专业的财务分析师，负责评估空头报告的论点是否被内部证据充分反驳。
 
 {JUDGMENT_CRITERIA}
 
@@ -119,90 +182,200 @@ ID: {claim.claim_id}
 
 返回ONLY有效的JSON，不要包含其他文本。"""
 
-    try:
-        # Call Ollama API
-        url = f"{OLLAMA_BASE_URL}/api/chat"
-        payload = {
-            "model": LLM_MODEL,
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "你是一位专业的财务分析师，擅长评估证据质量。总是返回有效的JSON格式。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "options": {
-                "temperature": TEMPERATURE,
-                "num_predict": 2000
-            },
-            "stream": False
-        }
-        
-        response = requests.post(url, json=payload, timeout=180)
-        response.raise_for_status()
-        
-        result = response.json()
-        content = result.get("message", {}).get("content", "")
-        
-        if not content:
-            raise ValueError("LLM returned empty response")
-        
-        # Extract JSON from response
-        json_match = re.search(r'\{[\s\S]*\}', content)
-        if json_match:
-            json_str = json_match.group(0)
-        else:
-            json_str = content.strip()
-        
-        # Parse JSON
-        judgment_data = json.loads(json_str)
-        
-        # Validate and create ClaimAnalysis
-        coverage = judgment_data.get("coverage", "not_addressed")
-        if coverage not in ["fully_addressed", "partially_addressed", "not_addressed"]:
-            coverage = "not_addressed"
-        
-        reasoning = judgment_data.get("reasoning", "无法生成分析")
-        # Convert reasoning to string if it's a list
-        if isinstance(reasoning, list):
-            reasoning = "\n".join([f"• {item}" if not item.startswith("•") else item for item in reasoning])
-        elif not isinstance(reasoning, str):
-            reasoning = str(reasoning)
-        
-        confidence = int(judgment_data.get("confidence", 0))
-        confidence = max(0, min(100, confidence))  # Clamp to 0-100
-        
-        gaps = judgment_data.get("gaps", [])
-        if coverage == "fully_addressed":
-            gaps = None
-        
-        recommended_actions = judgment_data.get("recommended_actions", [])
-        if not recommended_actions and coverage != "fully_addressed":
-            recommended_actions = ["需要进一步调查", "收集更多证据"]
-        
-        # Filter citations to only those actually used (if we can determine)
-        # For now, include all citations
-        used_citations = citations
-        
-        analysis = ClaimAnalysis(
-            claim_id=claim.claim_id,
-            coverage=coverage,
-            reasoning=reasoning,
-            citations=used_citations,
-            confidence=confidence,
-            gaps=gaps if gaps else None,
-            recommended_actions=recommended_actions if recommended_actions else None
+
+def build_batch_judge_prompt(items: List[Tuple[Claim, List[Citation]]]) -> str:
+    """User prompt judging several claims, each against its own evidence, in one request"""
+    sections = "\n\n".join(
+        f"""### 论点 {claim.claim_id}
+类型: {claim.claim_type}
+内容: {claim.claim_text}
+出现页码: {claim.page_numbers}
+
+检索到的证据 (Retrieved Evidence):
+{_format_citations(claim, citations, label=f"{claim.claim_id} 证据")}"""
+        for claim, citations in items
+    )
+    
+    return f"""你是一位专业的财务分析师，负责评估空头报告的论点是否被内部证据充分反驳。
+
+{JUDGMENT_CRITERIA}
+
+## 论点与证据 (Claims and Evidence):
+以下共有 {len(items)} 个论点，每个论点只能依据其自己的证据进行评估。
+
+{sections}
+
+## 任务 (Task):
+请根据评判标准，分别评估上述每个论点，并返回JSON格式的结果。
+
+输出格式 (JSON):
+{{
+  "verdicts": [
+    {{
+      "claim_id": "论点ID",
+      "coverage": "fully_addressed" | "partially_addressed" | "not_addressed",
+      "reasoning": "5-10个要点，基于证据进行分析，使用项目符号格式",
+      "confidence": 0-100的整数,
+      "gaps": ["缺失的证据类型1", "缺失的证据类型2"] (如果未完全解决),
+      "recommended_actions": ["建议行动1", "建议行动2"]
+    }}
+  ]
+}}
+
+重要提示:
+- verdicts 必须为每个论点各包含一项，claim_id 与上文一致
+- 必须严格遵循评判标准
+- 如果证据薄弱或不相关，必须分类为"not_addressed"
+- 必须引用所有使用的证据片段（在reasoning中明确提及）
+- reasoning必须包含5-10个要点
+- 如果coverage不是"fully_addressed"，必须提供gaps和recommended_actions
+
+返回ONLY有效的JSON，不要包含其他文本。"""
+
+
+def _judge_cache_key(claim: Claim, citations: List[Citation], variant: str) -> str:
+    # Key on the evidence the prompt is built from: packing reads the full chunk text, not the quote
+    if JUDGE_EVIDENCE_TOKENS > 0:
+        chunks = [(cit.chunk_id, cit.text or cit.quote) for cit in citations]
+    else:
+        chunks = [(cit.chunk_id, cit.quote) for cit in citations]
+    return JudgmentCache.make_key(
+        claim.claim_text, claim.claim_type, chunks,
+        LLM_MODEL, TEMPERATURE, JUDGE_PROMPT_VERSION, JUDGE_EVIDENCE_TOKENS, variant
+    )
+
+
+async def _cached_analysis(claim: Claim, citations: List[Citation], variant: str = "single") -> Optional[ClaimAnalysis]:
+    """Memoized analysis for these inputs and prompt variant ("single" or "batch"), or None"""
+    if not JUDGE_CACHE_ENABLED:
+        return None
+    cached = await asyncio.to_thread(get_judgment_cache().get, _judge_cache_key(claim, citations, variant))
+    if cached is None:
+        return None
+    logger.info(f"Judgment for {claim.claim_id}: {cached['coverage']} (cached)")
+    return ClaimAnalysis(claim_id=claim.claim_id, citations=citations, **cached)
+
+
+async def _remember(claim: Claim, citations: List[Citation], analysis: ClaimAnalysis, variant: str = "single") -> None:
+    if JUDGE_CACHE_ENABLED:
+        await asyncio.to_thread(
+            get_judgment_cache().put, _judge_cache_key(claim, citations, variant), LLM_MODEL, JUDGE_PROMPT_VERSION,
+            analysis.model_dump(exclude={"claim_id", "citations"})
         )
+
+
+async def _chat(prompt: str, label: str, response_model: Type[BaseModel], num_predict: int = 2000) -> str:
+    """
+    Send a judge prompt to the LLM and return the reply text
+    
+    Generation is constrained to the JSON schema of `response_model`. Streams (stopping once the JSON object closes) when JUDGE_STREAM is set.
+    Non-streamed replies also add Ollama's prompt/completion token counts to
+    the judge_prompt_tokens / judge_completion_tokens counters.
+    """
+    payload = {
+        "model": LLM_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "options": {
+            "temperature": TEMPERATURE,
+            "num_predict": num_predict
+        },
+        "format": structured_output.response_format(response_model),
+        "stream": False
+    }
+    
+    if JUDGE_STREAM:
+        return await _stream_judgment(payload, label)
+    
+    start = time.perf_counter()
+    response = await ollama_client.post("/api/chat", payload, operation="judge")
+    response.raise_for_status()
+    
+    result = response.json()
+    metrics.record_latency("judge_total", time.perf_counter() - start)
+    if "prompt_eval_count" in result:
+        metrics.increment("judge_prompt_tokens", result["prompt_eval_count"])
+    if "eval_count" in result:
+        metrics.increment("judge_completion_tokens", result["eval_count"])
+    return result.get("message", {}).get("content", "")
+
+
+def _analysis_from_judgment(claim: Claim, citations: List[Citation], judgment: ClaimJudgment) -> ClaimAnalysis:
+    """Build the ClaimAnalysis from one validated verdict of the LLM"""
+    coverage = judgment.coverage
+    confidence = max(0, min(100, judgment.confidence))  # Clamp to 0-100
+    
+    gaps = judgment.gaps
+    if coverage == "fully_addressed":
+        gaps = None
+    
+    recommended_actions = judgment.recommended_actions
+    if not recommended_actions and coverage != "fully_addressed":
+        recommended_actions = ["需要进一步调查", "收集更多证据"]
+    
+    # Filter citations to only those actually used (if we can determine)
+    # For now, include all citations
+    used_citations = citations
+    
+    analysis = ClaimAnalysis(
+        claim_id=claim.claim_id,
+        coverage=coverage,
+        reasoning=judgment.reasoning or "无法生成分析",
+        citations=used_citations,
+        confidence=confidence,
+        gaps=gaps if gaps else None,
+        recommended_actions=recommended_actions if recommended_actions else None
+    )
+    
+    logger.info(f"Judgment for {claim.claim_id}: {coverage} (confidence: {confidence})")
+    return analysis
+
+
+async def judge_claim(claim: Claim, citations: List[Citation]) -> ClaimAnalysis:
+    """
+    Judge whether a claim is fully/partially/not addressed by the evidence
+    
+    Args:
+        claim: The claim to judge
+        citations: Retrieved evidence citations
+    
+    Returns:
+        ClaimAnalysis object with judgment results
+    
+    Successful judgments are memoized in the judgment cache (JUDGE_CACHE_ENABLED);
+    error fallbacks are not, so a retry calls the LLM again.
+    """
+    logger.info(f"Judging claim {claim.claim_id}: {claim.claim_text[:100]}...")
+    
+    # Build context from citations
+    if not citations:
+        # No evidence found
+        return _no_evidence_analysis(claim)
+    
+    cached = await _cached_analysis(claim, citations)
+    if cached is not None:
+        return cached
+    
+    prompt = build_judge_prompt(claim, citations)
+
+    try:
+        content = await _chat(prompt, claim.claim_id, ClaimJudgment)
+        judgment = structured_output.parse(ClaimJudgment, content, "judge")
         
-        logger.info(f"Judgment for {claim.claim_id}: {coverage} (confidence: {confidence})")
+        analysis = _analysis_from_judgment(claim, citations, judgment)
+        await _remember(claim, citations, analysis)
         return analysis
         
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse JSON from LLM response: {e}")
-        logger.debug(f"LLM response: {content[:500]}")
+    except ValidationError as e:
+        logger.error(f"Invalid judgment from LLM for {claim.claim_id}: {e.error_count()} error(s)")
         # Return default analysis
         return ClaimAnalysis(
             claim_id=claim.claim_id,
@@ -213,18 +386,104 @@ ID: {claim.claim_id}
             gaps=["需要人工审核"],
             recommended_actions=["检查LLM响应格式"]
         )
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Failed to call Ollama API: {e}")
         raise ConnectionError(f"Failed to connect to Ollama: {e}")
     except Exception as e:
         logger.error(f"Error judging claim: {e}")
         # Return default analysis
-        return ClaimAnalysis(
-            claim_id=claim.claim_id,
-            coverage="not_addressed",
-            reasoning=f"处理过程中出现错误: {str(e)}",
-            citations=citations,
-            confidence=0,
-            gaps=["需要重新处理"],
-            recommended_actions=["检查系统错误"]
-        )
+        return _error_analysis(claim, citations, e)
+
+
+def _error_analysis(claim: Claim, citations: List[Citation], error: Exception) -> ClaimAnalysis:
+    """Analysis recorded for a claim whose judgment failed"""
+    return ClaimAnalysis(
+        claim_id=claim.claim_id,
+        coverage="not_addressed",
+        reasoning=f"处理过程中出现错误: {str(error)}",
+        citations=citations,
+        confidence=0,
+        gaps=["需要重新处理"],
+        recommended_actions=["检查系统错误"]
+    )
+
+
+async def judge_claims_batch(
+    items: List[Tuple[Claim, List[Citation]]],
+    semaphore: Optional[asyncio.Semaphore] = None
+) -> List[ClaimAnalysis]:
+    """
+    Judge several claims with one LLM request
+    
+    The judgment criteria and system prompt are sent once for the whole
+    batch instead of once per claim, and the model answers with a
+    "verdicts" array keyed by claim_id. Claims without evidence or with a
+    cached judgment are answered without the LLM. Batched verdicts are
+    cached apart from single-claim ones, so judge_claim never returns them. If the reply cannot be
+    parsed, every claim is judged on its own with judge_claim; claims
+    missing from an otherwise valid reply are judged on their own too.
+    These per-claim fallbacks run concurrently. Never raises: a fallback
+    that cannot reach Ollama yields an error analysis for its claim.
+    
+    Args:
+        items: (claim, citations) pairs
+        semaphore: Optional limit on LLM requests in flight, held for the
+            batched request and for each per-claim fallback
+    
+    Returns:
+        One ClaimAnalysis per item, in input order
+    """
+    results: Dict[int, ClaimAnalysis] = {}
+    pending: List[int] = []
+    for i, (claim, citations) in enumerate(items):
+        if not citations:
+            results[i] = _no_evidence_analysis(claim)
+            continue
+        # Single-claim verdicts (e.g. from fallbacks) are reused here, never the other way round
+        cached = await _cached_analysis(claim, citations, "batch") or await _cached_analysis(claim, citations)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+    
+    limit = semaphore or nullcontext()
+    
+    async def judge_alone(i: int) -> None:
+        claim, citations = items[i]
+        try:
+            async with limit:
+                results[i] = await judge_claim(claim, citations)
+        except ConnectionError as e:
+            results[i] = _error_analysis(claim, citations, e)
+    
+    verdicts: Dict[str, ClaimVerdict] = {}
+    if len(pending) > 1:
+        batch = [items[i] for i in pending]
+        claim_ids = ", ".join(claim.claim_id for claim, _ in batch)
+        logger.info(f"Judging {len(batch)} claims in one request: {claim_ids}")
+        
+        try:
+            async with limit:
+                content = await _chat(
+                    build_batch_judge_prompt(batch), f"batch[{claim_ids}]", BatchJudgment, num_predict=2000 * len(batch)
+                )
+            for verdict in structured_output.parse(BatchJudgment, content, "judge_batch").verdicts:
+                verdicts[verdict.claim_id] = verdict
+        except Exception as e:
+            logger.warning(f"Batched judgment failed ({e}), judging {len(batch)} claims individually")
+            metrics.increment("judge_batch_fallbacks")
+    
+    fallbacks = []
+    for i in pending:
+        claim, citations = items[i]
+        verdict = verdicts.get(claim.claim_id)
+        if verdict is not None:
+            results[i] = _analysis_from_judgment(claim, citations, verdict)
+            await _remember(claim, citations, results[i], "batch")
+            continue
+        if verdicts:
+            logger.warning(f"Batched reply has no verdict for {claim.claim_id}, judging it individually")
+        fallbacks.append(i)
+    await asyncio.gather(*(judge_alone(i) for i in fallbacks))
+    
+    return [results[i] for i in range(len(items))]
@@ -0,0 +1,151 @@
+"""
+Judgment cache module: Persistent memoization of claim judgments (SQLite)
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from app.config import CACHE_DIR
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class JudgmentCache:
+    """
+    On-disk cache of judge results keyed by everything the judgment depends on
+
+    The key hashes the claim text and type, the cited chunks, the LLM model,
+    the sampling temperature, the judge prompt version and the evidence
+    token budget. Entries store the judgment fields only (coverage,
+    reasoning, confidence, gaps, actions); the claim ID and citations are
+    supplied by the caller on a hit.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judgments ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " prompt_version INTEGER NOT NULL,"
+            " judgment TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_judgments_model ON judgments(model, prompt_version)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        claim_text: str,
+        claim_type: str,
+        chunks: List[Tuple[str, str]],
+        model: str,
+        temperature: float,
+        prompt_version: int,
+        evidence_tokens: int = 0,
+        variant: str = "single"
+    ) -> str:
+        """
+        Hash of a judge call's inputs
+
+        Args:
+            chunks: (chunk_id, evidence text) of each citation in prompt order, where the
+                text is whatever the prompt is built from (the quote, or the full chunk
+                text when evidence is packed); it is included because chunk IDs are
+                reused when a document is re-chunked
+            evidence_tokens: Evidence token budget the prompt was packed to (0 = unpacked)
+            variant: Prompt the claim was judged with ("single", or "batch" for batched judging)
+        """
+        payload = json.dumps(
+            [claim_text, claim_type, chunks, model, temperature, prompt_version, evidence_tokens, variant],
+            ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached judgment fields, or None on a miss"""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT judgment FROM judgments WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Judgment cache lookup failed: {e}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, prompt_version: int, judgment: dict) -> None:
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO judgments (key, model, prompt_version, judgment, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, model, prompt_version, json.dumps(judgment, ensure_ascii=False), time.time())
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to store judgment in cache: {e}")
+
+    def invalidate(self, model: Optional[str] = None, prompt_version: Optional[int] = None) -> int:
+        """
+        Delete entries of a model and/or prompt version (all entries if neither is given)
+
+        Returns:
+            Number of entries deleted
+        """
+        conditions, params = [], []
+        if model is not None:
+            conditions.append("model = ?")
+            params.append(model)
+        if prompt_version is not None:
+            conditions.append("prompt_version = ?")
+            params.append(prompt_version)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            deleted = self._conn.execute(f"DELETE FROM judgments{where}", params).rowcount
+            self._conn.commit()
+        logger.info(f"Invalidated {deleted} cached judgment(s) (model={model}, prompt_version={prompt_version})")
+        return deleted
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM judgments").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[JudgmentCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_judgment_cache() -> JudgmentCache:
+    """Get the process-wide judgment cache"""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = JudgmentCache(CACHE_DIR / "judgments.sqlite3")
+            metrics.register_provider("judgment_cache", _cache.stats)
+        return _cache
@@ -0,0 +1,166 @@
+"""
+Lexical index module: BM25 inverted index over indexed chunks, stored in SQLite next to the vector store
+"""
+import logging
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import CHROMA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Latin words, tickers and numbers ("nyse:edu" -> nyse, edu; "12.5%" -> 12.5), or runs of CJK characters
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:[.\-][a-z0-9]+)*|[\u3400-\u9fff\uf900-\ufaff]+')
+# Thousands separators inside numbers: "1,234,567" -> "1234567"
+_THOUSANDS_RE = re.compile(r'(?<=\d),(?=\d{3}(?!\d))')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms
+
+    Latin text is lowercased into words; Chinese has no spaces, so each run of
+    CJK characters becomes overlapping character bigrams (a single character
+    stays a unigram). Exact figures, tickers and names survive as whole terms.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(_THOUSANDS_RE.sub('', text.lower())):
+        if token[0] >= '\u3400':
+            if len(token) == 1:
+                terms.append(token)
+            else:
+                terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Inverted index of chunk terms with BM25 ranking
+
+    Postings (term, chunk_id, term frequency) and chunk lengths live in SQLite,
+    so the index is updated incrementally alongside the vector store and can
+    be shared by the server and the indexing process.
+    """
+
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS chunks (chunk_id TEXT PRIMARY KEY, length INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            " term TEXT NOT NULL,"
+            " chunk_id TEXT NOT NULL,"
+            " tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id)")
+        self._conn.commit()
+
+    def add(self, chunk_ids: List[str], texts: List[str]) -> None:
+        """Index chunks (replacing any existing entries with the same IDs)"""
+        chunk_rows, posting_rows = [], []
+        for chunk_id, text in zip(chunk_ids, texts):
+            terms = Counter(tokenize(text))
+            chunk_rows.append((chunk_id, sum(terms.values())))
+            posting_rows.extend((term, chunk_id, tf) for term, tf in terms.items())
+
+        with self._lock:
+            self._delete(chunk_ids)
+            self._conn.executemany("INSERT INTO chunks (chunk_id, length) VALUES (?, ?)", chunk_rows)
+            self._conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            self._conn.commit()
+
+    def _delete(self, chunk_ids: List[str]) -> None:
+        for i in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+
+    def delete(self, chunk_ids: List[str]) -> None:
+        with self._lock:
+            self._delete(chunk_ids)
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def search(self, query: str, limit: int) -> List[Tuple[str, float]]:
+        """
+        Rank chunks for a query with BM25
+
+        Args:
+            query: Query text
+            limit: Maximum number of hits
+
+        Returns:
+            (chunk_id, score) pairs, best first
+        """
+        return self.search_many([query], limit)[0]
+
+    def search_many(self, queries: List[str], limit: int) -> List[List[Tuple[str, float]]]:
+        """Rank chunks for several queries; one result list per query"""
+        with self._lock:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not total:
+                return [[] for _ in queries]
+            return [self._search(query, limit, total, avg_length or 1.0) for query in queries]
+
+    def _search(self, query: str, limit: int, total: int, avg_length: float) -> List[Tuple[str, float]]:
+        terms = set(tokenize(query))
+        doc_freqs = {
+            term: self._conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+            for term in terms
+        }
+        # Terms in more than half the chunks barely move BM25 scores; skip their long posting lists
+        selective = {term: df for term, df in doc_freqs.items() if 0 < df <= total / 2}
+        if not selective:
+            selective = {term: df for term, df in doc_freqs.items() if df > 0}
+
+        scores: Dict[str, float] = {}
+        for term, df in selective.items():
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            rows = self._conn.execute(
+                "SELECT p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.chunk_id = p.chunk_id"
+                " WHERE p.term = ?",
+                (term,)
+            )
+            for chunk_id, tf, length in rows:
+                norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+
+
+def get_lexical_index() -> BM25Index:
+    """Get the process-wide BM25 index"""
+    global _index
+
+    with _index_lock:
+        if _index is None:
+            _index = BM25Index(CHROMA_DIR / "lexical.sqlite3")
+        return _index
@@ -0,0 +1,129 @@
+"""
+Manifest module: Track indexed files (size, mtime, content hash, chunk IDs) for incremental indexing
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: Path, block_size: int = 1024 * 1024) -> str:
+    """Hash a file's content without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentManifest:
+    """
+    Record of every indexed file, stored as JSON next to the vector store
+
+    Each entry is keyed by the file path relative to the data directory and
+    holds its size, mtime, sha256, document ID and the chunk IDs written for it, so a
+    reindex can skip unchanged files and delete the chunks of edited or
+    removed ones.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        # Settings the indexed chunks depend on (e.g. chunking); a mismatch means a full reindex
+        self.settings: Dict[str, dict] = {}
+        self.exists = False
+
+    def load(self) -> "DocumentManifest":
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+                if data.get("version") == MANIFEST_VERSION:
+                    self.entries = data.get("files", {})
+                    self.settings = data.get("settings", {})
+                    self.exists = True
+                else:
+                    logger.warning(f"Ignoring manifest with unsupported version: {self.path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read manifest {self.path}: {e}")
+        return self
+
+    def save(self) -> None:
+        """Write the manifest atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text(
+            json.dumps(
+                {"version": MANIFEST_VERSION, "settings": self.settings, "files": self.entries},
+                ensure_ascii=False, indent=2
+            ),
+            encoding='utf-8'
+        )
+        os.replace(tmp_path, self.path)
+        self.exists = True
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def set(self, key: str, size: int, mtime: float, sha256: str, chunk_ids: List[str], doc_id: str) -> None:
+        self.entries[key] = {
+            "size": size,
+            "mtime": mtime,
+            "sha256": sha256,
+            "doc_id": doc_id,
+            "chunk_ids": chunk_ids,
+        }
+
+    def remove(self, key: str) -> List[str]:
+        """Drop an entry, returning the chunk IDs it owned"""
+        entry = self.entries.pop(key, None)
+        return entry["chunk_ids"] if entry else []
+
+
+def plan_changes(manifest: DocumentManifest, files: Dict[str, Path], force: bool = False) -> dict:
+    """
+    Compare files on disk with the manifest
+
+    Files whose size and mtime match are unchanged without being read. Otherwise
+    the content hash decides; a touched-but-identical file only gets its
+    manifest stat updated.
+
+    Args:
+        manifest: Loaded manifest (updated in place for touched-but-identical files)
+        files: Mapping of manifest key to file path for every file on disk
+        force: Treat every file as changed (e.g. after chunking settings changed)
+
+    Returns:
+        Dict with "changed" (new or edited), "unchanged" and "removed" manifest keys,
+        and "hashes" holding the sha256 computed for each changed file
+    """
+    changed, unchanged = [], []
+    hashes = {}
+
+    for key, file_path in files.items():
+        stat = file_path.stat()
+        entry = manifest.get(key)
+        if force:
+            changed.append(key)
+            hashes[key] = file_sha256(file_path)
+            continue
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            unchanged.append(key)
+            continue
+
+        sha256 = file_sha256(file_path)
+        if entry and entry["sha256"] == sha256:
+            entry["size"] = stat.st_size
+            entry["mtime"] = stat.st_mtime
+            unchanged.append(key)
+        else:
+            changed.append(key)
+            hashes[key] = sha256
+
+    removed = [key for key in manifest.entries if key not in files]
+    return {"changed": changed, "unchanged": unchanged, "removed": removed, "hashes": hashes}
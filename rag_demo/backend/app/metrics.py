@@ -0,0 +1,67 @@
+"""
+Metrics module: In-process latency statistics and counters exposed via /api/metrics
+"""
+import threading
+from typing import Callable, Dict
+
+
+class LatencyStat:
+    """Running latency statistics (seconds) for one operation"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = None
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "avg_seconds": round(self.total / self.count, 4) if self.count else None,
+            "min_seconds": round(self.min, 4) if self.min is not None else None,
+            "max_seconds": round(self.max, 4) if self.max is not None else None,
+            "last_seconds": round(self.last, 4) if self.last is not None else None,
+        }
+
+
+_lock = threading.Lock()
+_latencies: Dict[str, LatencyStat] = {}
+_counters: Dict[str, int] = {}
+_providers: Dict[str, Callable[[], dict]] = {}
+
+
+def record_latency(name: str, seconds: float) -> None:
+    """Record one latency sample for the named operation"""
+    with _lock:
+        _latencies.setdefault(name, LatencyStat()).record(seconds)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Increment a named counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def register_provider(name: str, provider: Callable[[], dict]) -> None:
+    """Register a callable whose dict output is included in the snapshot under `name`"""
+    _providers[name] = provider
+
+
+def snapshot() -> dict:
+    """Current values of all latencies, counters and registered providers"""
+    with _lock:
+        data = {
+            "latencies": {name: stat.to_dict() for name, stat in _latencies.items()},
+            "counters": dict(_counters),
+        }
+    for name, provider in _providers.items():
+        data[name] = provider()
+    return data
@@ -0,0 +1,126 @@
+"""
+Model residency module: Preload Ollama models at startup and keep them loaded while the server runs
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from app.config import LLM_MODEL, EMBED_MODEL, KEEP_WARM_INTERVAL
+from app import ollama_client, metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _same_model(name: str, model: str) -> bool:
+    """Whether an /api/ps entry names the model ("llama3" is "llama3:latest")"""
+    def canonical(value: str) -> str:
+        return value if ":" in value else f"{value}:latest"
+    return canonical(name) == canonical(model)
+
+
+class ModelResidencyManager:
+    """
+    Keeps the chat and embedding models loaded in Ollama
+
+    At startup each model is loaded with an empty request (so the first user
+    call does not pay the cold-load time), then every `interval` seconds a
+    keep-warm probe re-sends the load request, which resets Ollama's
+    keep_alive timer and reloads a model that was evicted, and reads
+    /api/ps to record which models are resident.
+    """
+
+    def __init__(self, models: Dict[str, str], interval: float = KEEP_WARM_INTERVAL):
+        """
+        Args:
+            models: Model name by role ("llm", "embed")
+            interval: Seconds between keep-warm probes (0 = warm up once, no probe)
+        """
+        self.models = models
+        self.interval = interval
+        self._status: Dict[str, dict] = {
+            role: {"model": model, "resident": None, "expires_at": None, "last_load_seconds": None,
+                   "last_probe": None, "error": None}
+            for role, model in models.items()
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load(self, role: str) -> None:
+        """Load (or keep loaded) one model; records the time Ollama took"""
+        model = self.models[role]
+        if role == "embed":
+            path, payload = "/api/embed", {"model": model, "input": ["warmup"]}
+        else:
+            # A generate request without a prompt only loads the model
+            path, payload = "/api/generate", {"model": model}
+
+        start = time.perf_counter()
+        try:
+            response = await ollama_client.post(path, payload, operation="warmup")
+            response.raise_for_status()
+        except Exception as e:
+            self._status[role]["error"] = str(e) or type(e).__name__
+            logger.warning(f"Failed to load {model} in Ollama: {self._status[role]['error']}")
+            return
+        elapsed = time.perf_counter() - start
+        metrics.record_latency(f"model_load_{role}", elapsed)
+        self._status[role].update(last_load_seconds=round(elapsed, 3), error=None)
+
+    async def refresh(self) -> None:
+        """Read /api/ps and record whether each model is resident"""
+        try:
+            response = await ollama_client.get("/api/ps")
+            response.raise_for_status()
+            running = response.json().get("models", [])
+        except Exception as e:
+            logger.warning(f"Failed to read running Ollama models: {e}")
+            for status in self._status.values():
+                status.update(resident=None, last_probe=time.time())
+            return
+
+        for role, model in self.models.items():
+            entry = next(
+                (m for m in running if _same_model(m.get("name") or m.get("model", ""), model)),
+                None
+            )
+            self._status[role].update(
+                resident=entry is not None,
+                expires_at=entry.get("expires_at") if entry else None,
+                last_probe=time.time()
+            )
+
+    async def warm(self) -> None:
+        """Load every model concurrently, then refresh residency"""
+        await asyncio.gather(*(self._load(role) for role in self.models))
+        await self.refresh()
+        summary = ", ".join(
+            f"{s['model']}={'resident' if s['resident'] else 'not resident'}" for s in self._status.values()
+        )
+        logger.info(f"Model residency: {summary}")
+
+    async def _run(self) -> None:
+        await self.warm()
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            await self.warm()
+
+    def start(self) -> None:
+        """Warm up in the background (the server starts serving immediately) and start probing"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def status(self) -> Dict[str, dict]:
+        return {role: dict(status) for role, status in self._status.items()}
+
+
+residency_manager = ModelResidencyManager({"llm": LLM_MODEL, "embed": EMBED_MODEL})
+metrics.register_provider("models", residency_manager.status)
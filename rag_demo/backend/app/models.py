@@ -1,19 +1,41 @@
 """
 Pydantic models for request/response schemas
 """
-from typing import List, Optional, Literal
-from pydantic import BaseModel, Field
+from typing import Any, List, Optional, Literal, get_args
+from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime
 
 
+ClaimType = Literal["accounting", "business_model", "fraud", "related_party", "guidance", "metrics", "other"]
+Coverage = Literal["fully_addressed", "partially_addressed", "not_addressed"]
+
+
+def _as_list(value: Any) -> list:
+    """Wrap a scalar LLM value in a list; None becomes an empty list"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _objects_with(items: Any, *fields: str) -> list:
+    """Keep the items of an LLM list that are objects with all `fields` set, dropping malformed ones"""
+    return [item for item in _as_list(items) if isinstance(item, dict) and all(item.get(field) for field in fields)]
+
+
+def _page_number(value: Any) -> Optional[int]:
+    """A page number given by the LLM as an int, float or numeric string, else None"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class Claim(BaseModel):
     """A single claim extracted from the short report"""
     claim_id: str = Field(..., description="Unique claim identifier (e.g., C001)")
     claim_text: str = Field(..., description="The text of the claim")
     page_numbers: List[int] = Field(..., description="Page numbers where this claim appears")
-    claim_type: Literal["accounting", "business_model", "fraud", "related_party", "guidance", "metrics", "other"] = Field(
-        ..., description="Type of claim"
-    )
+    claim_type: ClaimType = Field(..., description="Type of claim")
 
 
 class Citation(BaseModel):
@@ -23,12 +45,15 @@ class Citation(BaseModel):
     chunk_id: str = Field(..., description="Chunk identifier within the document")
     quote: str = Field(..., description="Relevant quote from the source")
     similarity_score: Optional[float] = Field(None, description="Similarity score (0-1, higher is more similar)")
+    # Used to pack judge evidence; never serialized into API responses or reports
+    chunk_index: Optional[int] = Field(None, exclude=True, description="Position of the chunk within the document")
+    text: Optional[str] = Field(None, exclude=True, description="Full chunk text")
 
 
 class ClaimAnalysis(BaseModel):
     """Analysis result for a single claim"""
     claim_id: str
-    coverage: Literal["fully_addressed", "partially_addressed", "not_addressed"]
+    coverage: Coverage
     reasoning: str = Field(..., description="5-10 bullet points explaining the analysis")
     citations: List[Citation]
     confidence: int = Field(..., ge=0, le=100, description="Confidence score 0-100")
@@ -36,6 +61,118 @@ class ClaimAnalysis(BaseModel):
     recommended_actions: Optional[List[str]] = Field(None, description="Recommended follow-up actions")
 
 
+class ExtractedClaim(BaseModel):
+    """A claim as the extraction LLM returns it (the claim ID is assigned afterwards)"""
+    # Docstrings end up in the JSON schema sent to the LLM, so the coercions are described here:
+    # like the free-form parsing they replaced, a single page is wrapped in a list, pages that
+    # are not numbers (e.g. "3-4") are dropped, no pages left means page 1 and an unknown
+    # claim type becomes "other"
+    claim_text: str = Claim.model_fields["claim_text"]
+    page_numbers: List[int] = Claim.model_fields["page_numbers"]
+    claim_type: ClaimType = Claim.model_fields["claim_type"]
+
+    @model_validator(mode="before")
+    @classmethod
+    def _fill_defaults(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            data = {**data}
+            data.setdefault("page_numbers", None)
+            data.setdefault("claim_type", "other")
+        return data
+
+    @field_validator("page_numbers", mode="before")
+    @classmethod
+    def _coerce_pages(cls, value: Any) -> list:
+        pages = [page for page in map(_page_number, _as_list(value)) if page is not None]
+        return pages or [1]
+
+    @field_validator("claim_type", mode="before")
+    @classmethod
+    def _coerce_type(cls, value: Any) -> str:
+        return value if value in get_args(ClaimType) else "other"
+
+
+class ClaimExtraction(BaseModel):
+    """Structured output of claim extraction"""
+    # A bare list of claims is accepted too; items that are not claim objects are skipped
+    claims: List[ExtractedClaim]
+
+    @model_validator(mode="before")
+    @classmethod
+    def _wrap_list(cls, data: Any) -> Any:
+        return {"claims": data} if isinstance(data, list) else data
+
+    @field_validator("claims", mode="before")
+    @classmethod
+    def _skip_malformed(cls, value: Any) -> list:
+        return _objects_with(value, "claim_text")
+
+
+class ClaimJudgment(BaseModel):
+    """The judgment fields of a ClaimAnalysis as the judge LLM returns them"""
+    # Coerced like the free-form parsing they replaced: an unknown coverage becomes
+    # "not_addressed", reasoning given as a list is joined into bullet points and a
+    # missing or non-numeric confidence is 0. A reply without coverage or reasoning
+    # fails validation, so a failed judgment is never cached as a verdict
+    coverage: Coverage
+    reasoning: str = ClaimAnalysis.model_fields["reasoning"]
+    confidence: int = Field(..., description="Confidence score 0-100")
+    gaps: List[str] = Field(default_factory=list, description="Missing evidence types if not fully addressed")
+    recommended_actions: List[str] = Field(default_factory=list, description="Recommended follow-up actions")
+
+    @model_validator(mode="before")
+    @classmethod
+    def _fill_defaults(cls, data: Any) -> Any:
+        if isinstance(data, dict):
+            data = {**data}
+            data.setdefault("confidence", 0)
+        return data
+
+    @field_validator("coverage", mode="before")
+    @classmethod
+    def _coerce_coverage(cls, value: Any) -> str:
+        if value is None:
+            return value
+        return value if value in get_args(Coverage) else "not_addressed"
+
+    @field_validator("reasoning", mode="before")
+    @classmethod
+    def _coerce_reasoning(cls, value: Any) -> str:
+        if isinstance(value, list):
+            return "\n".join(item if item.startswith("•") else f"• {item}" for item in map(str, value))
+        return value if value is None or isinstance(value, str) else str(value)
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _coerce_confidence(cls, value: Any) -> int:
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+    @field_validator("gaps", "recommended_actions", mode="before")
+    @classmethod
+    def _coerce_items(cls, value: Any) -> List[str]:
+        return [str(item) for item in _as_list(value)]
+
+
+class ClaimVerdict(ClaimJudgment):
+    """One claim's judgment in a batched judge reply"""
+    claim_id: str
+
+
+class BatchJudgment(BaseModel):
+    """Structured output of batched judging"""
+    # Malformed verdicts (no claim_id, coverage or reasoning) are dropped; their claims are
+    # then judged on their own
+    verdicts: List[ClaimVerdict]
+
+    @field_validator("verdicts", mode="before")
+    @classmethod
+    def _skip_malformed(cls, value: Any) -> list:
+        return _objects_with(value, "claim_id", "coverage", "reasoning")
+
+
 class UploadReportResponse(BaseModel):
     """Response after uploading a report"""
     report_id: str
@@ -48,6 +185,10 @@ class AnalyzeRequest(BaseModel):
     report_id: str
     top_k: int = Field(default=6, ge=1, le=20, description="Number of documents to retrieve per claim")
     max_claims: int = Field(default=30, ge=1, le=50, description="Maximum number of claims to analyze")
+    concurrency: Optional[int] = Field(
+        default=None, ge=1, le=16,
+        description="Maximum number of claims analyzed concurrently (defaults to ANALYZE_CONCURRENCY, 1 = serial)"
+    )
 
 
 class ReportSummary(BaseModel):
@@ -84,3 +225,27 @@ class AnalyzeResponse(BaseModel):
     """Response from analysis endpoint"""
     report: AnalysisReport
     message: str
+
+
+class AnalyzeJobResponse(BaseModel):
+    """Response after starting a background analysis job"""
+    job_id: str
+    report_id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    message: str
+
+
+class AnalyzeJobStatus(BaseModel):
+    """Progress and results of a background analysis job"""
+    job_id: str
+    report_id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    total_claims: int
+    completed_claims: int
+    claim_analyses: List[ClaimAnalysis] = Field(
+        default_factory=list, description="Analyses finished so far, in completion order"
+    )
+    report: Optional[AnalysisReport] = Field(None, description="Final report, available once completed")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
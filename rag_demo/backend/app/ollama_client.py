@@ -0,0 +1,175 @@
+"""
+Ollama client module: Shared async HTTP client with connection pooling for all model calls
+"""
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.config import (
+    OLLAMA_BASE_URL, EMBED_MODEL, OLLAMA_MAX_CONNECTIONS, OLLAMA_CONNECT_TIMEOUT,
+    EXTRACT_TIMEOUT, JUDGE_TIMEOUT, EMBED_TIMEOUT, OLLAMA_KEEP_ALIVE, MODEL_WARMUP_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Read timeout per operation; connect timeout is shared
+OPERATION_TIMEOUTS = {
+    "extract": EXTRACT_TIMEOUT,
+    "judge": JUDGE_TIMEOUT,
+    "embed": EMBED_TIMEOUT,
+    # Loading a model from disk can take minutes
+    "warmup": MODEL_WARMUP_TIMEOUT,
+}
+
+# Batched embedding endpoint; its vectors are L2-normalized (the legacy /api/embeddings ones are not)
+EMBED_ENDPOINT = "/api/embed"
+
+
+def _keep_alive_value(value: str):
+    """OLLAMA_KEEP_ALIVE as Ollama expects it: a number of seconds or a duration string"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+KEEP_ALIVE = _keep_alive_value(OLLAMA_KEEP_ALIVE) if OLLAMA_KEEP_ALIVE else None
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide pooled client, creating it on first use
+    
+    The pool is bound to the event loop it was created on, so a new client is
+    created if the running loop changes (e.g. separate asyncio.run() calls in scripts).
+    """
+    global _client, _client_loop
+    
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            base_url=OLLAMA_BASE_URL,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(EMBED_TIMEOUT, connect=OLLAMA_CONNECT_TIMEOUT)
+        )
+        _client_loop = loop
+        logger.info(f"Created Ollama client for {OLLAMA_BASE_URL} (max connections: {OLLAMA_MAX_CONNECTIONS})")
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client and release pooled connections"""
+    global _client, _client_loop
+    
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def get_timeout(operation: str) -> httpx.Timeout:
+    """Build the timeout for an operation ("extract", "judge", "embed" or "warmup")"""
+    return httpx.Timeout(OPERATION_TIMEOUTS[operation], connect=OLLAMA_CONNECT_TIMEOUT)
+
+
+def with_keep_alive(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Add OLLAMA_KEEP_ALIVE to a model request so the model stays loaded between calls"""
+    if KEEP_ALIVE is None or "keep_alive" in payload:
+        return payload
+    return {**payload, "keep_alive": KEEP_ALIVE}
+
+
+async def post(path: str, payload: Dict[str, Any], operation: str) -> httpx.Response:
+    """
+    POST a JSON payload to the Ollama API using the shared connection pool
+    
+    Model requests get OLLAMA_KEEP_ALIVE unless the payload sets keep_alive.
+    
+    Args:
+        path: API path, e.g. "/api/chat"
+        payload: JSON request body
+        operation: Operation name used to select the timeout
+    
+    Returns:
+        The HTTP response (status is not checked here)
+    """
+    client = get_client()
+    return await client.post(path, json=with_keep_alive(payload), timeout=get_timeout(operation))
+
+
+async def get(path: str, operation: str = "embed") -> httpx.Response:
+    """GET an Ollama API path (e.g. "/api/ps") using the shared connection pool"""
+    client = get_client()
+    return await client.get(path, timeout=get_timeout(operation))
+
+
+async def embed(texts: List[str]) -> List[List[float]]:
+    """
+    Embed several texts in a single batched /api/embed request
+    
+    Args:
+        texts: Texts to embed
+    
+    Returns:
+        One embedding vector per input text, in input order
+    """
+    if not texts:
+        return []
+    
+    payload = {
+        "model": EMBED_MODEL,
+        "input": texts
+    }
+    response = await post(EMBED_ENDPOINT, payload, operation="embed")
+    response.raise_for_status()
+    
+    embeddings = response.json().get("embeddings", [])
+    if len(embeddings) != len(texts) or any(not e for e in embeddings):
+        raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs")
+    
+    return embeddings
+
+
+async def stream_chat(payload: Dict[str, Any], operation: str) -> AsyncIterator[str]:
+    """
+    Stream a /api/chat request, yielding message content fragments as they arrive
+    
+    Closing the generator early (e.g. via contextlib.aclosing) closes the
+    connection, which makes Ollama stop generating.
+    
+    Args:
+        payload: Chat request body; "stream" is forced to True
+        operation: Operation name used to select the timeout
+    
+    Yields:
+        Non-empty content fragments
+    """
+    client = get_client()
+    payload = with_keep_alive({**payload, "stream": True})
+    
+    async with client.stream("POST", "/api/chat", json=payload, timeout=get_timeout(operation)) as response:
+        if response.status_code != 200:
+            await response.aread()
+            response.raise_for_status()
+        
+        async for line in response.aiter_lines():
+            if not line.strip():
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise ValueError(f"Ollama stream error: {chunk['error']}")
+            
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                yield content
+            if chunk.get("done"):
+                return
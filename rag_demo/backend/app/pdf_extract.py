@@ -1,9 +1,15 @@
 """
-PDF extraction module: Extract text from first 3 pages of PDF
+PDF extraction module: Stream PDF text page by page, splitting long documents into page ranges extracted in a process pool
 """
 import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Tuple
+from collections import deque
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
 
 # Try to import PDF libraries
 HAS_PYPDF = False
@@ -24,83 +30,275 @@ except ImportError:
 if not HAS_PYPDF and not HAS_PDFPLUMBER:
     raise ImportError("Please install either pypdf or pdfplumber: pip install pypdf or pip install pdfplumber")
 
-from app.config import MAX_PAGES
+from app.config import MAX_PAGES, PDF_WORKERS, PDF_PARALLEL_MIN_PAGES
 
 logger = logging.getLogger(__name__)
 
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
 
-def extract_pdf_text(pdf_path: Path, max_pages: int = MAX_PAGES) -> List[Tuple[int, str]]:
+
+def extract_pdf_text(
+    pdf_path: Path,
+    max_pages: int = MAX_PAGES,
+    workers: Optional[int] = None
+) -> List[Tuple[int, str]]:
     """
     Extract text from PDF, only processing first max_pages pages
     
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are split into page
+    ranges extracted in a process pool when more than one worker is configured.
+    
     Args:
         pdf_path: Path to PDF file
         max_pages: Maximum number of pages to process (default: 3)
+        workers: Number of worker processes (default: PDF_WORKERS, 1 = serial)
     
     Returns:
         List of tuples (page_number, page_text)
     """
+    pages = list(iter_pdf_pages(pdf_path, max_pages, workers))
+    logger.info(f"Successfully extracted text from {len(pages)} pages")
+    return pages
+
+
+def iter_pdf_pages(
+    pdf_path: Path,
+    max_pages: int = MAX_PAGES,
+    workers: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, page_text) one page at a time, in page order
+    
+    Only a bounded number of pages is held in memory, so very large documents
+    can be streamed straight into chunking.
+    
+    Args:
+        pdf_path: Path to PDF file
+        max_pages: Maximum number of pages to process
+        workers: Number of worker processes (default: PDF_WORKERS, 1 = serial)
+    
+    Yields:
+        Tuples (page_number, page_text)
+    """
     if not pdf_path.exists():
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
     
-    logger.info(f"Extracting text from {pdf_path}, processing first {max_pages} pages")
+    workers = PDF_WORKERS if workers is None else workers
+    if workers > 1 and max_pages >= PDF_PARALLEL_MIN_PAGES:
+        page_count = count_pdf_pages(pdf_path)
+        if min(page_count, max_pages) >= PDF_PARALLEL_MIN_PAGES:
+            yield from iter_pdf_pages_parallel(pdf_path, max_pages, workers, page_count)
+            return
+    
+    yield from iter_pdf_pages_serial(pdf_path, max_pages)
+
+
+def extract_pdf_text_serial(pdf_path: Path, max_pages: int = MAX_PAGES) -> List[Tuple[int, str]]:
+    """Extract pages in the current process; see iter_pdf_pages_serial"""
+    return list(iter_pdf_pages_serial(pdf_path, max_pages))
+
+
+def iter_pdf_pages_serial(
+    pdf_path: Path,
+    max_pages: int = MAX_PAGES,
+    start_page: int = 0
+) -> Iterator[Tuple[int, str]]:
+    """
+    Extract text page by page in the current process (pypdf, falling back to pdfplumber)
+    
+    Args:
+        pdf_path: Path to PDF file
+        max_pages: Stop before this (0-based) page index
+        start_page: First (0-based) page index to extract
+    
+    Yields:
+        Tuples (page_number, page_text); pages without text are skipped and
+        pages that failed to extract are yielded with empty text
+    """
+    logger.info(f"Extracting text from {pdf_path}, processing pages {start_page + 1}-{max_pages}")
     
     if HAS_PYPDF:
+        reader = None
         try:
             # Try pypdf first
             reader = PdfReader(str(pdf_path))
-            pages = []
-            
-            for i, page in enumerate(reader.pages[:max_pages], start=1):
-                try:
-                    text = page.extract_text()
-                    if text.strip():
-                        pages.append((i, text.strip()))
-                        logger.debug(f"Extracted {len(text)} characters from page {i}")
-                except Exception as e:
-                    logger.warning(f"Failed to extract text from page {i}: {e}")
-                    pages.append((i, ""))
-            
-            logger.info(f"Successfully extracted text from {len(pages)} pages")
-            return pages
+            page_count = len(reader.pages)
         except Exception as e:
             logger.warning(f"pypdf failed, trying pdfplumber: {e}")
+        
+        if reader is not None:
+            next_page = start_page
+            try:
+                for i in range(start_page, min(page_count, max_pages)):
+                    next_page = i
+                    page = reader.pages[i]
+                    try:
+                        text = page.extract_text()
+                        if text.strip():
+                            logger.debug(f"Extracted {len(text)} characters from page {i + 1}")
+                            yield (i + 1, text.strip())
+                    except Exception as e:
+                        logger.warning(f"Failed to extract text from page {i + 1}: {e}")
+                        yield (i + 1, "")
+                return
+            except Exception as e:
+                # Pages already yielded stay; pdfplumber takes over from the page pypdf could not load
+                logger.warning(f"pypdf failed at page {next_page + 1}, trying pdfplumber: {e}")
+                start_page = next_page
     
     # Fallback to pdfplumber
     if HAS_PDFPLUMBER:
         try:
-            pages = []
-            
-            with pdfplumber.open(str(pdf_path)) as pdf:
-                for i, page in enumerate(pdf.pages[:max_pages], start=1):
-                    try:
-                        text = page.extract_text()
-                        if text:
-                            pages.append((i, text.strip()))
-                            logger.debug(f"Extracted {len(text)} characters from page {i}")
-                    except Exception as e:
-                        logger.warning(f"Failed to extract text from page {i}: {e}")
-                        pages.append((i, ""))
-            
-            logger.info(f"Successfully extracted text from {len(pages)} pages using pdfplumber")
-            return pages
+            pdf = pdfplumber.open(str(pdf_path))
         except Exception as e2:
             raise RuntimeError(f"Failed to extract text from PDF using pdfplumber: {e2}")
+        
+        with pdf:
+            for i in range(start_page, min(len(pdf.pages), max_pages)):
+                try:
+                    text = pdf.pages[i].extract_text()
+                    if text and text.strip():
+                        logger.debug(f"Extracted {len(text)} characters from page {i + 1}")
+                        yield (i + 1, text.strip())
+                except Exception as e:
+                    logger.warning(f"Failed to extract text from page {i + 1}: {e}")
+                    yield (i + 1, "")
+        return
     
     # If we get here, neither library worked
     raise RuntimeError("Failed to extract text from PDF: no working PDF library available")
 
 
-def extract_full_text(pdf_path: Path, max_pages: int = MAX_PAGES) -> str:
+def count_pdf_pages(pdf_path: Path) -> int:
+    """Number of pages in a PDF (0 if it cannot be opened)"""
+    if HAS_PYPDF:
+        try:
+            return len(PdfReader(str(pdf_path)).pages)
+        except Exception as e:
+            logger.debug(f"pypdf could not count pages of {pdf_path}: {e}")
+    if HAS_PDFPLUMBER:
+        try:
+            with pdfplumber.open(str(pdf_path)) as pdf:
+                return len(pdf.pages)
+        except Exception as e:
+            logger.debug(f"pdfplumber could not count pages of {pdf_path}: {e}")
+    return 0
+
+
+def _extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) (0-based) in a worker process"""
+    return list(iter_pdf_pages_serial(Path(pdf_path), max_pages=end, start_page=start))
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """Process pool shared across calls; recreated if the worker count changes"""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is None or _executor._max_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # spawn: forking a threaded server process is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Drop a broken pool (e.g. a worker crashed) so the next call starts a new one"""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_executor() -> None:
+    """Stop the worker processes of the shared pool (called on application shutdown)"""
+    global _executor
+    
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+
+def extract_pdf_text_parallel(
+    pdf_path: Path,
+    max_pages: int = MAX_PAGES,
+    workers: int = PDF_WORKERS,
+    page_count: Optional[int] = None
+) -> List[Tuple[int, str]]:
+    """Extract pages in a process pool; see iter_pdf_pages_parallel"""
+    return list(iter_pdf_pages_parallel(pdf_path, max_pages, workers, page_count))
+
+
+def iter_pdf_pages_parallel(
+    pdf_path: Path,
+    max_pages: int = MAX_PAGES,
+    workers: int = PDF_WORKERS,
+    page_count: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
     """
-    Extract full text from PDF as a single string
+    Extract text with page ranges split across a process pool, yielded in page order
+    
+    At most 2 * workers ranges are in flight, so memory stays bounded. If the
+    pool fails, extraction continues serially from the first unfinished range;
+    a broken pool (a crashed worker) is discarded so the next call starts a
+    new one.
     
     Args:
         pdf_path: Path to PDF file
         max_pages: Maximum number of pages to process
+        workers: Number of worker processes
+        page_count: Total pages if already known
     
-    Returns:
-        Combined text from all pages
+    Yields:
+        Tuples (page_number, page_text)
     """
-    pages = extract_pdf_text(pdf_path, max_pages)
-    return "\n\n".join([f"Page {page_num}:\n{text}" for page_num, text in pages])
+    if page_count is None:
+        page_count = count_pdf_pages(pdf_path)
+    total = min(page_count, max_pages)
+    if total == 0:
+        yield from iter_pdf_pages_serial(pdf_path, max_pages)
+        return
+    
+    # A few ranges per worker keeps the pool busy when pages differ in cost
+    range_size = max(1, -(-total // (workers * 4)))
+    ranges = iter([(start, min(start + range_size, total)) for start in range(0, total, range_size)])
+    
+    logger.info(f"Extracting {total} pages from {pdf_path} with {workers} processes")
+    
+    next_start = 0
+    executor = None
+    try:
+        executor = _get_executor(workers)
+        pending = deque(
+            (start, executor.submit(_extract_page_range, str(pdf_path), start, end))
+            for start, end in islice(ranges, workers * 2)
+        )
+        while pending:
+            start, future = pending.popleft()
+            pages = future.result()
+            for start_next, end_next in islice(ranges, 1):
+                pending.append((start_next, executor.submit(_extract_page_range, str(pdf_path), start_next, end_next)))
+            next_start = pages[-1][0] if pages else next_start
+            yield from pages
+            next_start = pending[0][0] if pending else total
+    except BrokenProcessPool as e:
+        logger.warning(f"PDF process pool broke, continuing serially from page {next_start + 1}: {e}")
+        _discard_executor(executor)
+        yield from iter_pdf_pages_serial(pdf_path, total, start_page=next_start)
+    except Exception as e:
+        logger.warning(f"Parallel extraction failed, continuing serially from page {next_start + 1}: {e}")
+        yield from iter_pdf_pages_serial(pdf_path, total, start_page=next_start)
+
+
+def format_page(index: int, page_num: int, text: str) -> str:
+    """Text of the `index`-th extracted page as loaded for indexing, headed by its page number"""
+    separator = "\n\n" if index > 0 else ""
+    return f"{separator}Page {page_num}:\n{text}"
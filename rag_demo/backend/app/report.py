@@ -5,11 +5,13 @@ import logging
 from datetime import datetime
 from typing import List
 
+from app.config import REPORTS_DIR
+
 from app.models import (
     ClaimAnalysis, ReportSummary, AnalysisReport,
     Claim
 )
-from app.utils import logger
+from app.utils import save_json, logger
 
 logger = logging.getLogger(__name__)
 
@@ -252,3 +254,22 @@ def create_analysis_report(
         markdown=markdown,
         json_data=json_data
     )
+
+
+def save_analysis_report(report: AnalysisReport) -> None:
+    """
+    Persist the JSON and Markdown versions of a report to REPORTS_DIR
+    
+    Report IDs are derived from the uploaded file's content, so every
+    analysis of the same report (e.g. with another top_k or max_claims, or
+    by another user who uploaded the same file) replaces the files of the
+    previous one: they always hold the latest analysis.
+    
+    Args:
+        report: AnalysisReport to save
+    """
+    report_json_path = REPORTS_DIR / f"{report.report_id}.report.json"
+    report_md_path = REPORTS_DIR / f"{report.report_id}.report.md"
+    
+    save_json(report.json_data, report_json_path)
+    report_md_path.write_text(report.markdown, encoding='utf-8')
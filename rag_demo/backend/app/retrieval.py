@@ -1,46 +1,244 @@
 """
-Retrieval module: Retrieve relevant documents from vector database for a given claim
+Retrieval module: Retrieve relevant documents for a given claim (vector search fused with BM25)
 """
+import asyncio
 import logging
-import requests
 from typing import List, Dict
 
-import chromadb
-from chromadb.config import Settings
+import numpy as np
 
-from app.config import CHROMA_DIR, EMBED_MODEL, OLLAMA_BASE_URL, DEFAULT_TOP_K
-from app.models import Citation
+from app.config import DEFAULT_TOP_K, HYBRID_RETRIEVAL, RETRIEVAL_CANDIDATES, RRF_K
+from app.models import Claim, Citation
+from app.embedding_cache import embed_with_cache
+from app.vector_store import get_vector_store
+from app.lexical_index import get_lexical_index
+from app.retrieval_cache import get_retrieval_cache
 from app.utils import logger
 
 logger = logging.getLogger(__name__)
 
 
-def get_embedding(text: str) -> List[float]:
+async def get_embedding(text: str) -> List[float]:
     """Get embedding for text using Ollama"""
     try:
-        url = f"{OLLAMA_BASE_URL}/api/embeddings"
-        payload = {
-            "model": EMBED_MODEL,
-            "prompt": text
-        }
-        
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        embedding = result.get("embedding", [])
-        
-        if not embedding:
-            raise ValueError("Ollama returned empty embedding")
-        
-        return embedding
+        embeddings = await embed_with_cache([text])
+        return embeddings[0]
         
     except Exception as e:
         logger.error(f"Failed to get embedding: {e}")
         raise ConnectionError(f"Failed to connect to Ollama for embeddings: {e}")
 
 
-def retrieve_relevant_documents(claim_text: str, top_k: int = DEFAULT_TOP_K) -> List[Citation]:
+async def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Get embeddings for several texts in one batched Ollama request"""
+    try:
+        return await embed_with_cache(texts)
+        
+    except Exception as e:
+        logger.error(f"Failed to get embeddings: {e}")
+        raise ConnectionError(f"Failed to connect to Ollama for embeddings: {e}")
+
+
+def _make_citation(chunk_key: str, metadata: Dict, document: str, distance) -> Citation:
+    """Build a Citation from a stored chunk and its distance to the query"""
+    # Convert distance to similarity score (lower distance = higher similarity)
+    # ChromaDB uses cosine distance, so similarity = 1 - distance
+    similarity = max(0.0, min(1.0, 1.0 - distance)) if distance is not None else 0.0
+    
+    citation = Citation(
+        doc_id=metadata.get('doc_id', chunk_key),
+        doc_title=metadata.get('doc_title', 'Unknown'),
+        chunk_id=metadata.get('chunk_id', chunk_key),
+        quote=document[:500] if len(document) > 500 else document,  # First 500 chars as quote
+        similarity_score=round(similarity, 4),
+        chunk_index=metadata.get('chunk_index'),
+        text=document
+    )
+    logger.debug(f"Retrieved: {citation.doc_title} (similarity: {similarity:.4f})")
+    return citation
+
+
+def _to_citations(results: Dict, query_index: int) -> List[Citation]:
+    """
+    Convert the hits of one query in a collection.query() result to Citation objects
+    
+    Args:
+        results: Result dict returned by collection.query
+        query_index: Index of the query embedding within the batch
+    
+    Returns:
+        List of Citation objects, most similar first
+    """
+    if not results['ids'] or len(results['ids'][query_index]) == 0:
+        return []
+    
+    ids = results['ids'][query_index]
+    distances = results['distances'][query_index] if results.get('distances') else [0.0] * len(ids)
+    
+    return [
+        _make_citation(doc_id, metadata, document, distance)
+        for doc_id, metadata, document, distance in zip(
+            ids,
+            results['metadatas'][query_index],
+            results['documents'][query_index],
+            distances
+        )
+    ]
+
+
+def _distance(space: str, query: np.ndarray, embedding: np.ndarray) -> float:
+    """Distance between a query and a stored embedding, as the collection's HNSW space defines it"""
+    if space == "cosine":
+        norms = np.linalg.norm(query) * np.linalg.norm(embedding)
+        return 1.0 - float(query @ embedding) / float(norms) if norms else 1.0
+    if space == "ip":
+        return 1.0 - float(query @ embedding)
+    return float(np.sum((query - embedding) ** 2))
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """
+    Merge ranked lists of IDs by reciprocal rank fusion
+    
+    Each list adds 1 / (k + rank) to the score of every ID it contains, so
+    IDs ranked well by several retrievers come first. Ties keep the order
+    of first appearance.
+    
+    Args:
+        rankings: Ranked ID lists, best first
+        k: Damping constant (60 in the original RRF paper)
+    
+    Returns:
+        All IDs, best fused score first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda key: scores[key], reverse=True)
+
+
+def _search(collection, texts: List[str], query_embeddings: List[List[float]], top_k: int) -> List[List[Citation]]:
+    """
+    Run vector (and, with HYBRID_RETRIEVAL, BM25) search for a batch of queries (blocking)
+    
+    Both retrievers return RETRIEVAL_CANDIDATES hits per query, fused by
+    reciprocal rank fusion and cut to top_k. Chunks found only lexically are
+    fetched with one collection.get and scored against the query embedding
+    like vector hits.
+    
+    Returns:
+        One list of Citation objects per query, best first
+    """
+    if not HYBRID_RETRIEVAL:
+        results = collection.query(query_embeddings=query_embeddings, n_results=top_k)
+        return [_to_citations(results, i) for i in range(len(texts))]
+    
+    n_candidates = max(top_k, RETRIEVAL_CANDIDATES)
+    results = collection.query(query_embeddings=query_embeddings, n_results=n_candidates)
+    try:
+        lexical_hits = get_lexical_index().search_many(texts, n_candidates)
+    except Exception as e:
+        logger.warning(f"Lexical search failed, using vector hits only: {e}")
+        lexical_hits = [[] for _ in texts]
+    
+    vector_ids = [results['ids'][i] if results['ids'] else [] for i in range(len(texts))]
+    fused_ids = [
+        reciprocal_rank_fusion([vector_ids[i], [chunk_key for chunk_key, _ in lexical_hits[i]]])[:top_k]
+        for i in range(len(texts))
+    ]
+    
+    lexical_only = sorted({
+        chunk_key
+        for i in range(len(texts))
+        for chunk_key in fused_ids[i]
+        if chunk_key not in set(vector_ids[i])
+    })
+    stored = {}
+    if lexical_only:
+        fetched = collection.get(ids=lexical_only, include=['documents', 'metadatas', 'embeddings'])
+        stored = {
+            chunk_key: (metadata, document, np.asarray(embedding, dtype=np.float32))
+            for chunk_key, metadata, document, embedding in zip(
+                fetched['ids'], fetched['metadatas'], fetched['documents'], fetched['embeddings']
+            )
+        }
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    
+    citations_per_query = []
+    for i in range(len(texts)):
+        vector_citations = dict(zip(vector_ids[i], _to_citations(results, i)))
+        query = np.asarray(query_embeddings[i], dtype=np.float32)
+        citations = []
+        for chunk_key in fused_ids[i]:
+            if chunk_key in vector_citations:
+                citations.append(vector_citations[chunk_key])
+            elif chunk_key in stored:
+                metadata, document, embedding = stored[chunk_key]
+                citations.append(_make_citation(chunk_key, metadata, document, _distance(space, query, embedding)))
+        citations_per_query.append(citations)
+    return citations_per_query
+
+
+async def retrieve_for_claims(claims: List[Claim], top_k: int = DEFAULT_TOP_K) -> Dict[str, List[Citation]]:
+    """
+    Retrieve relevant documents for all claims of a report at once
+    
+    All claims are embedded in one batched request and searched with a single
+    multi-query collection.query call, instead of two round trips per claim.
+    With HYBRID_RETRIEVAL, BM25 hits are fused in (see _search). Claims
+    already retrieved against the current index version are served from the
+    retrieval cache and skip both the embedding and the search.
+    
+    Args:
+        claims: Claims to retrieve evidence for
+        top_k: Number of documents to retrieve per claim
+    
+    Returns:
+        Dict mapping claim_id to its list of Citation objects
+    
+    Raises:
+        ConnectionError: If the batched embedding request fails
+    """
+    if not claims:
+        return {}
+    
+    logger.info(f"Retrieving documents for {len(claims)} claims in one batch")
+    
+    # Reopens the index first if another process rebuilt it
+    store = get_vector_store()
+    version = await asyncio.to_thread(store.refresh)
+    collection = store.collection
+    if collection is None:
+        logger.error("Vector store collection 'internal_documents' not found. Please run index_internal.py first.")
+        return {claim.claim_id: [] for claim in claims}
+    
+    cache = get_retrieval_cache()
+    
+    citations_by_claim = {}
+    misses = []
+    for claim in claims:
+        cached = cache.get(version, claim.claim_text, top_k)
+        if cached is None:
+            misses.append(claim)
+        else:
+            citations_by_claim[claim.claim_id] = cached
+    
+    if misses:
+        texts = [claim.claim_text for claim in misses]
+        query_embeddings = await get_embeddings(texts)
+        citations = await asyncio.to_thread(_search, collection, texts, query_embeddings, top_k)
+        for claim, claim_citations in zip(misses, citations):
+            citations_by_claim[claim.claim_id] = claim_citations
+            cache.put(version, claim.claim_text, top_k, claim_citations)
+    if len(misses) < len(claims):
+        logger.info(f"Retrieval cache served {len(claims) - len(misses)} of {len(claims)} claims")
+    citations_by_claim = {claim.claim_id: citations_by_claim[claim.claim_id] for claim in claims}
+    logger.info(f"Retrieved {sum(len(c) for c in citations_by_claim.values())} relevant documents for {len(claims)} claims")
+    return citations_by_claim
+
+
+async def retrieve_relevant_documents(claim_text: str, top_k: int = DEFAULT_TOP_K) -> List[Citation]:
     """
     Retrieve relevant documents for a given claim
     
@@ -54,51 +252,26 @@ def retrieve_relevant_documents(claim_text: str, top_k: int = DEFAULT_TOP_K) ->
     logger.info(f"Retrieving documents for claim: {claim_text[:100]}...")
     
     try:
-        # Initialize ChromaDB
-        client = chromadb.PersistentClient(
-            path=str(CHROMA_DIR),
-            settings=Settings(anonymized_telemetry=False)
-        )
-        
-        # Get collection
-        try:
-            collection = client.get_collection("internal_documents")
-        except Exception:
-            logger.error("ChromaDB collection 'internal_documents' not found. Please run index_internal.py first.")
+        # Shared collection handle, opened once per process and reopened if another process rebuilt the index
+        store = get_vector_store()
+        version = await asyncio.to_thread(store.refresh)
+        collection = store.collection
+        if collection is None:
+            logger.error("Vector store collection 'internal_documents' not found. Please run index_internal.py first.")
             return []
         
+        cache = get_retrieval_cache()
+        citations = cache.get(version, claim_text, top_k)
+        if citations is not None:
+            logger.info(f"Retrieved {len(citations)} relevant documents (cached)")
+            return citations
+        
         # Get embedding for claim
-        query_embedding = get_embedding(claim_text)
+        query_embedding = await get_embedding(claim_text)
         
         # Search
-        results = collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k
-        )
-        
-        # Convert to Citation objects
-        citations = []
-        
-        if results['ids'] and len(results['ids'][0]) > 0:
-            for i, (doc_id, metadata, document, distance) in enumerate(zip(
-                results['ids'][0],
-                results['metadatas'][0],
-                results['documents'][0],
-                results['distances'][0] if 'distances' in results else [0.0] * len(results['ids'][0])
-            )):
-                # Convert distance to similarity score (lower distance = higher similarity)
-                # ChromaDB uses cosine distance, so similarity = 1 - distance
-                similarity = max(0.0, min(1.0, 1.0 - distance)) if distance is not None else 0.0
-                
-                citation = Citation(
-                    doc_id=metadata.get('doc_id', doc_id),
-                    doc_title=metadata.get('doc_title', 'Unknown'),
-                    chunk_id=metadata.get('chunk_id', doc_id),
-                    quote=document[:500] if len(document) > 500 else document,  # First 500 chars as quote
-                    similarity_score=round(similarity, 4)
-                )
-                citations.append(citation)
-                logger.debug(f"Retrieved: {citation.doc_title} (similarity: {similarity:.4f})")
+        citations = (await asyncio.to_thread(_search, collection, [claim_text], [query_embedding], top_k))[0]
+        cache.put(version, claim_text, top_k, citations)
         
         logger.info(f"Retrieved {len(citations)} relevant documents")
         return citations
@@ -0,0 +1,112 @@
+"""
+Retrieval cache module: In-memory LRU/TTL cache of retrieval results keyed by claim, top_k and index version
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from app import metrics
+from app.config import RETRIEVAL_CACHE_MAX_ENTRIES, RETRIEVAL_CACHE_TTL
+from app.models import Citation
+
+
+def normalize_claim(claim_text: str) -> str:
+    """Case- and whitespace-insensitive form of a claim, as used for exact dedup"""
+    return re.sub(r'\s+', ' ', claim_text.lower().strip())
+
+
+class RetrievalCache:
+    """
+    Citations retrieved for (normalized claim text, top_k) under one index version
+
+    Entries expire after `ttl_seconds` and the least recently used ones are
+    evicted beyond `max_entries`. All entries are dropped as soon as a lookup
+    sees a new index version, so results never outlive a rebuilt index.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_MAX_ENTRIES, ttl_seconds: float = RETRIEVAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._version: Optional[str] = None
+        self._entries: OrderedDict[Tuple[str, int], Tuple[float, List[Citation]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            if self._version is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version: str, claim_text: str, top_k: int) -> Optional[List[Citation]]:
+        """Cached citations, or None on a miss"""
+        if not self.enabled:
+            return None
+        key = (normalize_claim(claim_text), top_k)
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, version: str, claim_text: str, top_k: int, citations: List[Citation]) -> None:
+        if not self.enabled:
+            return
+        key = (normalize_claim(claim_text), top_k)
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, list(citations))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "index_version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[RetrievalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Get the process-wide retrieval cache"""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = RetrievalCache()
+            metrics.register_provider("retrieval_cache", _cache.stats)
+        return _cache
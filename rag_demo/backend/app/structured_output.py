@@ -0,0 +1,65 @@
+"""
+Structured output module: Schema-constrained LLM replies validated against pydantic models
+"""
+import logging
+import threading
+from typing import Dict, Type, TypeVar, Union
+
+from pydantic import BaseModel, ValidationError
+
+from app.config import STRUCTURED_OUTPUT
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def response_format(model: Type[BaseModel]) -> Union[dict, str]:
+    """
+    Value of the Ollama "format" field for replies parsed as `model`
+
+    The model's JSON schema constrains generation to exactly that shape;
+    with STRUCTURED_OUTPUT off, plain JSON mode only guarantees valid JSON.
+    """
+    return model.model_json_schema() if STRUCTURED_OUTPUT else "json"
+
+
+def parse(model: Type[ModelT], content: str, operation: str) -> ModelT:
+    """
+    Validate an LLM reply against `model`
+
+    Every reply and every failure is counted per operation, because a reply
+    that fails validation wastes a whole LLM call.
+
+    Raises:
+        ValidationError: If the reply is not valid JSON of the model's shape
+    """
+    with _lock:
+        stats = _stats.setdefault(operation, {"replies": 0, "parse_failures": 0})
+        stats["replies"] += 1
+    try:
+        return model.model_validate_json(content)
+    except ValidationError as e:
+        with _lock:
+            stats["parse_failures"] += 1
+        metrics.increment(f"{operation}_parse_failures")
+        logger.warning(f"{operation} reply does not match {model.__name__}: {e.error_count()} error(s); reply: {content[:300]!r}")
+        raise
+
+
+def stats() -> Dict[str, dict]:
+    with _lock:
+        return {
+            operation: {
+                **values,
+                "failure_rate": round(values["parse_failures"] / values["replies"], 4) if values["replies"] else None,
+            }
+            for operation, values in _stats.items()
+        }
+
+
+metrics.register_provider("structured_output", stats)
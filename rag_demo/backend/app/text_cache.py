@@ -0,0 +1,134 @@
+"""
+Text cache module: On-disk cache of text extracted from documents, keyed by file content hash
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Set
+
+from app.config import CACHE_DIR
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Entries written before pieces were stored used ".txt" and are pruned
+ENTRY_SUFFIX = ".pieces"
+
+
+class UncachedText(str):
+    """
+    A text piece that keeps its extraction out of the cache
+
+    Loaders yield it for text that failed to extract (e.g. an unreadable PDF
+    page), so the incomplete result is used this once and extracted again
+    next time.
+    """
+
+
+class ExtractedTextCache:
+    """
+    Extracted text stored as one UTF-8 file per (content hash, loader)
+
+    Files are named `<content sha256>.<loader cache key>.pieces`, so an edited
+    file or a new loader version never hits a stale entry. Each piece the
+    loader yielded (e.g. a PDF page) is stored behind its length, so hits
+    replay exactly the same pieces and piece-wise consumers such as the
+    chunker see the same boundaries. Text is written while it is being
+    extracted and only published (atomic rename) once extraction finished,
+    so readers never see partial files.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, content_hash: str, cache_key: str) -> Path:
+        return self.path / f"{content_hash}.{cache_key}{ENTRY_SUFFIX}"
+
+    def iter_text(self, content_hash: str, cache_key: str, extract: Callable[[], Iterable[str]]) -> Iterator[str]:
+        """
+        Yield the cached text pieces, or run `extract` and cache what it yields
+
+        Args:
+            content_hash: sha256 of the source file
+            cache_key: Identifies the loader and its version
+            extract: Produces the text pieces on a cache miss; an UncachedText
+                piece keeps the result out of the cache
+
+        Yields:
+            Text pieces whose concatenation is the extracted text
+        """
+        entry_path = self._entry_path(content_hash, cache_key)
+        if entry_path.exists():
+            with self._lock:
+                self.hits += 1
+            with open(entry_path, encoding='utf-8', newline='') as f:
+                for header in iter(f.readline, ''):
+                    yield f.read(int(header))
+            return
+
+        with self._lock:
+            self.misses += 1
+
+        tmp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        complete = False
+        has_text = False
+        cacheable = True
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                for piece in extract():
+                    f.write(f"{len(piece)}\n{piece}")
+                    has_text = has_text or bool(piece.strip())
+                    cacheable = cacheable and not isinstance(piece, UncachedText)
+                    yield piece
+            complete = True
+        finally:
+            # Publish only complete, non-empty extractions (an empty result may be a missing parser)
+            if complete and has_text and cacheable:
+                os.replace(tmp_path, entry_path)
+            else:
+                tmp_path.unlink(missing_ok=True)
+
+    def prune(self, keep_hashes: Set[str]) -> int:
+        """Delete entries whose content hash is not in keep_hashes (and entries of older formats); returns the number removed"""
+        removed = 0
+        for entry_path in self.path.iterdir():
+            if entry_path.suffix not in (ENTRY_SUFFIX, ".txt"):
+                continue
+            if entry_path.suffix != ENTRY_SUFFIX or entry_path.name.split(".", 1)[0] not in keep_hashes:
+                entry_path.unlink(missing_ok=True)
+                removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} extracted-text cache entries")
+        return removed
+
+    def clear(self) -> None:
+        self.prune(set())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(1 for _ in self.path.glob(f"*{ENTRY_SUFFIX}")),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+_cache: Optional[ExtractedTextCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_text_cache() -> ExtractedTextCache:
+    """Get the process-wide extracted-text cache"""
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractedTextCache(CACHE_DIR / "text")
+            metrics.register_provider("text_cache", _cache.stats)
+        return _cache
@@ -0,0 +1,102 @@
+"""
+Uploads module: Stream uploaded reports to disk, hashing them on the fly, and derive content-addressed report IDs
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Dict, Tuple
+
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+# Namespace of the uuid5 report IDs (fixed, so the same inputs always map to the same ID)
+_REPORT_NAMESPACE = uuid.UUID("6f1b8f5e-3c1a-4d2b-9a57-0c6e2f7d4b91")
+
+# Locks of reports being uploaded, with the number of requests holding or awaiting each
+_report_locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeds the configured size limit"""
+
+
+async def save_upload(upload: UploadFile, directory: Path, max_bytes: int) -> Tuple[Path, str]:
+    """
+    Write an upload to a temporary file block by block, hashing it as it is written
+
+    Only one block is held in memory at a time. The caller moves the file to
+    its final name or deletes it.
+
+    Args:
+        upload: The uploaded file
+        directory: Directory for the temporary file (on the same filesystem as the final path)
+        max_bytes: Size limit; larger uploads are rejected after at most this many bytes were written
+
+    Returns:
+        (temporary file path, sha256 of the content)
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds max_bytes (the partial file is deleted)
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f".upload-{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(path, "wb") as f:
+            while True:
+                block = await upload.read(UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"File exceeds the upload limit of {max_bytes // (1024 * 1024)} MB")
+                digest.update(block)
+                await asyncio.to_thread(f.write, block)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    logger.info(f"Received upload {upload.filename} ({size} bytes, sha256 {digest.hexdigest()[:12]})")
+    return path, digest.hexdigest()
+
+
+def report_id_for(content_hash: str, model: str, prompt_version: int, extract_mode: str) -> str:
+    """
+    Report ID of a file's claims extracted with one model, prompt version and extraction mode
+
+    Uploading the same file again under the same settings yields the same ID,
+    so its stored claims can be reused; changing any setting yields a new ID.
+    """
+    key = json.dumps([content_hash, model, prompt_version, extract_mode], separators=(",", ":"))
+    return str(uuid.uuid5(_REPORT_NAMESPACE, key))
+
+
+@asynccontextmanager
+async def report_lock(report_id: str) -> AsyncIterator[None]:
+    """
+    Hold the lock serializing claim extraction per report, so concurrent identical uploads extract once
+
+    The lock is dropped once no request holds or awaits it, so the table only
+    lists reports being uploaded right now.
+    """
+    lock, users = _report_locks.get(report_id, (None, 0))
+    if lock is None:
+        lock = asyncio.Lock()
+    _report_locks[report_id] = (lock, users + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, users = _report_locks[report_id]
+        if users == 1:
+            del _report_locks[report_id]
+        else:
+            _report_locks[report_id] = (lock, users - 1)
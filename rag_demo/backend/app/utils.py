@@ -4,11 +4,12 @@ Utility functions: logging, text chunking, helper functions
 import logging
 import hashlib
 import re
-from typing import List, Tuple
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
 from pathlib import Path
 import json
 
-from app.config import LOG_LEVEL
+from app.config import LOG_LEVEL, CHUNK_UNIT, TOKENIZER_ENCODING
 
 # Setup logging
 logging.basicConfig(
@@ -18,43 +19,207 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def chunk_text(text: str, chunk_size: int = 512, chunk_overlap: int = 50) -> List[str]:
+# Bump when chunk boundaries change, so indexes built with older chunks are rebuilt
+CHUNKER_VERSION = 2
+
+# Sentence endings: CJK full-width punctuation, or ASCII .!? followed by whitespace
+# (so "12.5" is not one). Line breaks are only a fallback break point.
+_CJK_ENDINGS = "\u3002\uff01\uff1f\uff0e\uff1b"
+_ASCII_ENDINGS = ".!?"
+_SPACES = frozenset(["", " ", "\t", "\n", "\r", "\f", "\v", "\xa0", "\u3000"])  # "": end of text
+# Fallback tokenizer when tiktoken is unavailable: one token per CJK character, word or symbol
+_FALLBACK_TOKEN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]|\w+|[^\w\s]')
+
+_encoding = None
+
+
+def _get_encoding():
+    """tiktoken encoding for token-sized chunks, or None if tiktoken is not installed"""
+    global _encoding
+    
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable ({e}), counting tokens with a regex tokenizer")
+            _encoding = False
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text (tiktoken when installed, otherwise the regex tokenizer)"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return sum(1 for _ in _FALLBACK_TOKEN_RE.finditer(text))
+
+
+def _unit_offsets(text: str, unit: str, attach_leading: bool = True) -> Sequence[int]:
+    """
+    Start offset of every unit (character or token) of text, plus a final sentinel at len(text)
+    
+    With attach_leading, leading whitespace is made part of the first token;
+    otherwise it is left to whatever unit precedes text.
+    """
+    if unit != "tokens":
+        return range(len(text) + 1)
+    
+    encoding = _get_encoding()
+    if encoding is not None:
+        _, offsets = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+        offsets = list(offsets)
+    else:
+        offsets = [m.start() for m in _FALLBACK_TOKEN_RE.finditer(text)]
+    if offsets and attach_leading:
+        offsets[0] = 0
+    offsets.append(len(text))
+    return offsets
+
+
+def _last_sentence_end(text: str, lo: int, hi: int) -> int:
+    """Index of the last sentence ending in text[lo:hi], or -1"""
+    last = -1
+    for ending in _CJK_ENDINGS:
+        i = text.rfind(ending, lo, hi)
+        if i > last:
+            last = lo = i
+    if last >= 0:
+        lo = last + 1
+    for ending in _ASCII_ENDINGS:
+        i = text.rfind(ending, lo, hi)
+        while i >= 0 and text[i + 1:i + 2] not in _SPACES:
+            i = text.rfind(ending, lo, i)
+        if i > last:
+            last = i
+    return last
+
+
+def _pack_chunks(
+    text: str,
+    offsets: Sequence[int],
+    start: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    final: bool
+) -> Tuple[List[str], int]:
+    """
+    Pack units [start, ...) into chunks of at most chunk_size units
+    
+    Each chunk ends after the last sentence ending past the window's half,
+    else after the last line break past it, else at the size limit. Unless
+    final, only windows followed by more text are emitted (the rest may
+    still grow).
+    
+    Returns:
+        Chunks and the unit index where the next window starts
+    """
+    units = len(offsets) - 1
+    chunks = []
+    
+    while (start < units) if final else (units > start + chunk_size):
+        end = start + chunk_size
+        
+        # Try to break at sentence boundary
+        if end < units:
+            lo, hi = offsets[start + chunk_size // 2 + 1], offsets[end]
+            boundary = _last_sentence_end(text, lo, hi)
+            if boundary < 0:
+                boundary = text.rfind("\n", lo, hi)
+            if boundary >= 0:
+                # Unit containing the boundary character (character units are their own offsets)
+                end = boundary + 1 if isinstance(offsets, range) else bisect_right(offsets, boundary)
+        
+        chunks.append(text[offsets[start]:offsets[min(end, units)]].strip())
+        start = max(end - chunk_overlap, start + 1)
+    
+    return chunks, start
+
+
+def chunk_text(text: str, chunk_size: int = 512, chunk_overlap: int = 50, unit: Optional[str] = None) -> List[str]:
     """
     Split text into chunks with overlap
     
+    Chunks are packed in a single pass, preferring to end at a sentence
+    (ASCII or CJK), else at a line break.
+    
     Args:
         text: Text to chunk
-        chunk_size: Maximum size of each chunk (in characters)
-        chunk_overlap: Number of characters to overlap between chunks
+        chunk_size: Maximum size of each chunk (in characters or tokens)
+        chunk_overlap: Number of characters or tokens to overlap between chunks
+        unit: "chars" or "tokens" (default: CHUNK_UNIT)
     
     Returns:
         List of text chunks
     """
-    if len(text) <= chunk_size:
+    unit = unit or CHUNK_UNIT
+    offsets = _unit_offsets(text, unit)
+    if len(offsets) - 1 <= chunk_size:
         return [text]
     
-    chunks = []
-    start = 0
+    chunks, _ = _pack_chunks(text, offsets, 0, chunk_size, chunk_overlap, final=True)
+    return chunks
+
+
+def iter_chunks(
+    texts: Iterable[str],
+    chunk_size: int = 512,
+    chunk_overlap: int = 50,
+    unit: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Streaming version of chunk_text over text that arrives in pieces
     
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
+    Yields the chunks chunk_text("".join(texts)) would return, while only
+    buffering the current window instead of the whole text. With token
+    units each piece is tokenized on its own, so results match exactly
+    when pieces split at token boundaries (pages, lines).
+    
+    Args:
+        texts: Text pieces (e.g. pages), in order
+        chunk_size: Maximum size of each chunk (in characters or tokens)
+        chunk_overlap: Number of characters or tokens to overlap between chunks
+        unit: "chars" or "tokens" (default: CHUNK_UNIT)
+    
+    Yields:
+        Text chunks
+    """
+    unit = unit or CHUNK_UNIT
+    buffer = ""
+    offsets: Sequence[int] = range(1)
+    start = 0  # Unit index in buffer where the next window starts
+    emitted = False
+    
+    for text in texts:
+        if not text:
+            continue
+        if unit == "tokens":
+            # Whitespace at the start of a piece belongs to the last token of the previous one
+            piece_offsets = _unit_offsets(text, unit, attach_leading=False)
+            offsets = list(offsets[:-1]) + [len(buffer) + o for o in piece_offsets]
+            offsets[0] = 0
+        else:
+            offsets = range(len(buffer) + len(text) + 1)
+        buffer += text
         
-        # Try to break at sentence boundary
-        if end < len(text):
-            # Look for sentence endings
-            last_period = chunk.rfind('.')
-            last_newline = chunk.rfind('\n')
-            break_point = max(last_period, last_newline)
-            
-            if break_point > chunk_size * 0.5:  # Only break if we're past halfway
-                chunk = chunk[:break_point + 1]
-                end = start + break_point + 1
+        # A window is only packed once text follows it, so a trailing ".!?" is never misjudged
+        chunks, start = _pack_chunks(buffer, offsets, start, chunk_size, chunk_overlap, final=False)
+        emitted = emitted or bool(chunks)
+        yield from chunks
         
-        chunks.append(chunk.strip())
-        start = end - chunk_overlap
+        # Drop everything before the next window
+        if start > 0:
+            cut = offsets[start]
+            buffer = buffer[cut:]
+            offsets = [o - cut for o in offsets[start:]] if unit == "tokens" else range(len(buffer) + 1)
+            start = 0
     
-    return chunks
+    if not emitted and len(offsets) - 1 <= chunk_size:
+        yield buffer
+        return
+    
+    chunks, _ = _pack_chunks(buffer, offsets, start, chunk_size, chunk_overlap, final=True)
+    yield from chunks
 
 
 def calculate_similarity(text1: str, text2: str) -> float:
@@ -95,7 +260,7 @@ def deduplicate_claims(claims: List[dict], similarity_threshold: float = 0.7) ->
         return []
     
     deduplicated = []
-    seen_hashes = set()
+    seen_hashes = {}
     
     for claim in claims:
         # Create a hash of the normalized claim text
@@ -104,6 +269,8 @@ def deduplicate_claims(claims: List[dict], similarity_threshold: float = 0.7) ->
         
         # Check if we've seen this exact text
         if text_hash in seen_hashes:
+            existing = seen_hashes[text_hash]
+            existing['page_numbers'] = sorted(set(existing['page_numbers'] + claim['page_numbers']))
             continue
         
         # Check similarity with existing claims
@@ -118,11 +285,69 @@ def deduplicate_claims(claims: List[dict], similarity_threshold: float = 0.7) ->
         
         if not is_duplicate:
             deduplicated.append(claim)
-            seen_hashes.add(text_hash)
+            seen_hashes[text_hash] = claim
     
     return deduplicated
 
 
+class JSONObjectScanner:
+    """
+    Incrementally locate the first complete top-level JSON object in streamed text
+    
+    Feed text fragments as they arrive; `feed` returns True as soon as the
+    closing brace of the first top-level object has been seen, so the caller
+    can stop consuming the stream. Braces inside JSON strings are ignored.
+    """
+    
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self.complete = False
+    
+    def feed(self, text: str) -> bool:
+        """Consume a fragment; returns True once the object is complete"""
+        if self.complete:
+            return True
+        
+        start = 0
+        for i, ch in enumerate(text):
+            if not self._started:
+                if ch != '{':
+                    continue
+                self._started = True
+                start = i
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(text[start:i + 1])
+                    self.complete = True
+                    return True
+        
+        if self._started:
+            self._buffer.append(text[start:])
+        return False
+    
+    @property
+    def result(self) -> str:
+        """The complete JSON object text (empty until complete)"""
+        return "".join(self._buffer) if self.complete else ""
+
+
 def save_json(data: dict, filepath: Path) -> None:
     """Save data to JSON file"""
     filepath.parent.mkdir(parents=True, exist_ok=True)
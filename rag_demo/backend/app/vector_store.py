@@ -0,0 +1,237 @@
+"""
+Vector store module: Process-wide vector store handle (ChromaDB or memory-mapped flat index)
+"""
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+from app import metrics
+from app.config import CHROMA_DIR, VECTOR_BACKEND, FLAT_QUANTIZATION, FLAT_RESCORE_FACTOR
+from app.flat_store import FlatCollection
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "internal_documents"
+COLLECTION_METADATA = {"description": "Internal company documents for rebuttal"}
+VERSION_FILE = "index_version"
+
+
+class VectorStore(ABC):
+    """
+    Thread-safe, lazily opened handle on the collection of indexed chunks
+
+    Every backend exposes its collection through the part of the ChromaDB
+    collection API the app uses: add, upsert, delete, get, query, count and a
+    `metadata` dict whose "hnsw:space" names the distance returned by query.
+    Call `flush()` to persist pending writes and `reload()` after the index
+    is rebuilt so the next access picks up the new collection.
+
+    `version` is a stamp stored next to the index and changed by
+    `bump_version()` whenever indexing modifies it, so caches of query
+    results can tell when they are stale. `refresh()` also reopens the
+    index when the stamp was changed by another process (e.g. a standalone
+    index_internal.py run), whose writes the open handle does not see.
+    """
+
+    name = ""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._collection = None
+        # Version the open index was last known to be at (None until first checked)
+        self._seen_version: Optional[str] = None
+
+    def open(self) -> None:
+        """Load the collection if it exists (blocking)"""
+        if self.collection is None:
+            logger.warning(f"Vector store collection '{COLLECTION_NAME}' not found. Please run index_internal.py first.")
+
+    @property
+    @abstractmethod
+    def collection(self):
+        """The internal documents collection, or None if it has not been created yet"""
+
+    @abstractmethod
+    def get_or_create_collection(self):
+        """Get the collection, creating it if needed (used by indexing)"""
+
+    def count(self) -> int:
+        """Number of chunks in the collection (0 if it does not exist)"""
+        collection = self.collection
+        return collection.count() if collection is not None else 0
+
+    def flush(self) -> None:
+        """Persist pending writes (blocking); a no-op for backends that write through"""
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "chunks": self.count()}
+
+    @property
+    def version(self) -> str:
+        """Current index version stamp ("0" if the index was never modified)"""
+        try:
+            return (self.path / VERSION_FILE).read_text(encoding='utf-8').strip() or "0"
+        except OSError:
+            return "0"
+
+    def bump_version(self) -> None:
+        """Record that the index contents changed"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        version = str(time.time_ns())
+        (self.path / VERSION_FILE).write_text(version, encoding='utf-8')
+        with self._lock:
+            self._seen_version = version
+
+    def reload(self) -> None:
+        """Drop the cached collection handle so the rebuilt index is re-read"""
+        with self._lock:
+            self._collection = None
+        logger.info("Vector store handle reloaded")
+
+    def _reopen(self) -> None:
+        """Reopen the index after another process changed it"""
+        self.reload()
+
+    def refresh(self) -> str:
+        """
+        Current index version, reopening the index first if another process changed it (blocking)
+        """
+        version = self.version
+        with self._lock:
+            if self._seen_version is not None and version != self._seen_version:
+                logger.info(f"Index version changed to {version} by another process; reopening the vector store")
+                self._reopen()
+            self._seen_version = version
+        return version
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    ChromaDB client and collection handle
+
+    The SQLite store and HNSW segment are opened once and reused by every
+    request.
+    """
+
+    name = "chroma"
+
+    def __init__(self, path: Path):
+        super().__init__(path)
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import chromadb
+            from chromadb.config import Settings
+
+            self._client = chromadb.PersistentClient(
+                path=str(self.path),
+                settings=Settings(anonymized_telemetry=False)
+            )
+            logger.info(f"Opened ChromaDB at {self.path}")
+        return self._client
+
+    def open(self) -> None:
+        """Open the client and load the collection if it exists (blocking)"""
+        with self._lock:
+            self._get_client()
+            super().open()
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                try:
+                    self._collection = self._get_client().get_collection(COLLECTION_NAME)
+                except Exception:
+                    return None
+            return self._collection
+
+    def _reopen(self) -> None:
+        # Chroma keeps HNSW segments in memory per client; only a new client sees another process's writes
+        with self._lock:
+            if self._client is not None:
+                self._client.clear_system_cache()
+                self._client = None
+        self.reload()
+
+    def get_or_create_collection(self):
+        with self._lock:
+            if self._collection is None:
+                self._collection = self._get_client().get_or_create_collection(
+                    name=COLLECTION_NAME,
+                    metadata=COLLECTION_METADATA
+                )
+            return self._collection
+
+
+class FlatVectorStore(VectorStore):
+    """
+    Exact-search index of normalized float32 vectors in a memory-mapped .npy file
+
+    Small per-company corpora do not need HNSW: one matrix-vector product
+    over a few thousand rows is exact and faster than an approximate search.
+    See flat_store.FlatCollection for the on-disk layout and quantized search.
+    """
+
+    name = "flat"
+
+    def __init__(self, path: Path, quantization: str = "none", rescore_factor: int = 4):
+        super().__init__(path)
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+
+    @property
+    def collection(self):
+        with self._lock:
+            if self._collection is None:
+                try:
+                    self._collection = FlatCollection.load(self.path, self.quantization, self.rescore_factor)
+                except Exception as e:
+                    logger.error(f"Failed to open flat vector index at {self.path}: {e}")
+                    return None
+            return self._collection
+
+    def get_or_create_collection(self):
+        with self._lock:
+            if self.collection is None:
+                self._collection = FlatCollection(self.path, self.quantization, self.rescore_factor)
+            return self._collection
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._collection is not None:
+                self._collection.flush()
+
+    def stats(self) -> dict:
+        collection = self.collection
+        stats = collection.stats() if collection is not None else {"vectors": 0}
+        return {"backend": self.name, **stats}
+
+
+_store: Optional[VectorStore] = None
+_store_lock = threading.Lock()
+
+
+def create_vector_store(backend: str = VECTOR_BACKEND) -> VectorStore:
+    """Vector store for a backend name ("chroma" or "flat")"""
+    if backend == "flat":
+        return FlatVectorStore(CHROMA_DIR / "flat", FLAT_QUANTIZATION, FLAT_RESCORE_FACTOR)
+    if backend != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+    return ChromaVectorStore(CHROMA_DIR)
+
+
+def get_vector_store() -> VectorStore:
+    """Get the process-wide vector store handle"""
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = create_vector_store()
+            metrics.register_provider("vector_store", _store.stats)
+        return _store
@@ -0,0 +1,90 @@
+"""
+Benchmark: pairwise vs MinHash/LSH vs embedding-cosine claim dedup
+
+Generates candidate claims where a share are near-duplicates (words dropped
+or replaced) of earlier ones, then times each dedup method and checks that
+MinHash/LSH keeps the same claims with the same merged page numbers as the
+pairwise scan. The cosine mode runs on synthetic embeddings (no Ollama).
+
+Usage (from rag_demo/backend):
+    python -m benchmarks.bench_dedup [--sizes 1000 5000 10000] [--dup-rate 0.3]
+"""
+import argparse
+import copy
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from app.dedup import deduplicate_claims_by_vectors, deduplicate_claims_minhash
+from app.utils import deduplicate_claims
+
+VOCABULARY = [
+    "revenue", "students", "enrollment", "margin", "cash", "related", "party", "auditor", "subsidiary",
+    "inflated", "overstated", "tuition", "campus", "loan", "guidance", "growth", "quarter", "fiscal",
+    "disclosure", "contract", "acquisition", "impairment", "receivables", "expenses", "fraud", "shares",
+] + [f"term{i}" for i in range(3000)]
+
+
+def generate_claims(n: int, dup_rate: float, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    claims = []
+    for i in range(n):
+        if claims and rng.random() < dup_rate:
+            # Near-duplicate of an earlier claim: swap one or two words
+            words = rng.choice(claims)['claim_text'].split()
+            for _ in range(rng.randint(1, 2)):
+                words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+        else:
+            words = [rng.choice(VOCABULARY) for _ in range(rng.randint(12, 25))]
+        claims.append({
+            "claim_text": " ".join(words),
+            "page_numbers": [rng.randint(1, 40)],
+            "claim_type": "other",
+        })
+    return claims
+
+
+def synthetic_vectors(claims: List[dict], dim: int = 768, seed: int = 0) -> np.ndarray:
+    """Embeddings where claims sharing most words point in nearly the same direction"""
+    rng = np.random.default_rng(seed)
+    word_vectors = {word: rng.standard_normal(dim).astype(np.float32) for word in VOCABULARY}
+    return np.stack([
+        np.sum([word_vectors[word] for word in claim['claim_text'].split()], axis=0) for claim in claims
+    ])
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--dup-rate", type=float, default=0.3)
+    parser.add_argument("--skip-pairwise-above", type=int, default=5000, help="pairwise scan is O(n^2): skip it for larger n")
+    args = parser.parse_args()
+
+    for n in args.sizes:
+        claims = generate_claims(n, args.dup_rate)
+        print(f"{n} candidate claims ({args.dup_rate:.0%} near-duplicates)")
+
+        pairwise = None
+        if n <= args.skip_pairwise_above:
+            pairwise, seconds = timed(deduplicate_claims, copy.deepcopy(claims), 0.7)
+            print(f"  pairwise Jaccard : {seconds:8.3f}s  kept {len(pairwise)}")
+
+        minhash, seconds = timed(deduplicate_claims_minhash, copy.deepcopy(claims), 0.7)
+        status = "" if pairwise is None else ("  output identical" if minhash == pairwise else "  output DIFFERS")
+        print(f"  MinHash/LSH      : {seconds:8.3f}s  kept {len(minhash)}{status}")
+
+        vectors = synthetic_vectors(claims)
+        cosine, seconds = timed(deduplicate_claims_by_vectors, copy.deepcopy(claims), vectors, 0.92)
+        print(f"  embedding cosine : {seconds:8.3f}s  kept {len(cosine)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark: single-prompt vs windowed (map-reduce) claim extraction
+
+Extracts claims from a report PDF with the configured Ollama model, once
+with the single prompt over the first MAX_PAGES pages and once with
+concurrent page windows over the whole report, reporting wall time, the
+number of claims and the highest page any claim was attributed to.
+Ollama runs at most OLLAMA_NUM_PARALLEL requests of a model at once, so
+the windowed time depends on that server setting as well as --concurrency.
+
+Usage (from rag_demo/backend):
+    python -m benchmarks.bench_extract_windows report.pdf [--concurrency 1 4 8]
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from app import ollama_client
+from app.claim_extract import extract_claims, extract_claims_windowed, page_windows
+from app.config import MAX_PAGES, REPORT_MAX_PAGES
+from app.pdf_extract import extract_pdf_text
+
+
+def describe(claims) -> str:
+    last_page = max((page for claim in claims for page in claim.page_numbers), default=0)
+    return f"{len(claims):3d} claims, last claim page {last_page}"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", type=Path)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    pages = extract_pdf_text(args.pdf, REPORT_MAX_PAGES)
+    print(f"{len(pages)} pages, {len(page_windows(pages))} windows")
+
+    try:
+        start = time.perf_counter()
+        claims = await extract_claims(pages[:MAX_PAGES], mode="single")
+        print(f"  single (first {MAX_PAGES} pages): {time.perf_counter() - start:7.1f}s  {describe(claims)}")
+
+        for concurrency in args.concurrency:
+            start = time.perf_counter()
+            claims = await extract_claims_windowed(pages, concurrency=concurrency)
+            print(f"  windowed x{concurrency:<11}: {time.perf_counter() - start:7.1f}s  {describe(claims)}")
+    finally:
+        await ollama_client.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark: per-claim vs batched judging (prompt tokens and wall time)
+
+Builds synthetic claims, each with its own retrieved evidence, and counts
+the prompt tokens (system + user message) sent by the per-claim judge and
+by batched judging at each batch size. Token counts use tiktoken when it is
+installed and a regex tokenizer otherwise, so they are estimates of what
+the model sees.
+
+With --live the claims are also judged by the configured Ollama model (no
+streaming, judgment cache disabled), reporting wall time and the prompt and
+completion tokens Ollama actually evaluated.
+
+Usage (from rag_demo/backend):
+    python -m benchmarks.bench_judge_batch [--claims 12] [--batch-sizes 2 4 6] [--live]
+"""
+import os
+
+# Ollama only reports token counts for non-streamed replies; cached judgments would skip the LLM
+os.environ.setdefault("JUDGE_STREAM", "false")
+os.environ["JUDGE_CACHE_ENABLED"] = "false"
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Tuple
+
+from app import metrics, ollama_client
+from app.judge import SYSTEM_PROMPT, build_batch_judge_prompt, build_judge_prompt, judge_claim, judge_claims_batch
+from app.models import Citation, Claim
+from app.utils import count_tokens
+
+CLAIM_TEXTS = [
+    "公司虚增了2023财年的在线教育收入，实际学生人数远低于披露数字。",
+    "The company failed to disclose related-party transactions with entities controlled by the chairman.",
+    "审计师在报告期内被更换，且未披露更换原因。",
+    "Reported cash balances at the Hong Kong subsidiary cannot be reconciled with bank records.",
+    "公司通过关联方预付款转移资金，金额超过5亿元。",
+    "Enrollment growth claimed in the annual report is inconsistent with campus capacity.",
+]
+EVIDENCE = [
+    "报告期内，公司营业收入同比增长12.5%，主要来自在线教育业务，学生人数经第三方审计确认。",
+    "Related-party transactions are reviewed by the audit committee and disclosed in Note 21 to the financial statements.",
+    "审计师对财务报表出具了标准无保留意见，更换审计师已于2023年6月公告。",
+    "Cash and cash equivalents are held at major international banks; bank confirmations were obtained for all accounts.",
+    "管理层认为现金流状况良好，足以覆盖未来十二个月的运营支出。",
+]
+
+
+def make_items(n: int, evidence_per_claim: int, seed: int = 0) -> List[Tuple[Claim, List[Citation]]]:
+    rng = random.Random(seed)
+    items = []
+    for i in range(n):
+        claim = Claim(
+            claim_id=f"claim_{i + 1}",
+            claim_text=f"{rng.choice(CLAIM_TEXTS)} ({i + 1})",
+            claim_type="other",
+            page_numbers=[rng.randint(1, 30)],
+        )
+        citations = [
+            Citation(
+                doc_id="company_data",
+                doc_title="company_data.pdf",
+                chunk_id=f"company_data_chunk_{rng.randint(0, 500)}",
+                quote=" ".join(rng.choice(EVIDENCE) for _ in range(4))[:500],
+                similarity_score=round(rng.uniform(0.5, 0.9), 4),
+            )
+            for _ in range(evidence_per_claim)
+        ]
+        items.append((claim, citations))
+    return items
+
+
+def batched(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def prompt_tokens(items, batch_size: int) -> int:
+    system = count_tokens(SYSTEM_PROMPT)
+    if batch_size == 1:
+        return sum(system + count_tokens(build_judge_prompt(claim, citations)) for claim, citations in items)
+    return sum(system + count_tokens(build_batch_judge_prompt(batch)) for batch in batched(items, batch_size))
+
+
+async def run_live(items, batch_size: int) -> Tuple[float, int, int]:
+    before = metrics.snapshot()["counters"]
+    start = time.perf_counter()
+    if batch_size == 1:
+        for claim, citations in items:
+            await judge_claim(claim, citations)
+    else:
+        for batch in batched(items, batch_size):
+            await judge_claims_batch(batch)
+    elapsed = time.perf_counter() - start
+    after = metrics.snapshot()["counters"]
+    delta = lambda name: after.get(name, 0) - before.get(name, 0)
+    return elapsed, delta("judge_prompt_tokens"), delta("judge_completion_tokens")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--claims", type=int, default=12)
+    parser.add_argument("--evidence", type=int, default=6, help="citations per claim (top_k)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--live", action="store_true", help="also judge with the configured Ollama model")
+    args = parser.parse_args()
+
+    items = make_items(args.claims, args.evidence)
+    print(f"{args.claims} claims x {args.evidence} citations")
+
+    sizes = [1] + [size for size in args.batch_sizes if size > 1]
+    baseline = prompt_tokens(items, 1)
+    for size in sizes:
+        tokens = prompt_tokens(items, size)
+        label = "per claim" if size == 1 else f"batch of {size}"
+        print(f"  {label:<12}: {len(batched(items, size)):3d} requests  ~{tokens:7d} prompt tokens ({tokens / baseline:6.1%})")
+
+    if args.live:
+        print("Live (Ollama):")
+        try:
+            for size in sizes:
+                elapsed, prompt, completion = await run_live(items, size)
+                label = "per claim" if size == 1 else f"batch of {size}"
+                print(f"  {label:<12}: {elapsed:7.1f}s  {prompt:7d} prompt tokens  {completion:7d} completion tokens")
+        finally:
+            await ollama_client.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+Benchmark: serial vs page-parallel PDF text extraction
+
+Builds a large PDF by repeating the pages of a source PDF, then times
+extract_pdf_text_serial against extract_pdf_text_parallel for several worker
+counts and checks that both produce identical pages.
+
+Usage (from rag_demo/backend):
+    python -m benchmarks.bench_pdf_extract [source.pdf] [--pages 300] [--workers 2 4 8]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+from app.config import BASE_DIR
+from app.pdf_extract import extract_pdf_text_serial, extract_pdf_text_parallel
+
+DEFAULT_SOURCE = BASE_DIR / "uploads" / "Attention-is-all-you-need-Paper.pdf"
+
+
+def build_pdf(source: Path, pages: int, target: Path) -> None:
+    reader = PdfReader(str(source))
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    with open(target, "wb") as f:
+        writer.write(f)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", nargs="?", type=Path, default=DEFAULT_SOURCE)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / "bench.pdf"
+        build_pdf(args.source, args.pages, pdf_path)
+        print(f"Benchmark PDF: {args.pages} pages built from {args.source.name}")
+
+        serial, serial_time = timed(extract_pdf_text_serial, pdf_path, max_pages=args.pages)
+        print(f"serial       : {serial_time:7.2f}s  ({args.pages / serial_time:6.1f} pages/s)")
+
+        for workers in args.workers:
+            # First call starts the pool; time the warm call like a long-running server would
+            extract_pdf_text_parallel(pdf_path, max_pages=2, workers=workers)
+            parallel, parallel_time = timed(extract_pdf_text_parallel, pdf_path, max_pages=args.pages, workers=workers)
+            status = "identical" if parallel == serial else "MISMATCH"
+            print(
+                f"{workers:2d} processes : {parallel_time:7.2f}s  ({args.pages / parallel_time:6.1f} pages/s)  "
+                f"speedup x{serial_time / parallel_time:.2f}  output {status}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: float32 vs float16 vs int8 flat index, with and without full-precision re-scoring
+
+Builds flat indexes over the chunks stored in ChromaDB padded with clustered
+synthetic vectors (see bench_vector_store), then reports for each
+quantization the bytes scanned per query, the index size on disk, query
+latency and recall@k against the unquantized exact search.
+
+Usage (from rag_demo/backend):
+    python -m benchmarks.bench_quantization [--sizes 5000 50000] [--top-k 20] [--rescore-factors 1 4]
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.config import CHROMA_DIR
+from app.flat_store import FlatCollection
+from benchmarks.bench_vector_store import add_in_batches, build_corpus, load_stored, recall_at_k
+
+
+def disk_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.suffix == ".npy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chroma-dir", type=Path, default=CHROMA_DIR)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--rescore-factors", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    stored = load_stored(args.chroma_dir)
+    rng = np.random.default_rng(1)
+
+    for size in args.sizes:
+        corpus = build_corpus(stored, size)
+        n, dim = corpus['embeddings'].shape
+        queries = corpus['embeddings'][rng.integers(0, n, args.queries)]
+        queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * (0.5 / np.sqrt(dim))
+        top_k = min(args.top_k, n)
+        print(f"{n} chunks x {dim} dims, top {top_k}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            exact = None
+            runs = [("none", 1)] + [(q, f) for q in ("float16", "int8") for f in args.rescore_factors]
+            for quantization, factor in runs:
+                path = Path(tmp) / quantization
+                if not path.exists():
+                    collection = FlatCollection(path, quantization)
+                    add_in_batches(collection, corpus)
+                    collection.flush()
+                collection = FlatCollection.load(path, quantization, rescore_factor=factor)
+                collection.query(query_embeddings=queries[:1], n_results=top_k)  # page the index in
+
+                start = time.perf_counter()
+                for q in queries:
+                    collection.query(query_embeddings=[q], n_results=top_k)
+                latency = 1000 * (time.perf_counter() - start) / len(queries)
+
+                result = collection.query(query_embeddings=queries, n_results=top_k)
+                if exact is None:
+                    exact = result
+                stats = collection.stats()
+                label = quantization if quantization == "none" else f"{quantization} x{factor}"
+                print(
+                    f"  {label:<12}: scanned {stats['search_bytes'] / 1e6:7.1f} MB  on disk {disk_bytes(path) / 1e6:7.1f} MB  "
+                    f"{latency:7.3f} ms/query  recall@{top_k} {recall_at_k(result, exact):.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: ChromaDB (HNSW) vs memory-mapped flat index
+
+Reads the chunks stored in the ChromaDB collection (storage/chroma by
+default) and, for corpus sizes beyond what is stored, pads them with
+clustered synthetic vectors. Both backends are built from the
+same rows in temporary directories; the benchmark reports build time,
+single-query latency, batched-query latency (as used for a claim batch)
+and Chroma's recall@k against the exact flat results.
+
+Usage (from rag_demo/backend):
+    python -m benchmarks.bench_vector_store [--chroma-dir storage/chroma] [--sizes 0 5000 20000] [--top-k 20]
+
+A size of 0 means "only the stored chunks".
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.config import CHROMA_DIR
+from app.flat_store import FlatCollection
+from app.vector_store import COLLECTION_METADATA, COLLECTION_NAME, ChromaVectorStore
+
+
+def load_stored(chroma_dir: Path) -> dict:
+    collection = ChromaVectorStore(chroma_dir).collection
+    if collection is None:
+        return {'ids': [], 'embeddings': np.empty((0, 768), np.float32), 'documents': [], 'metadatas': []}
+    rows = collection.get(include=['embeddings', 'documents', 'metadatas'])
+    rows['embeddings'] = np.asarray(rows['embeddings'], dtype=np.float32)
+    return rows
+
+
+def build_corpus(stored: dict, size: int, seed: int = 0) -> dict:
+    """
+    Stored rows plus synthetic ones up to `size`
+
+    Synthetic vectors are drawn around random topic centres (about 50 chunks
+    per topic) with the spread of real chunk embeddings, so nearest
+    neighbours are distinct rather than near-ties.
+    """
+    rng = np.random.default_rng(seed)
+    base = stored['embeddings']
+    dim = base.shape[1] if base.size else 768
+    extra = max(0, size - len(stored['ids']))
+    centres = rng.standard_normal((max(1, extra // 50), dim)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    noise = rng.standard_normal((extra, dim)).astype(np.float32) * (0.8 / np.sqrt(dim))
+    synthetic = centres[rng.integers(0, len(centres), extra)] + noise
+    vectors = np.concatenate([base.reshape(-1, dim), synthetic])
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return {
+        'ids': list(stored['ids']) + [f"synthetic_chunk_{i}" for i in range(extra)],
+        'embeddings': vectors.astype(np.float32),
+        'documents': list(stored['documents']) + [f"synthetic chunk {i}" for i in range(extra)],
+        'metadatas': list(stored['metadatas']) + [{"doc_id": "synthetic", "chunk_id": f"synthetic_chunk_{i}"} for i in range(extra)],
+    }
+
+
+def add_in_batches(collection, corpus: dict, batch_size: int = 1000) -> None:
+    for start in range(0, len(corpus['ids']), batch_size):
+        end = start + batch_size
+        collection.add(
+            ids=corpus['ids'][start:end],
+            embeddings=corpus['embeddings'][start:end],
+            documents=corpus['documents'][start:end],
+            metadatas=corpus['metadatas'][start:end]
+        )
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def recall_at_k(approximate: dict, exact: dict) -> float:
+    hits = total = 0
+    for found, truth in zip(approximate['ids'], exact['ids']):
+        hits += len(set(found) & set(truth))
+        total += len(truth)
+    return hits / max(1, total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chroma-dir", type=Path, default=CHROMA_DIR)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=30, help="queries per batched call (one claim batch)")
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    import chromadb
+    from chromadb.config import Settings
+
+    stored = load_stored(args.chroma_dir)
+    print(f"{len(stored['ids'])} chunks stored in {args.chroma_dir}")
+    rng = np.random.default_rng(1)
+
+    for size in args.sizes:
+        corpus = build_corpus(stored, size)
+        n, dim = corpus['embeddings'].shape
+        queries = corpus['embeddings'][rng.integers(0, n, args.queries)]
+        queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * (0.5 / np.sqrt(dim))
+        top_k = min(args.top_k, n)
+        print(f"{n} chunks x {dim} dims, top {top_k}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            client = chromadb.PersistentClient(path=str(Path(tmp) / "chroma"), settings=Settings(anonymized_telemetry=False))
+            chroma = client.create_collection(name=COLLECTION_NAME, metadata=COLLECTION_METADATA)
+            _, chroma_build = timed(add_in_batches, chroma, corpus)
+
+            flat = FlatCollection(Path(tmp) / "flat")
+            _, flat_build = timed(add_in_batches, flat, corpus)
+            _, flush_seconds = timed(flat.flush)
+            flat = FlatCollection.load(Path(tmp) / "flat")
+
+            for name, collection, build in (("chroma", chroma, chroma_build), ("flat", flat, flat_build + flush_seconds)):
+                _, single = timed(lambda: [collection.query(query_embeddings=[q.tolist()], n_results=top_k) for q in queries])
+                batches = [queries[i:i + args.batch] for i in range(0, len(queries), args.batch)]
+                _, batched = timed(lambda: [collection.query(query_embeddings=b.tolist(), n_results=top_k) for b in batches])
+                print(
+                    f"  {name:<6}: build {build:7.2f}s  single query {1000 * single / len(queries):7.3f} ms  "
+                    f"batched {1000 * batched / len(queries):7.3f} ms/query"
+                )
+
+            exact = flat.query(query_embeddings=queries, n_results=top_k)
+            approximate = chroma.query(query_embeddings=queries.tolist(), n_results=top_k)
+            print(f"  chroma recall@{top_k} vs exact: {recall_at_k(approximate, exact):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,62 @@
 """
 FastAPI main application for Short Report Rebuttal Assistant
 """
+import asyncio
 import logging
-import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.config import REPORTS_DIR, CHROMA_DIR, INTERNAL_DATA_DIR
+from app.config import (
+    REPORTS_DIR, CHROMA_DIR, INTERNAL_DATA_DIR, MODEL_WARMUP, EXTRACT_MODE, MAX_PAGES, REPORT_MAX_PAGES,
+    LLM_MODEL, MAX_UPLOAD_MB
+)
 from app.models import (
     UploadReportResponse, AnalyzeRequest, AnalyzeResponse,
-    Claim, ClaimAnalysis
+    AnalyzeJobResponse, AnalyzeJobStatus, Claim
 )
-from app.pdf_extract import extract_pdf_text
-from app.claim_extract import extract_claims_from_text
-from app.retrieval import retrieve_relevant_documents
-from app.judge import judge_claim
-from app.report import create_analysis_report
+from app.pdf_extract import extract_pdf_text, shutdown_executor
+from app.claim_extract import EXTRACT_PROMPT_VERSION, extract_claims
+from app.analysis import analyze_claims_concurrently
+from app.report import create_analysis_report, save_analysis_report
+from app.jobs import job_manager
+from app.model_residency import residency_manager
+from app.uploads import UploadTooLargeError, report_id_for, report_lock, save_upload
+from app import ollama_client, metrics
+from app.vector_store import get_vector_store
 from app.utils import save_json, load_json, logger
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: open the shared vector store and start preloading the
+    Ollama models at startup; stop keep-warm probing, cancel running jobs,
+    release pooled Ollama connections and stop PDF worker processes on shutdown
+    """
+    await asyncio.to_thread(get_vector_store().open)
+    if MODEL_WARMUP:
+        residency_manager.start()
+    yield
+    await residency_manager.stop()
+    await job_manager.shutdown()
+    await ollama_client.close_client()
+    await asyncio.to_thread(shutdown_executor)
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Short Report Rebuttal Assistant API",
     description="API for analyzing short reports and generating rebuttal analysis",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - allow frontend origin
@@ -57,6 +83,8 @@ async def root():
         "endpoints": {
             "upload": "/api/upload_report",
             "analyze": "/api/analyze",
+            "analyze_jobs": "/api/analyze_jobs",
+            "reindex": "/api/reindex",
             "download": "/api/download_report/{report_id}"
         }
     }
@@ -72,18 +100,9 @@ async def health():
     collection_count = 0
     if chroma_exists:
         try:
-            import chromadb
-            from chromadb.config import Settings
-            client = chromadb.PersistentClient(
-                path=str(CHROMA_DIR),
-                settings=Settings(anonymized_telemetry=False)
-            )
-            try:
-                collection = client.get_collection("internal_documents")
-                collection_exists = True
-                collection_count = collection.count()
-            except Exception:
-                collection_exists = False
+            store = get_vector_store()
+            collection_exists = store.collection is not None
+            collection_count = await asyncio.to_thread(store.count)
         except Exception:
             pass
     
@@ -92,37 +111,55 @@ async def health():
         "chroma_db_exists": chroma_exists,
         "collection_exists": collection_exists,
         "collection_count": collection_count,
+        "models": residency_manager.status(),
         "reports_dir": str(REPORTS_DIR)
     }
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Latency statistics and counters collected by this process"""
+    return metrics.snapshot()
+
+
+@app.delete("/api/admin/judgment_cache")
+async def invalidate_judgment_cache(model: Optional[str] = None, prompt_version: Optional[int] = None):
+    """
+    Delete cached judgments of an LLM model and/or judge prompt version
+    
+    With neither parameter, the whole judgment cache is cleared.
+    """
+    from app.judgment_cache import get_judgment_cache
+    
+    deleted = await asyncio.to_thread(get_judgment_cache().invalidate, model, prompt_version)
+    return {"deleted": deleted, "model": model, "prompt_version": prompt_version}
+
+
 @app.post("/api/check_and_index")
 async def check_and_index():
     """
     Check if vector DB exists and has data, if not, index company_data.pdf
+    
+    An index built with other chunking or embedding settings (e.g. another
+    EMBED_MODEL) is rebuilt as well.
     """
     try:
-        import chromadb
-        from chromadb.config import Settings
-        from app.index_internal import index_internal_documents
+        from app.index_internal import index_internal_documents, index_is_current
         
         # Check if collection exists and has data
+        store = get_vector_store()
         collection_exists = False
         collection_count = 0
         
         if CHROMA_DIR.exists():
             try:
-                client = chromadb.PersistentClient(
-                    path=str(CHROMA_DIR),
-                    settings=Settings(anonymized_telemetry=False)
-                )
-                collection = client.get_collection("internal_documents")
-                collection_exists = True
-                collection_count = collection.count()
+                collection_exists = store.collection is not None
+                collection_count = await asyncio.to_thread(store.count)
             except Exception:
                 collection_exists = False
         
-        if collection_exists and collection_count > 0:
+        # An index built with other chunking or embedding settings is rebuilt
+        if collection_exists and collection_count > 0 and await asyncio.to_thread(index_is_current):
             return {
                 "indexed": True,
                 "message": f"Vector DB already exists with {collection_count} chunks",
@@ -130,12 +167,12 @@ async def check_and_index():
             }
         
         # Index documents
-        logger.info("Vector DB not found or empty, starting indexing...")
+        logger.info("Vector DB not found, empty or built with other settings, starting indexing...")
         logger.info(f"INTERNAL_DATA_DIR: {INTERNAL_DATA_DIR}")
         logger.info(f"INTERNAL_DATA_DIR exists: {INTERNAL_DATA_DIR.exists()}")
         
         try:
-            index_internal_documents()
+            await index_internal_documents()
         except Exception as index_error:
             logger.error(f"Indexing failed: {index_error}")
             import traceback
@@ -149,12 +186,7 @@ async def check_and_index():
         
         # Check again after indexing
         try:
-            client = chromadb.PersistentClient(
-                path=str(CHROMA_DIR),
-                settings=Settings(anonymized_telemetry=False)
-            )
-            collection = client.get_collection("internal_documents")
-            final_count = collection.count()
+            final_count = await asyncio.to_thread(store.count)
             
             return {
                 "indexed": True,
@@ -181,47 +213,105 @@ async def check_and_index():
         }
 
 
+@app.post("/api/reindex")
+async def reindex():
+    """
+    Incrementally re-index internal documents
+    
+    Only new or edited files are re-chunked and re-embedded; chunks of edited
+    or removed files are deleted.
+    """
+    from app.index_internal import index_internal_documents
+    
+    try:
+        summary = await index_internal_documents()
+    except Exception as e:
+        logger.error(f"Reindexing failed: {e}")
+        import traceback
+        error_trace = traceback.format_exc()
+        logger.error(f"Traceback: {error_trace}")
+        return {
+            "indexed": False,
+            "message": f"索引失败: {str(e)}",
+            "error": error_trace
+        }
+    
+    count = await asyncio.to_thread(get_vector_store().count)
+    return {
+        "indexed": True,
+        "message": f"增量索引完成: 更新 {summary['indexed_files']} 个文件, 删除 {summary['removed_files']} 个文件",
+        "count": count,
+        **summary
+    }
+
+
 @app.post("/api/upload_report", response_model=UploadReportResponse)
 async def upload_report(file: UploadFile = File(...)):
     """
     Upload a short report PDF and extract claims
     
+    The upload is streamed to disk and hashed on the fly. A file already
+    processed with the same LLM model, extraction prompt version and
+    extraction mode keeps its report ID and its stored claims are returned
+    without calling the LLM.
+    
     Returns:
         report_id and extracted claims
     """
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
-    report_id = str(uuid.uuid4())
+    max_bytes = MAX_UPLOAD_MB * 1024 * 1024
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File exceeds the upload limit of {MAX_UPLOAD_MB} MB")
+    
+    try:
+        upload_path, content_hash = await save_upload(file, REPORTS_DIR, max_bytes)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    report_id = report_id_for(content_hash, LLM_MODEL, EXTRACT_PROMPT_VERSION, EXTRACT_MODE)
     report_path = REPORTS_DIR / f"{report_id}.pdf"
     claims_path = REPORTS_DIR / f"{report_id}.claims.json"
     
     try:
-        report_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(report_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        logger.info(f"Saved report {report_id} to {report_path}")
-        
-        pages = extract_pdf_text(report_path)
-        if not pages:
-            raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
-        
-        full_text = "\n\n".join([f"Page {pnum}:\n{text}" for pnum, text in pages])
-        claims = extract_claims_from_text(full_text, pages)
-        
-        if not claims:
-            raise HTTPException(status_code=400, detail="Failed to extract claims from report")
-        
-        save_json(
-            {
-                "report_id": report_id,
-                "claims": [c.dict() for c in claims],
-                "pages": pages
-            },
-            claims_path
-        )
+        async with report_lock(report_id):
+            claims = load_existing_claims(claims_path)
+            if claims is not None:
+                metrics.increment("report_upload_dedup_hits")
+                logger.info(f"Report {report_id} already processed, returning {len(claims)} stored claims")
+                return UploadReportResponse(
+                    report_id=report_id,
+                    claims=claims,
+                    message=f"Report already processed, returning {len(claims)} existing claims"
+                )
+            
+            upload_path.replace(report_path)
+            logger.info(f"Saved report {report_id} to {report_path}")
+            
+            # Windowed extraction covers the whole report; a single prompt only fits the first pages
+            max_pages = MAX_PAGES if EXTRACT_MODE == "single" else REPORT_MAX_PAGES
+            pages = await asyncio.to_thread(extract_pdf_text, report_path, max_pages)
+            if not pages:
+                raise HTTPException(status_code=400, detail="Failed to extract text from PDF")
+            
+            claims = await extract_claims(pages)
+            
+            if not claims:
+                raise HTTPException(status_code=400, detail="Failed to extract claims from report")
+            
+            save_json(
+                {
+                    "report_id": report_id,
+                    "content_sha256": content_hash,
+                    "model": LLM_MODEL,
+                    "prompt_version": EXTRACT_PROMPT_VERSION,
+                    "extract_mode": EXTRACT_MODE,
+                    "claims": [c.dict() for c in claims],
+                    "pages": pages
+                },
+                claims_path
+            )
         
         logger.info(f"Extracted {len(claims)} claims from report {report_id}")
         
@@ -239,17 +329,24 @@ async def upload_report(file: UploadFile = File(...)):
         logger.error(f"Error uploading report: {e}")
         logger.error(f"Traceback: {error_trace}")
         raise HTTPException(status_code=500, detail=f"Error processing report: {str(e)}")
+    finally:
+        upload_path.unlink(missing_ok=True)
 
 
-@app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze_claims(request: AnalyzeRequest):
-    """
-    Analyze claims by retrieving evidence and judging coverage
-    """
-    report_id = request.report_id
-    top_k = request.top_k
-    max_claims = request.max_claims
-    
+def load_existing_claims(claims_path: Path) -> Optional[List[Claim]]:
+    """Claims stored by an earlier upload of the same report, or None if there are none (or they are unreadable)"""
+    if not claims_path.exists():
+        return None
+    try:
+        claims = [Claim(**c) for c in load_json(claims_path).get("claims", [])]
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable claims file {claims_path}: {e}")
+        return None
+    return claims or None
+
+
+def load_report_claims(report_id: str, max_claims: int) -> List[Claim]:
+    """Load the cached claims of an uploaded report, raising HTTP errors if unavailable"""
     claims_path = REPORTS_DIR / f"{report_id}.claims.json"
     if not claims_path.exists():
         raise HTTPException(status_code=404, detail=f"Report {report_id} not found. Please upload first.")
@@ -260,38 +357,24 @@ async def analyze_claims(request: AnalyzeRequest):
     if not claims_data:
         raise HTTPException(status_code=400, detail="No claims found in cached data")
     
-    claims = [Claim(**c) for c in claims_data[:max_claims]]
+    return [Claim(**c) for c in claims_data[:max_claims]]
+
+
+@app.post("/api/analyze", response_model=AnalyzeResponse)
+async def analyze_claims(request: AnalyzeRequest):
+    """
+    Analyze claims by retrieving evidence and judging coverage
+    """
+    report_id = request.report_id
+    claims = load_report_claims(report_id, request.max_claims)
     logger.info(f"Analyzing {len(claims)} claims for report {report_id}")
     
-    analyses = []
-    
-    for i, claim in enumerate(claims, 1):
-        logger.info(f"Processing claim {i}/{len(claims)}: {claim.claim_id}")
-        
-        try:
-            citations = retrieve_relevant_documents(claim.claim_text, top_k=top_k)
-            analysis = judge_claim(claim, citations)
-            analyses.append(analysis)
-            
-        except Exception as e:
-            logger.error(f"Error analyzing claim {claim.claim_id}: {e}")
-            analyses.append(ClaimAnalysis(
-                claim_id=claim.claim_id,
-                coverage="not_addressed",
-                reasoning=f"处理过程中出现错误: {str(e)}",
-                citations=[],
-                confidence=0,
-                gaps=["需要重新处理"],
-                recommended_actions=["检查系统错误"]
-            ))
+    analyses = await analyze_claims_concurrently(
+        claims, top_k=request.top_k, concurrency=request.concurrency
+    )
     
     report = create_analysis_report(report_id, claims, analyses)
-    
-    report_json_path = REPORTS_DIR / f"{report_id}.report.json"
-    report_md_path = REPORTS_DIR / f"{report_id}.report.md"
-    
-    save_json(report.json_data, report_json_path)
-    report_md_path.write_text(report.markdown, encoding='utf-8')
+    await asyncio.to_thread(save_analysis_report, report)
     
     logger.info(f"Generated report for {report_id}")
     
@@ -301,6 +384,54 @@ async def analyze_claims(request: AnalyzeRequest):
     )
 
 
+@app.post("/api/analyze_jobs", response_model=AnalyzeJobResponse)
+async def start_analyze_job(request: AnalyzeRequest):
+    """
+    Start claim analysis as a background job and return its job_id immediately
+    """
+    claims = load_report_claims(request.report_id, request.max_claims)
+    job = job_manager.start(
+        request.report_id, claims, top_k=request.top_k, concurrency=request.concurrency
+    )
+    
+    return AnalyzeJobResponse(
+        job_id=job.job_id,
+        report_id=job.report_id,
+        status=job.status,
+        message=f"Started analysis of {len(claims)} claims"
+    )
+
+
+@app.get("/api/analyze_jobs/{job_id}", response_model=AnalyzeJobStatus)
+async def get_analyze_job(job_id: str):
+    """
+    Get progress of an analysis job; includes the final report once completed
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_status()
+
+
+@app.get("/api/analyze_jobs/{job_id}/events")
+async def stream_analyze_job(job_id: str):
+    """
+    Server-Sent Events stream of an analysis job
+    
+    Emits a "claim" event with each ClaimAnalysis as soon as it finishes,
+    then a final "complete" event with the AnalysisReport (or an "error" event).
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    
+    return StreamingResponse(
+        job.stream_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/download_report/{report_id}")
 async def download_report(report_id: str, format: str = "md"):
     """